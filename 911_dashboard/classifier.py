@@ -1,20 +1,30 @@
 from transformers import pipeline
 import argparse
+import time
+
+from fast_triage import DEFAULT_MODEL, LABEL_MAP, FastTriage, ensure_model
 
 # Define the confidence threshold
 TAU = 0.8
 
-def classify_emergency(text):
-    # Initialize the classifier
-    classifier = pipeline("zero-shot-classification", model="facebook/bart-large-mnli")
+# Define candidate labels for emergency classification
+CANDIDATE_LABELS = ["medical emergency", "fire emergency", "police emergency",
+                    "traffic accident", "non-emergency"]
 
-    # Define candidate labels for emergency classification
-    candidate_labels = ["medical emergency", "fire emergency", "police emergency",
-                       "traffic accident", "non-emergency"]
+# Minimum fast-model probability before the cascade skips the zero-shot model
+FAST_TAU = 0.9
 
-    # Perform multi-label classification
-    result = classifier(text, candidate_labels, multi_label=True)
-    
+_classifier = None
+_fast_model = None
+
+def get_classifier():
+    # Load the zero-shot pipeline once per process and reuse it
+    global _classifier
+    if _classifier is None:
+        _classifier = pipeline("zero-shot-classification", model="facebook/bart-large-mnli")
+    return _classifier
+
+def decide(result):
     scores = result['scores']
     labels = result['labels']
     
@@ -34,16 +44,83 @@ def classify_emergency(text):
 
     return prediction, confidence
 
+def classify_emergency(text, quantized=False):
+    if quantized:
+        from quantized import classify_quantized
+        return classify_quantized([text])[0]
+
+    classifier = get_classifier()
+
+    # Perform multi-label classification
+    result = classifier(text, CANDIDATE_LABELS, multi_label=True)
+
+    return decide(result)
+
+def classify_batch(texts, batch_size=8):
+    """Classify a list of texts, returning a (prediction, confidence) pair per text"""
+    if not texts:
+        return []
+    classifier = get_classifier()
+    results = classifier(list(texts), CANDIDATE_LABELS, multi_label=True, batch_size=batch_size)
+    if isinstance(results, dict):
+        results = [results]
+    return [decide(result) for result in results]
+
+def get_fast_model(path=DEFAULT_MODEL):
+    # Load the fast model once per process, training it first if there is none yet.
+    # evaluate.py trains it up front so its worker processes only load it.
+    global _fast_model
+    if _fast_model is None:
+        _fast_model = FastTriage.load(ensure_model(path))
+    return _fast_model
+
+def classify_cascade(texts, batch_size=8):
+    """Classify texts with the fast model, deferring low-confidence ones to zero-shot.
+
+    Returns a (prediction, confidence, stage, latency) tuple per text, where stage
+    is "fast" or "zero-shot" and latency is the seconds spent on that text.
+    """
+    fast_model = get_fast_model()
+    results = [None] * len(texts)
+    deferred = []
+
+    for i, text in enumerate(texts):
+        start = time.perf_counter()
+        label, prob = fast_model.predict(text)
+        elapsed = time.perf_counter() - start
+        if prob >= FAST_TAU and label in CANDIDATE_LABELS:
+            results[i] = (label, prob, "fast", elapsed)
+        else:
+            deferred.append((i, elapsed))
+
+    if deferred:
+        start = time.perf_counter()
+        slow = classify_batch([texts[i] for i, _ in deferred], batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+        # Deferred texts wait for the fast pass and the whole zero-shot batch
+        for (i, fast_elapsed), (prediction, confidence) in zip(deferred, slow):
+            results[i] = (prediction, confidence, "zero-shot", fast_elapsed + elapsed)
+
+    return results
+
 def main():
     # Set up argument parser
     parser = argparse.ArgumentParser(description='Classify emergency text')
     parser.add_argument('text', type=str, help='The text to classify')
+    parser.add_argument('--cascade', action='store_true',
+                        help='Try the fast triage model before the zero-shot model')
+    parser.add_argument('--quantized', action='store_true',
+                        help='Use the int8 quantized model with cached label hypotheses')
 
     # Parse arguments
     args = parser.parse_args()
 
     # Classify the text
-    classification, confidence = classify_emergency(args.text)
+    if args.cascade:
+        classification, confidence, stage, _ = classify_cascade([args.text])[0]
+        print(f"\nAnswered by: {stage}")
+    else:
+        classification, confidence = classify_emergency(args.text, quantized=args.quantized)
 
     # Print results
     print(f"\nClassification: {classification}")
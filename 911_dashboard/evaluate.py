@@ -0,0 +1,176 @@
+import argparse
+import csv
+import os
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+
+from classifier import CANDIDATE_LABELS, LABEL_MAP, TAU, classify_batch, classify_cascade
+from fast_triage import HOLDOUT_PERCENT, ensure_model, is_holdout
+from quantized import classify_quantized
+
+DEFAULT_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'mock_911_texts.csv')
+
+# Dataset types without a candidate label are scored as "unmapped", so any
+# confident prediction on them counts against precision.
+UNMAPPED = "unmapped"
+
+# Batch classifiers selectable from the command line. Entries must be
+# module-level functions so they can be sent to worker processes by name.
+# They return a (prediction, confidence) tuple per text, optionally followed
+# by the stage that answered and that text's own latency in seconds.
+BACKENDS = {
+    "zero-shot": classify_batch,
+    "cascade": classify_cascade,
+    "quantized": classify_quantized,
+}
+
+
+def read_chunks(path, chunk_size, holdout_only=False):
+    """Yield lists of (message, emergency_type) rows without loading the whole CSV"""
+    with open(path, newline='') as f:
+        rows = ((row['message'], row['emergency_type']) for row in csv.DictReader(f))
+        if holdout_only:
+            rows = (row for row in rows if is_holdout(row[0]))
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+
+def run_chunk(backend, texts, batch_size):
+    start = time.perf_counter()
+    predictions = BACKENDS[backend](texts, batch_size=batch_size)
+    return predictions, time.perf_counter() - start
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * q / 100
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+class Report:
+    def __init__(self):
+        self.total = 0
+        self.uncertain = 0
+        self.latencies = []
+        self.stages = Counter()
+        self.true_positive = Counter()
+        self.false_positive = Counter()
+        self.false_negative = Counter()
+
+    def add(self, chunk, predictions, elapsed):
+        # Unless the backend reports per-text latency, every text in a batch
+        # waits for the whole batch and is charged the batch's wall time.
+        for (_, emergency_type), result in zip(chunk, predictions):
+            prediction = result[0]
+            truth = LABEL_MAP.get(emergency_type, UNMAPPED)
+            self.total += 1
+            self.stages[result[2] if len(result) > 2 else "model"] += 1
+            self.latencies.append(result[3] if len(result) > 3 else elapsed)
+            if prediction == "uncertain":
+                self.uncertain += 1
+            elif prediction == truth:
+                self.true_positive[prediction] += 1
+                continue
+            else:
+                self.false_positive[prediction] += 1
+            self.false_negative[truth] += 1
+
+    def summary(self, wall_time):
+        per_class = {}
+        for label in CANDIDATE_LABELS:
+            tp = self.true_positive[label]
+            fp = self.false_positive[label]
+            fn = self.false_negative[label]
+            per_class[label] = {
+                "precision": tp / (tp + fp) if tp + fp else 0.0,
+                "recall": tp / (tp + fn) if tp + fn else 0.0,
+                "support": tp + fn,
+            }
+        return {
+            "texts": self.total,
+            "wall_time_s": wall_time,
+            "throughput": self.total / wall_time if wall_time else 0.0,
+            "latency_ms": {
+                f"p{q}": percentile(self.latencies, q) * 1000 for q in (50, 90, 95, 99)
+            },
+            "uncertain_rate": self.uncertain / self.total if self.total else 0.0,
+            "stages": {stage: n / self.total for stage, n in self.stages.items()},
+            "per_class": per_class,
+        }
+
+
+def evaluate(path=DEFAULT_CSV, backend="zero-shot", chunk_size=64, batch_size=8, workers=0, limit=None,
+             holdout_only=False):
+    if backend == "cascade":
+        # Train the fast model here, once, rather than racing to train it in every worker;
+        # and score it only on rows it was not trained on
+        ensure_model()
+        holdout_only = True
+
+    report = Report()
+    chunks = read_chunks(path, chunk_size, holdout_only)
+    if limit is not None:
+        chunks = islice(chunks, -(-limit // chunk_size))
+
+    start = time.perf_counter()
+    if workers <= 0:
+        for chunk in chunks:
+            predictions, elapsed = run_chunk(backend, [text for text, _ in chunk], batch_size)
+            report.add(chunk, predictions, elapsed)
+    else:
+        # Keep a bounded number of chunks in flight so the CSV is still streamed
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = {}
+            for chunk in chunks:
+                if len(pending) >= workers * 2:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        report.add(pending.pop(future), *future.result())
+                future = pool.submit(run_chunk, backend, [text for text, _ in chunk], batch_size)
+                pending[future] = chunk
+            for future in list(pending):
+                report.add(pending.pop(future), *future.result())
+
+    return report.summary(time.perf_counter() - start)
+
+
+def print_summary(summary):
+    print(f"\nTexts: {summary['texts']} in {summary['wall_time_s']:.2f}s "
+          f"({summary['throughput']:.1f} texts/sec)")
+    print("Latency: " + ", ".join(f"{k} {v:.1f}ms" for k, v in summary['latency_ms'].items()))
+    print(f"Uncertain (TAU={TAU}): {summary['uncertain_rate']:.2%}")
+    print("Handled by: " + ", ".join(f"{stage} {share:.2%}" for stage, share in summary['stages'].items()))
+    print(f"\n{'label':<20}{'precision':>10}{'recall':>10}{'support':>10}")
+    for label, stats in summary['per_class'].items():
+        print(f"{label:<20}{stats['precision']:>10.2%}{stats['recall']:>10.2%}{stats['support']:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Evaluate the emergency classifier on a labeled CSV')
+    parser.add_argument('--csv', default=DEFAULT_CSV, help='CSV with message and emergency_type columns')
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='zero-shot')
+    parser.add_argument('--chunk-size', type=int, default=64, help='Rows read from the CSV at a time')
+    parser.add_argument('--batch-size', type=int, default=8, help='Texts per model forward pass')
+    parser.add_argument('--workers', type=int, default=0, help='Worker processes (0 runs in-process)')
+    parser.add_argument('--limit', type=int, default=None, help='Only evaluate roughly this many rows')
+    parser.add_argument('--holdout-only', action='store_true',
+                        help=f'Only evaluate the {HOLDOUT_PERCENT}%% of rows the fast model never trains on '
+                             '(always on for the cascade backend)')
+    args = parser.parse_args()
+
+    summary = evaluate(args.csv, args.backend, args.chunk_size, args.batch_size, args.workers, args.limit,
+                       args.holdout_only)
+    print_summary(summary)
+
+
+if __name__ == "__main__":
+    main()
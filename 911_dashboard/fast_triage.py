@@ -0,0 +1,188 @@
+import argparse
+import csv
+import json
+import math
+import os
+import random
+import re
+import tempfile
+import zlib
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+DEFAULT_CSV = os.path.join(DATA_DIR, 'mock_911_texts.csv')
+DEFAULT_MODEL = os.path.join(DATA_DIR, 'fast_triage.json')
+
+N_FEATURES = 2 ** 18
+CHAR_NGRAMS = (3, 4, 5)
+
+# Percentage of messages never trained on, so evaluate.py can score the
+# cascade on texts the fast model has not seen. The split hashes the message,
+# so it is the same in every process and duplicates stay on one side.
+HOLDOUT_PERCENT = 20
+
+# Map the dataset's emergency_type column onto the classifier's candidate
+# labels. Types without a matching candidate label are kept as-is.
+LABEL_MAP = {
+    "Medical": "medical emergency",
+    "Fire": "fire emergency",
+    "Crime": "police emergency",
+    "Accident": "traffic accident",
+}
+
+
+def features(text):
+    """Hash word and character n-grams of a text into a sparse {index: count} dict"""
+    text = text.lower()
+    words = re.findall(r"[a-z0-9]+", text)
+    grams = [f"w:{w}" for w in words]
+    grams += [f"b:{a}_{b}" for a, b in zip(words, words[1:])]
+    # Character n-grams cope with run-together and leetspeak texts like "hlpmedicalbeach"
+    padded = f" {' '.join(words)} "
+    for n in CHAR_NGRAMS:
+        grams += [f"c:{padded[i:i + n]}" for i in range(len(padded) - n + 1)]
+
+    counts = {}
+    for gram in grams:
+        index = zlib.crc32(gram.encode()) % N_FEATURES
+        counts[index] = counts.get(index, 0) + 1
+    # L2-normalise so long and short messages produce comparable scores
+    norm = math.sqrt(sum(v * v for v in counts.values())) or 1.0
+    return {index: v / norm for index, v in counts.items()}
+
+
+def is_holdout(text):
+    return zlib.crc32(text.encode()) % 100 < HOLDOUT_PERCENT
+
+
+def softmax(logits):
+    top = max(logits)
+    exps = [math.exp(x - top) for x in logits]
+    total = sum(exps)
+    return [x / total for x in exps]
+
+
+class FastTriage:
+    """Multinomial logistic regression over hashed n-gram features"""
+
+    def __init__(self, labels, weights=None, bias=None):
+        self.labels = list(labels)
+        self.weights = weights if weights is not None else {}
+        self.bias = bias if bias is not None else [0.0] * len(self.labels)
+
+    def logits(self, feats):
+        out = list(self.bias)
+        for index, value in feats.items():
+            row = self.weights.get(index)
+            if row is not None:
+                for k, w in enumerate(row):
+                    out[k] += w * value
+        return out
+
+    def predict_proba(self, text):
+        return softmax(self.logits(features(text)))
+
+    def predict(self, text):
+        """Return (label, probability) for the most likely label"""
+        probs = self.predict_proba(text)
+        best = max(range(len(probs)), key=probs.__getitem__)
+        return self.labels[best], probs[best]
+
+    def fit(self, texts, targets, epochs=15, lr=0.5, l2=1e-5, seed=0):
+        samples = [(features(t), self.labels.index(y)) for t, y in zip(texts, targets)]
+        rng = random.Random(seed)
+        n_labels = len(self.labels)
+        for epoch in range(epochs):
+            rng.shuffle(samples)
+            step = lr / (1 + epoch)
+            for feats, target in samples:
+                probs = softmax(self.logits(feats))
+                grad = [p - (1.0 if k == target else 0.0) for k, p in enumerate(probs)]
+                for k in range(n_labels):
+                    self.bias[k] -= step * grad[k]
+                for index, value in feats.items():
+                    row = self.weights.setdefault(index, [0.0] * n_labels)
+                    for k in range(n_labels):
+                        row[k] -= step * (grad[k] * value + l2 * row[k])
+        return self
+
+    def save(self, path):
+        # Write to a temp file and rename so readers never load a half-written model
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump({
+                    "labels": self.labels,
+                    "n_features": N_FEATURES,
+                    "bias": self.bias,
+                    "weights": {str(i): [round(w, 6) for w in row] for i, row in self.weights.items()},
+                }, f)
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        if data["n_features"] != N_FEATURES:
+            raise ValueError(f"{path} was trained with {data['n_features']} features, expected {N_FEATURES}")
+        weights = {int(i): row for i, row in data["weights"].items()}
+        return cls(data["labels"], weights, data["bias"])
+
+
+def read_labeled(path, label_map=None):
+    texts, targets = [], []
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            target = row['emergency_type']
+            if label_map is not None:
+                target = label_map.get(target, target)
+            texts.append(row['message'])
+            targets.append(target)
+    return texts, targets
+
+
+def train(csv_path=DEFAULT_CSV, label_map=None, seed=0):
+    """Fit on every row outside the held-out split; returns (model, held-out accuracy)"""
+    texts, targets = read_labeled(csv_path, label_map)
+    rows = list(zip(texts, targets))
+    test = [(t, y) for t, y in rows if is_holdout(t)]
+    fit_rows = [(t, y) for t, y in rows if not is_holdout(t)]
+
+    model = FastTriage(sorted(set(targets)))
+    model.fit([t for t, _ in fit_rows], [y for _, y in fit_rows], seed=seed)
+
+    accuracy = None
+    if test:
+        accuracy = sum(model.predict(t)[0] == y for t, y in test) / len(test)
+    return model, accuracy
+
+
+def ensure_model(path=DEFAULT_MODEL, csv_path=DEFAULT_CSV):
+    """Train and save the model unless path already exists.
+
+    Call this once before starting worker processes, so they only ever
+    load the file.
+    """
+    if not os.path.exists(path):
+        model, _ = train(csv_path, LABEL_MAP)
+        model.save(path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the fast triage model on labeled 911 texts')
+    parser.add_argument('--csv', default=DEFAULT_CSV)
+    parser.add_argument('--out', default=DEFAULT_MODEL)
+    args = parser.parse_args()
+
+    model, accuracy = train(args.csv, LABEL_MAP)
+    if accuracy is not None:
+        print(f"Held-out accuracy ({HOLDOUT_PERCENT}% of rows): {accuracy:.2%}")
+    model.save(args.out)
+    print(f"Model saved to: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+import argparse
+import os
+import time
+from contextlib import contextmanager
+
+import torch
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+from classifier import CANDIDATE_LABELS, decide
+
+MODEL_NAME = "facebook/bart-large-mnli"
+# Same template the zero-shot pipeline uses, so both paths score identical pairs
+HYPOTHESIS_TEMPLATE = "This example is {}."
+MAX_PREMISE_TOKENS = 256
+
+# Leave cores for the YOLO workers; override with CLASSIFIER_THREADS
+DEFAULT_THREADS = int(os.environ.get("CLASSIFIER_THREADS", 2))
+
+
+def limit_threads(n):
+    """Process-wide thread limits; only for entry points that own the process, like the benchmark"""
+    torch.set_num_threads(n)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Can only be set before the first parallel op in the process
+        pass
+
+
+@contextmanager
+def torch_threads(n):
+    """Run the block with n intra-op threads, then restore the previous count"""
+    previous = torch.get_num_threads()
+    torch.set_num_threads(n)
+    try:
+        yield
+    finally:
+        torch.set_num_threads(previous)
+
+
+class QuantizedZeroShot:
+    """int8 dynamically-quantized NLI model with the hypothesis side tokenized once.
+
+    Scoring uses `threads` torch threads and restores the process's setting
+    afterwards, so the YOLO workers sharing the process keep theirs.
+    """
+
+    def __init__(self, model_name=MODEL_NAME, labels=CANDIDATE_LABELS, threads=DEFAULT_THREADS, quantize=True):
+        self.threads = threads
+        self.labels = list(labels)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModelForSequenceClassification.from_pretrained(model_name).eval()
+        if quantize:
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = model
+
+        label2id = {k.lower(): v for k, v in model.config.label2id.items()}
+        self.entailment_id = label2id["entailment"]
+        self.contradiction_id = label2id["contradiction"]
+
+        # Fixed labels never change, so their token ids are computed once here
+        self.hypothesis_ids = [
+            self.tokenizer(HYPOTHESIS_TEMPLATE.format(label), add_special_tokens=False)["input_ids"]
+            for label in self.labels
+        ]
+
+    def _pairs(self, text):
+        premise = self.tokenizer(text, add_special_tokens=False, truncation=True,
+                                 max_length=MAX_PREMISE_TOKENS)["input_ids"]
+        return [self.tokenizer.build_inputs_with_special_tokens(premise, h) for h in self.hypothesis_ids]
+
+    def _forward(self, rows):
+        width = max(len(r) for r in rows)
+        pad = self.tokenizer.pad_token_id
+        input_ids = torch.full((len(rows), width), pad, dtype=torch.long)
+        attention_mask = torch.zeros((len(rows), width), dtype=torch.long)
+        for i, row in enumerate(rows):
+            input_ids[i, :len(row)] = torch.tensor(row)
+            attention_mask[i, :len(row)] = 1
+        with torch.inference_mode():
+            logits = self.model(input_ids=input_ids, attention_mask=attention_mask).logits
+        # multi_label=True scoring: entailment vs contradiction for each pair
+        pair = logits[:, [self.contradiction_id, self.entailment_id]]
+        return pair.softmax(dim=-1)[:, 1].tolist()
+
+    def scores(self, texts, batch_size=8):
+        rows = [row for text in texts for row in self._pairs(text)]
+        n = len(self.labels)
+        step = batch_size * n
+        flat = []
+        with torch_threads(self.threads):
+            for i in range(0, len(rows), step):
+                flat.extend(self._forward(rows[i:i + step]))
+        return [flat[i:i + n] for i in range(0, len(flat), n)]
+
+    def classify(self, texts, batch_size=8):
+        return [decide({"labels": self.labels, "scores": s}) for s in self.scores(texts, batch_size)]
+
+
+_quantized = None
+
+
+def get_quantized():
+    global _quantized
+    if _quantized is None:
+        _quantized = QuantizedZeroShot()
+    return _quantized
+
+
+def classify_quantized(texts, batch_size=8):
+    """Batch classifier backed by the quantized model, same output as classify_batch"""
+    if not texts:
+        return []
+    return get_quantized().classify(list(texts), batch_size=batch_size)
+
+
+def benchmark(limit=200, threads=DEFAULT_THREADS):
+    from classifier import classify_batch, get_classifier
+    from evaluate import DEFAULT_CSV, percentile, read_chunks
+
+    texts = [text for chunk in read_chunks(DEFAULT_CSV, limit) for text, _ in chunk][:limit]
+
+    limit_threads(threads)
+    get_classifier()
+    quantized = get_quantized()
+
+    results = {}
+    for name, run in (("fp32", lambda t: classify_batch(t, batch_size=1)),
+                      ("int8", lambda t: quantized.classify(t, batch_size=1))):
+        run(texts[:1])  # warm up
+        latencies, predictions = [], []
+        for text in texts:
+            start = time.perf_counter()
+            predictions.append(run([text])[0][0])
+            latencies.append(time.perf_counter() - start)
+        results[name] = (predictions, latencies)
+
+    fp32, int8 = results["fp32"][0], results["int8"][0]
+    agreement = sum(a == b for a, b in zip(fp32, int8)) / len(texts)
+
+    print(f"\nTexts: {len(texts)}, torch threads: {threads}")
+    for name, (_, latencies) in results.items():
+        print(f"{name}: p50 {percentile(latencies, 50) * 1000:.1f}ms, "
+              f"p95 {percentile(latencies, 95) * 1000:.1f}ms, "
+              f"mean {sum(latencies) / len(latencies) * 1000:.1f}ms")
+    print(f"Prediction agreement (int8 vs fp32): {agreement:.2%}")
+    return agreement
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the quantized classifier against the fp32 pipeline')
+    parser.add_argument('--limit', type=int, default=200, help='Texts from the mock dataset to compare')
+    parser.add_argument('--threads', type=int, default=DEFAULT_THREADS)
+    args = parser.parse_args()
+    benchmark(args.limit, threads=args.threads)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,53 +1,218 @@
+import json
+import os
+import time
+import uuid
 from collections import deque
 
 import cv2
 import numpy as np
-from deep_sort_realtime.deepsort_tracker import DeepSort
-from ultralytics import YOLO
+
+from crowd import DoorFlow
+from detectors import DEFAULT_IMGSZ, make_detector
+from dispatch.logger import configure_logging, get_logger
+from kinematics import TrackKinematics
+from motion_gate import MotionGate
+from resolution import ResolutionController
+from trackers import make_tracker
+
+# Per-frame events; TRACKER_LOG_SAMPLE < 1 keeps only that fraction of them
+event_logger = get_logger(
+    "tracker.events", sample_rate=float(os.getenv("TRACKER_LOG_SAMPLE", "1.0"))
+)
+
+
+PERSON_MODEL_PATH = "yolov8n.pt"
+DOOR_MODEL_PATH = "runs/detect/train10/weights/best.pt"
+
+# Per-door zone status codes, stored per track as one int8 per door
+OUTSIDE, BIG_ZONE, SMALL_ZONE, ENTERED, EXITED = range(5)
+STATUS_NAMES = ("outside", "big_zone", "small_zone", "entered", "exited")
+
+# Counting parameters a config file may override; sweep.py searches over these
+TUNABLE_PARAMS = (
+    "HEIGHT_HISTORY_LENGTH",
+    "MIN_HEIGHT_CHANGE",
+    "MIN_FRAMES_FOR_DIRECTION",
+    "MAX_MISSING_FRAMES",
+    "BIG_ZONE_SCALE_X",
+    "BIG_ZONE_SCALE_Y",
+    "SMALL_ZONE_SCALE",
+    "SPEED_THRESHOLD",
+    "DETECT_INTERVAL",
+)
+
+
+def load_counting_config(path):
+    """Read tuned counting parameters, as written by sweep.py --export"""
+    with open(path) as f:
+        data = json.load(f)
+    params = data.get("params", data)
+    unknown = set(params) - set(TUNABLE_PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown counting parameters in {path}: {sorted(unknown)}")
+    return params
+
+
+class Door:
+    """One calibrated door: its box, its two zones and its own counters"""
+
+    def __init__(self, box, big_rect, small_rect):
+        self.box = box
+        self.big_rect = big_rect
+        self.small_rect = small_rect
+        self.entered_count = 0
+        self.exited_count = 0
+        self.entered_ids = set()
+        self.exited_ids = set()
+
+    @staticmethod
+    def polygon(rect):
+        x1, y1, x2, y2 = rect
+        return [(x1, y1), (x2, y1), (x2, y2), (x1, y2)]
+
+    @property
+    def big_zone(self):
+        return self.polygon(self.big_rect)
+
+    @property
+    def small_zone(self):
+        return self.polygon(self.small_rect)
+
+    def summary(self, index):
+        return {
+            "door": index,
+            "box": list(self.box),
+            "entered": self.entered_count,
+            "exited": self.exited_count,
+            "occupancy": max(0, self.entered_count - self.exited_count),
+        }
 
 
 class DoorPersonTracker:
     def __init__(
         self,
-        person_model_path="yolov8n.pt",
-        door_model_path="runs/detect/train10/weights/best.pt",
+        person_model_path=PERSON_MODEL_PATH,
+        door_model_path=DOOR_MODEL_PATH,
         fps=30,
+        backend=None,
+        latency_budget_ms=None,
+        tracker_backend=None,
+        models=True,
+        config_path=None,
+        motion_gate=None,
+        detectors=None,
     ):
         self.person_model_path = person_model_path
         self.door_model_path = door_model_path
         self.fps = fps
+        self.backend = backend
+        self.tracker_backend = tracker_backend
+        if latency_budget_ms is None:
+            # 0 disables adaptive sizing and keeps the person model at DEFAULT_IMGSZ
+            latency_budget_ms = float(os.getenv("PERSON_LATENCY_BUDGET_MS", "50"))
+        self.resolution = ResolutionController(latency_budget_ms, start_size=DEFAULT_IMGSZ)
+        if motion_gate is None:
+            motion_gate = os.getenv("MOTION_GATE", "1") != "0"
+        # Skips person detection while the doorway is still and nobody is tracked
+        self.gate = MotionGate(hold_frames=max(1, fps // 2)) if motion_gate else None
+        # Set to a replay.DetectionRecorder to save each frame's detections
+        self.recorder = None
+        # models=False builds a counting-only tracker, e.g. to replay recordings
+        self.models = models
+        # Tuned counting parameters, applied on every reset
+        config_path = config_path or os.getenv("COUNTING_CONFIG")
+        self.counting_config = load_counting_config(config_path) if config_path else {}
+        if detectors is not None:
+            # (person, door) detectors shared with other trackers, e.g. SharedDetector
+            self.person_model, self.door_model = detectors
+        elif models:
+            self.load_models()
         self.reset()
 
+    def load_models(self):
+        """Load both detectors; slow, so only done once per tracker"""
+        self.person_model = make_detector(self.person_model_path, self.backend)
+        self.door_model = make_detector(self.door_model_path, self.backend)
+
     def reset(self):
         """Reset all tracking state variables"""
-        self.person_model = YOLO(self.person_model_path)
-        self.door_model = YOLO(self.door_model_path)
-        self.tracker = DeepSort(max_age=30)
+        self.tracker = make_tracker(self.tracker_backend, max_age=30) if self.models else None
+        self.resolution.reset()
+        if self.gate is not None:
+            self.gate.reset()
 
         self.FPS = self.fps
         self.frame_count = 0
 
         self.door_found = False
+        self.doors = []
+        self.frame_size = None
+        self._big_rects = np.zeros((0, 4), np.int32)
+        self._small_rects = np.zeros((0, 4), np.int32)
+        # First door's calibration, kept for single-door callers
         self.fixed_door_box = None
         self.BIG_ZONE = []
         self.SMALL_ZONE = []
 
         self.entered_count = 0
         self.exited_count = 0
+        # Counting events of the latest frame, for clip capture and other listeners
+        self.events = []
 
         self.id_active = set()
-        self.track_history = {}
+        self.kinematics = {}
         self.id_status = {}
+        self.door_status = {}
         self.entered_ids = set()
         self.exited_ids = set()
         self.last_seen_frame = {}
-        self.height_history = {}
+
+        # Runners, as in PeopleNumDetection/VideoVersion.py
+        self.runner_count = 0
+        self.counted_runners = set()
+        self.running_now = 0
+        self.runner_frames = deque()
+        self.panic = False
+
+        # Crowd mode: counts come from optical flow instead of per-person tracks
+        self.crowd_mode = False
+        self.crowd_frames = 0
+        self.crowd_streak = 0
+        self.crowd_entered = 0
+        self.crowd_exited = 0
+        self.crowd_frame_ms = None
+        self.door_flows = []
+        self.door_density = np.zeros(0, np.float32)
 
         self.HEIGHT_HISTORY_LENGTH = 10
         self.MIN_HEIGHT_CHANGE = 5
         self.MIN_FRAMES_FOR_DIRECTION = 5
         self.MAX_MISSING_FRAMES = 30
         self.DOOR_CONFIDENCE = 0.3
+        self.MAX_DOORS = 4
+        self.DOOR_OVERLAP_IOU = 0.5
+        # Zone sizes relative to the door box
+        self.BIG_ZONE_SCALE_X = 1.8
+        self.BIG_ZONE_SCALE_Y = 1.4
+        self.SMALL_ZONE_SCALE = 0.5
+        # Pixels per frame, averaged over MIN_FRAMES_FOR_RUN frames
+        self.SPEED_THRESHOLD = 15
+        self.MIN_FRAMES_FOR_RUN = max(2, int(0.5 * self.FPS))
+        # This many new runners within PANIC_WINDOW_SECONDS raises the panic flag
+        self.PANIC_RUNNERS = 3
+        self.PANIC_WINDOW_SECONDS = 5
+        # People near the doors that switch to crowd mode, held for CROWD_CONFIRM_FRAMES
+        self.CROWD_ENTER_PEOPLE = 25
+        self.CROWD_CONFIRM_FRAMES = 5
+        # Crowd mode ends after two detector samples at or below this many people
+        self.CROWD_EXIT_PEOPLE = 12
+        self.CROWD_DETECT_INTERVAL = max(1, self.FPS // 2)
+        # Image direction a person moves in while entering (away from the camera)
+        self.CROWD_ENTRY_DIRECTION = (0.0, -1.0)
+        # Run the person model on every Nth frame only; tracks carry over in between
+        self.DETECT_INTERVAL = 1
+        for name, value in self.counting_config.items():
+            setattr(self, name, value)
 
     def point_in_polygon(self, point, polygon):
         return (
@@ -55,83 +220,324 @@ class DoorPersonTracker:
             and cv2.pointPolygonTest(np.array(polygon, np.int32), point, False) >= 0
         )
 
-    def calculate_height_trend(self, heights):
-        if len(heights) < self.MIN_FRAMES_FOR_DIRECTION:
+    def calculate_height_trend(self, kinematics):
+        if self.MIN_FRAMES_FOR_DIRECTION > self.HEIGHT_HISTORY_LENGTH:
             return 0
-        recent_heights = list(heights)[-self.MIN_FRAMES_FOR_DIRECTION :]
-        total_change = recent_heights[-1] - recent_heights[0]
-        if abs(total_change) < self.MIN_HEIGHT_CHANGE:
+        total_change = kinematics.height_change(self.MIN_FRAMES_FOR_DIRECTION)
+        if total_change is None or abs(total_change) < self.MIN_HEIGHT_CHANGE:
             return 0
         return 1 if total_change > 0 else -1
 
+    def check_runner(self, tid, kinematics):
+        """Count a track once when its smoothed speed goes over SPEED_THRESHOLD"""
+        if not kinematics.full() or kinematics.speed() <= self.SPEED_THRESHOLD:
+            return False
+        if tid not in self.counted_runners:
+            self.counted_runners.add(tid)
+            self.runner_count += 1
+            self.runner_frames.append(self.frame_count)
+            event_logger.info(
+                "RUNNER: %s (%.1f px/frame, accel %.2f)",
+                tid, kinematics.speed(), kinematics.acceleration(),
+            )
+        return True
+
+    def update_panic(self):
+        window = self.PANIC_WINDOW_SECONDS * self.FPS
+        while self.runner_frames and self.frame_count - self.runner_frames[0] > window:
+            self.runner_frames.popleft()
+        panic = len(self.runner_frames) >= self.PANIC_RUNNERS
+        if panic and not self.panic:
+            event_logger.warning(
+                "PANIC: %d runners in %ds", len(self.runner_frames), self.PANIC_WINDOW_SECONDS
+            )
+        self.panic = panic
+
+    def runner_stats(self):
+        return {
+            "runner_count": self.runner_count,
+            "running_now": self.running_now,
+            "panic": self.panic,
+        }
+
+    def set_doors(self, boxes, width, height):
+        """Build zones for up to MAX_DOORS door boxes, most confident first"""
+        doors = []
+        for x1, y1, x2, y2 in boxes:
+            if len(doors) >= self.MAX_DOORS:
+                break
+            # The door model can fire twice on one door; keep the first box
+            if any(self._box_iou((x1, y1, x2, y2), d.box) > self.DOOR_OVERLAP_IOU for d in doors):
+                continue
+
+            door_w = x2 - x1
+            door_h = y2 - y1
+            center_x = x1 + door_w / 2
+            center_y = y1 + door_h / 2
+
+            big_w = door_w * self.BIG_ZONE_SCALE_X
+            big_h = door_h * self.BIG_ZONE_SCALE_Y
+            big_rect = (
+                int(max(0, center_x - big_w / 2)),
+                int(max(0, center_y - big_h / 2)),
+                int(min(width, center_x + big_w / 2)),
+                int(min(height, center_y + big_h / 2)),
+            )
+
+            small_w = door_w * self.SMALL_ZONE_SCALE
+            small_h = door_h * self.SMALL_ZONE_SCALE
+            small_rect = (
+                int(center_x - small_w / 2),
+                int(center_y - small_h / 2),
+                int(center_x + small_w / 2),
+                int(center_y + small_h / 2),
+            )
+            doors.append(Door((x1, y1, x2, y2), big_rect, small_rect))
+
+        if doors:
+            self.use_doors(doors, width, height)
+
+    def use_doors(self, doors, width, height):
+        """Count at these calibrated doors from now on"""
+        self.doors = doors
+        self.frame_size = (width, height)
+        self._big_rects = np.array([d.big_rect for d in doors], np.int32)
+        self._small_rects = np.array([d.small_rect for d in doors], np.int32)
+        if self.gate is not None:
+            self.gate.set_roi(self._big_rects, width, height)
+        self.fixed_door_box = doors[0].box
+        self.BIG_ZONE = doors[0].big_zone
+        self.SMALL_ZONE = doors[0].small_zone
+        self.door_found = True
+
+    def forget_doors(self):
+        """Drop the door calibration, e.g. for a different camera; the counts stay"""
+        if self.crowd_mode:
+            self.leave_crowd_mode()
+        self.door_found = False
+        self.doors = []
+        self.frame_size = None
+        self._big_rects = np.zeros((0, 4), np.int32)
+        self._small_rects = np.zeros((0, 4), np.int32)
+        self.fixed_door_box = None
+        self.BIG_ZONE = []
+        self.SMALL_ZONE = []
+        self.door_status.clear()
+        if self.gate is not None:
+            self.gate.reset()
+
+    @staticmethod
+    def _box_iou(a, b):
+        ix = max(0, min(a[2], b[2]) - max(a[0], b[0]))
+        iy = max(0, min(a[3], b[3]) - max(a[1], b[1]))
+        inter = ix * iy
+        union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+        return inter / union if union > 0 else 0.0
+
+    def classify_zones(self, centers):
+        """Zone status of each point for each door, as an (N, doors) int8 array"""
+        cx = centers[:, 0:1]
+        cy = centers[:, 1:2]
+
+        def inside(rects):
+            return (
+                (cx >= rects[:, 0]) & (cx <= rects[:, 2])
+                & (cy >= rects[:, 1]) & (cy <= rects[:, 3])
+            )
+
+        return np.where(
+            inside(self._small_rects),
+            SMALL_ZONE,
+            np.where(inside(self._big_rects), BIG_ZONE, OUTSIDE),
+        ).astype(np.int8)
+
+    @staticmethod
+    def summarize_status(status):
+        """Collapse per-door status to one label for drawing"""
+        for code in (ENTERED, EXITED, SMALL_ZONE, BIG_ZONE):
+            if (status == code).any():
+                return STATUS_NAMES[code]
+        return "outside"
+
     def process_frame(self, frame):
         self.frame_count += 1
+        self.events = []
         height, width, _ = frame.shape
 
-        # Detect door once
+        # Doors calibrated at another resolution (e.g. restored) do not fit this camera
+        if self.door_found and self.frame_size != (width, height):
+            event_logger.warning("Frame size changed to %dx%d; detecting doors again", width, height)
+            self.forget_doors()
+
+        # Detect doors once
         if not self.door_found:
-            door_results_list = self.door_model(frame, verbose=False)
-            if door_results_list:
-                door_results = door_results_list[0]
-                for box in door_results.boxes:
-                    if box.conf[0] > self.DOOR_CONFIDENCE:
-                        x1, y1, x2, y2 = map(int, box.xyxy[0])
-                        self.fixed_door_box = (x1, y1, x2, y2)
-
-                        door_w = x2 - x1
-                        door_h = y2 - y1
-                        center_x = x1 + door_w / 2
-                        center_y = y1 + door_h / 2
-
-                        big_w = door_w * 1.8
-                        big_h = door_h * 1.4
-                        big_x1 = int(max(0, center_x - big_w / 2))
-                        big_y1 = int(max(0, center_y - big_h / 2))
-                        big_x2 = int(min(width, center_x + big_w / 2))
-                        big_y2 = int(min(height, center_y + big_h / 2))
-                        self.BIG_ZONE = [
-                            (big_x1, big_y1),
-                            (big_x2, big_y1),
-                            (big_x2, big_y2),
-                            (big_x1, big_y2),
-                        ]
-
-                        small_w = door_w * 0.5
-                        small_h = door_h * 0.5
-                        small_x1 = int(center_x - small_w / 2)
-                        small_y1 = int(center_y - small_h / 2)
-                        small_x2 = int(center_x + small_w / 2)
-                        small_y2 = int(center_y + small_h / 2)
-                        self.SMALL_ZONE = [
-                            (small_x1, small_y1),
-                            (small_x2, small_y1),
-                            (small_x2, small_y2),
-                            (small_x1, small_y2),
-                        ]
-
-                        self.door_found = True
-                        break
+            door_results = self.door_model(frame)
+            boxes = [
+                tuple(map(int, xyxy))
+                for xyxy, conf in zip(door_results.xyxy, door_results.conf)
+                if conf > self.DOOR_CONFIDENCE
+            ]
+            self.set_doors(boxes, width, height)
+            if self.recorder is not None and self.door_found:
+                self.recorder.record_doors(self.frame_count, boxes)
+
+        if self.crowd_mode:
+            entered, exited = self.entered_count, self.exited_count
+            self.process_crowd_frame(frame)
+            if self.recorder is not None:
+                self.recorder.record_crowd_frame(self.entered_count - entered, self.exited_count - exited)
+            return frame
 
-        # Detect people
-        person_results_list = self.person_model(frame, verbose=False)
-        if not person_results_list:
+        if self.frame_count % self.DETECT_INTERVAL or (
+            self.gate is not None
+            and self.door_found
+            and self.gate.should_skip(frame, bool(self.last_seen_frame))
+        ):
+            if self.recorder is not None:
+                self.recorder.record_frame(np.zeros((0, 4), np.float32), np.zeros(0, np.float32), [])
+            self.count_tracks([])
             return frame
-        person_results = person_results_list[0]
+        frame_start = time.perf_counter()
+
+        # Detect people
+        start = time.perf_counter()
+        person_results = self.person_model(frame, self.resolution.size)
+        inference_ms = (time.perf_counter() - start) * 1000
         detections = []
+        near_door_heights = []
 
-        for box, conf, cls in zip(
-            person_results.boxes.xywh,
-            person_results.boxes.conf,
-            person_results.boxes.cls,
+        for (x1, y1, x2, y2), conf, cls in zip(
+            person_results.xyxy,
+            person_results.conf,
+            person_results.cls,
         ):
             if int(cls) == 0:  # person class
-                x_center, y_center, w, h = box
-                x = x_center - w / 2
-                y = y_center - h / 2
-                detections.append(([x, y, w, h], conf.item(), "person"))
+                detections.append(
+                    ([float(x1), float(y1), float(x2 - x1), float(y2 - y1)], float(conf), "person")
+                )
+                center = np.array([[(x1 + x2) / 2, (y1 + y2) / 2]])
+                if not self.doors or (self.classify_zones(center) != OUTSIDE).any():
+                    near_door_heights.append(float(y2 - y1))
+
+        self.resolution.observe(inference_ms, near_door_heights, max(height, width))
+
+        if self.door_found and len(near_door_heights) >= self.CROWD_ENTER_PEOPLE:
+            self.crowd_streak += 1
+            if self.crowd_streak >= self.CROWD_CONFIRM_FRAMES:
+                self.enter_crowd_mode(person_results)
+                if self.recorder is not None:
+                    self.recorder.record_crowd_frame(0, 0)
+                return frame
+        else:
+            self.crowd_streak = 0
 
         tracks = self.tracker.update_tracks(detections, frame=frame)
+        if self.recorder is not None:
+            people = person_results.cls == 0
+            self.recorder.record_frame(
+                person_results.xyxy[people], person_results.conf[people], tracks
+            )
+        self.count_tracks(tracks)
+        if self.gate is not None:
+            self.gate.observe((time.perf_counter() - frame_start) * 1000)
+
+        return frame
+
+    def update_density(self, person_results):
+        """People per pixel in each door's big zone, from one detector pass"""
+        people = person_results.xyxy[person_results.cls == 0]
+        centers = np.column_stack([(people[:, 0] + people[:, 2]) / 2, (people[:, 1] + people[:, 3]) / 2])
+        near = (self.classify_zones(centers) != OUTSIDE).sum(axis=0)
+        rects = self._big_rects
+        areas = np.maximum((rects[:, 2] - rects[:, 0]) * (rects[:, 3] - rects[:, 1]), 1)
+        self.door_density = near / areas
+        return int(near.sum())
+
+    def enter_crowd_mode(self, person_results):
+        """Stop tracking individuals; their partial state would only cause false counts"""
+        self.crowd_mode = True
+        self.crowd_frames = 0
+        self.crowd_streak = 0
+        people = self.update_density(person_results)
+        self.door_flows = [
+            DoorFlow(door.small_rect, self.CROWD_ENTRY_DIRECTION) for door in self.doors
+        ]
+        self.drop_tracks()
+        event_logger.warning("CROWD MODE: %d people near the doors", people)
+
+    def drop_tracks(self):
+        """Forget every track without counting it.
+
+        The tracker is rebuilt after crowd mode and numbers its tracks from 1
+        again, so the IDs already counted are forgotten too.
+        """
+        for d in [self.kinematics, self.id_status, self.door_status, self.last_seen_frame]:
+            d.clear()
+        self.entered_ids.clear()
+        self.exited_ids.clear()
+        for door in self.doors:
+            door.entered_ids.clear()
+            door.exited_ids.clear()
+        self.id_active.clear()
+        self.counted_runners.clear()
+        self.running_now = 0
+
+    def leave_crowd_mode(self):
+        self.crowd_mode = False
+        self.crowd_streak = 0
+        self.door_flows = []
+        # Old tracks are stale after the gap, so start the tracker afresh
+        if self.models:
+            self.tracker = make_tracker(self.tracker_backend, max_age=30)
+        event_logger.warning(
+            "TRACKING MODE: crowd cleared after %d frames (%d in, %d out by flow)",
+            self.crowd_frames, self.crowd_entered, self.crowd_exited,
+        )
+
+    def process_crowd_frame(self, frame):
+        """Fixed-cost counting: optical flow per door, detector once per interval"""
+        start = time.perf_counter()
+        self.crowd_frames += 1
+        if self.crowd_frames % self.CROWD_DETECT_INTERVAL == 0:
+            people = self.update_density(self.person_model(frame, self.resolution.size))
+            if people <= self.CROWD_EXIT_PEOPLE:
+                self.crowd_streak += 1
+                if self.crowd_streak >= 2:
+                    self.leave_crowd_mode()
+                    return
+            else:
+                self.crowd_streak = 0
+
+        for d, flow in enumerate(self.door_flows):
+            entered, exited = flow.update(frame, float(self.door_density[d]))
+            if entered or exited:
+                door = self.doors[d]
+                door.entered_count += entered
+                door.exited_count += exited
+                self.entered_count += entered
+                self.exited_count += exited
+                self.crowd_entered += entered
+                self.crowd_exited += exited
+                event_logger.info("CROWD FLOW: +%d in, +%d out (door %d)", entered, exited, d)
+        self.crowd_frame_ms = (time.perf_counter() - start) * 1000
+
+    def gate_stats(self):
+        return self.gate.stats() if self.gate is not None else {"enabled": False}
+
+    def crowd_stats(self):
+        return {
+            "mode": "crowd" if self.crowd_mode else "tracking",
+            "crowd_frame_ms": None if self.crowd_frame_ms is None else round(self.crowd_frame_ms, 2),
+            "crowd_entered": self.crowd_entered,
+            "crowd_exited": self.crowd_exited,
+        }
+
+    def count_tracks(self, tracks):
+        """Update zone status and door counters from this frame's tracker output"""
+        self.events = []
         current_ids = set()
+        tids, centers, trends = [], [], []
+        running = 0
 
         for track in tracks:
             if not track.is_confirmed():
@@ -142,50 +548,56 @@ class DoorPersonTracker:
             center_point = ((x1 + x2) // 2, (y1 + y2) // 2)
             current_ids.add(tid)
 
-            # Track height trend
-            height_val = y2 - y1
-            if tid not in self.height_history:
-                self.height_history[tid] = deque(maxlen=self.HEIGHT_HISTORY_LENGTH)
-            self.height_history[tid].append(height_val)
-            trend = self.calculate_height_trend(self.height_history[tid])
-
-            in_big = self.point_in_polygon(center_point, self.BIG_ZONE)
-            in_small = self.point_in_polygon(center_point, self.SMALL_ZONE)
-            prev_status = self.id_status.get(tid, "outside")
-
-            if in_small:
-                self.id_status[tid] = "small_zone"
-            elif in_big:
-                self.id_status[tid] = "big_zone"
-            else:
-                self.id_status[tid] = "outside"
-
-            if (
-                prev_status in ["big_zone", "outside"]
-                and self.id_status[tid] == "small_zone"
-                and trend == -1
-            ):
-                if tid not in self.entered_ids:
-                    self.entered_ids.add(tid)
-                    self.entered_count += 1
-                    print(f"ENTERED: {tid}")
-                    self.id_status[tid] = "entered"
-
-            if (
-                prev_status in ["big_zone", "small_zone", "entered"]
-                and self.id_status[tid] == "outside"
-                and trend == 1
-            ):
-                if tid not in self.exited_ids:
-                    self.exited_ids.add(tid)
-                    self.exited_count += 1
-                    print(f"EXITED: {tid}")
-                    self.id_status[tid] = "exited"
+            kinematics = self.kinematics.get(tid)
+            if kinematics is None:
+                kinematics = TrackKinematics(
+                    max(self.HEIGHT_HISTORY_LENGTH, self.FPS), self.MIN_FRAMES_FOR_RUN
+                )
+                self.kinematics[tid] = kinematics
+            kinematics.update(center_point[0], center_point[1], y2 - y1)
+
+            tids.append(tid)
+            centers.append(center_point)
+            trends.append(self.calculate_height_trend(kinematics))
+            running += self.check_runner(tid, kinematics)
 
             self.last_seen_frame[tid] = self.frame_count
-            history = self.track_history.get(tid, deque(maxlen=self.FPS))
-            history.append(center_point[0])
-            self.track_history[tid] = history
+
+        self.running_now = running
+        self.update_panic()
+
+        # Classify every track against every door in one pass: (tracks, doors)
+        n_doors = len(self.doors)
+        now = self.classify_zones(np.array(centers, np.float32).reshape(-1, 2))
+        prev = np.zeros_like(now)
+        for i, tid in enumerate(tids):
+            status = self.door_status.get(tid)
+            if status is not None and len(status) == n_doors:
+                prev[i] = status
+        trend = np.array(trends, np.int8).reshape(-1, 1)
+
+        entering = np.isin(prev, (BIG_ZONE, OUTSIDE)) & (now == SMALL_ZONE) & (trend == -1)
+        exiting = np.isin(prev, (BIG_ZONE, SMALL_ZONE, ENTERED)) & (now == OUTSIDE) & (trend == 1)
+
+        for i, d in zip(*np.nonzero(entering)):
+            tid, door = tids[i], self.doors[d]
+            if tid not in door.entered_ids:
+                self._count_entry(tid, d, "ENTERED")
+                now[i, d] = ENTERED
+        for i, d in zip(*np.nonzero(exiting)):
+            tid, door = tids[i], self.doors[d]
+            if tid not in door.exited_ids:
+                door.exited_ids.add(tid)
+                door.exited_count += 1
+                self.exited_ids.add(tid)
+                self.exited_count += 1
+                event_logger.info("EXITED: %s (door %d)", tid, d)
+                self._add_event("EXITED", tid, d)
+                now[i, d] = EXITED
+
+        for i, tid in enumerate(tids):
+            self.door_status[tid] = now[i]
+            self.id_status[tid] = self.summarize_status(now[i])
 
         # Handle disappeared tracks
         disappeared_ids = [
@@ -193,27 +605,66 @@ class DoorPersonTracker:
         ]
         for tid in disappeared_ids:
             if self.frame_count - self.last_seen_frame[tid] > self.MAX_MISSING_FRAMES:
-                status = self.id_status.get(tid, "outside")
-                if status == "big_zone" and tid not in self.entered_ids:
-                    self.entered_ids.add(tid)
-                    self.entered_count += 1
-                    print(f"ASSUMED ENTRY: {tid}")
-                    self.id_status[tid] = "entered"
+                status = self.door_status.get(tid)
+                if status is not None and len(status) == n_doors and tid not in self.entered_ids:
+                    # Big zones of neighbouring doors overlap; one person enters at most one door
+                    candidates = np.nonzero(status == BIG_ZONE)[0]
+                    if len(candidates):
+                        d = self._nearest_door(tid, candidates)
+                        self._count_entry(tid, d, "ASSUMED ENTRY")
                 for d in [
                     self.last_seen_frame,
-                    self.track_history,
+                    self.kinematics,
                     self.id_status,
-                    self.height_history,
+                    self.door_status,
                 ]:
                     d.pop(tid, None)
+                self.counted_runners.discard(tid)
                 self.id_active.discard(tid)
 
         self.id_active.update(current_ids)
 
-        return frame
+    def _nearest_door(self, tid, candidates):
+        """The candidate door whose box centre is closest to the track's last position"""
+        kinematics = self.kinematics.get(tid)
+        if kinematics is None or len(candidates) == 1:
+            return candidates[0]
+        x, y, _ = kinematics.last()
+        boxes = np.array([self.doors[d].box for d in candidates], np.float32)
+        centers = (boxes[:, :2] + boxes[:, 2:]) / 2
+        return candidates[int(np.argmin(np.hypot(centers[:, 0] - x, centers[:, 1] - y)))]
+
+    def _count_entry(self, tid, d, event):
+        door = self.doors[d]
+        door.entered_ids.add(tid)
+        door.entered_count += 1
+        self.entered_ids.add(tid)
+        self.entered_count += 1
+        event_logger.info("%s: %s (door %d)", event, tid, d)
+        self._add_event(event, tid, d)
+
+    def _add_event(self, event, tid, d):
+        self.events.append({
+            "id": uuid.uuid4().hex[:12],
+            "event": event,
+            "track": tid,
+            "door": int(d),
+            "frame": self.frame_count,
+            "time": time.time(),
+        })
+
+    def trail(self, tid):
+        """Recent (x, height) points of a track, oldest first"""
+        kinematics = self.kinematics.get(tid)
+        return kinematics.history(self.HEIGHT_HISTORY_LENGTH) if kinematics else []
+
+    def door_summaries(self):
+        return [door.summary(i) for i, door in enumerate(self.doors)]
 
 
 if __name__ == "__main__":
+    configure_logging()
+
     # Initialize webcam
     cap = cv2.VideoCapture(0)  # 0 is usually the built-in webcam
 
@@ -237,12 +688,12 @@ if __name__ == "__main__":
             # Process frame and get tracks
             processed_frame = tracker.process_frame(frame)
 
-            # Draw door zones if detected
-            if tracker.door_found:
+            # Draw door zones for every detected door
+            for door in tracker.doors:
                 # Draw big zone (blue)
                 cv2.polylines(
                     processed_frame,
-                    [np.array(tracker.BIG_ZONE, np.int32)],
+                    [np.array(door.big_zone, np.int32)],
                     True,
                     (255, 0, 0),
                     2,
@@ -250,15 +701,14 @@ if __name__ == "__main__":
                 # Draw small zone (green)
                 cv2.polylines(
                     processed_frame,
-                    [np.array(tracker.SMALL_ZONE, np.int32)],
+                    [np.array(door.small_zone, np.int32)],
                     True,
                     (0, 255, 0),
                     2,
                 )
                 # Draw door box (red)
-                if tracker.fixed_door_box:
-                    x1, y1, x2, y2 = tracker.fixed_door_box
-                    cv2.rectangle(processed_frame, (x1, y1), (x2, y2), (0, 0, 255), 2)
+                x1, y1, x2, y2 = door.box
+                cv2.rectangle(processed_frame, (x1, y1), (x2, y2), (0, 0, 255), 2)
 
             # Draw person tracking boxes and IDs
             for track_id in tracker.id_active:
@@ -278,31 +728,13 @@ if __name__ == "__main__":
                         color = (255, 255, 0)  # Yellow for tracking
 
                     # Draw tracking history if available
-                    if (
-                        track_id in tracker.track_history
-                        and track_id in tracker.height_history
-                    ):
-                        history = list(tracker.track_history[track_id])
-                        heights = list(tracker.height_history[track_id])
-
-                        # Only draw if we have both position and height data
-                        min_len = min(len(history), len(heights))
-                        for i in range(1, min_len):
-                            try:
-                                pt1 = (int(history[i - 1]), int(heights[i - 1]))
-                                pt2 = (int(history[i]), int(heights[i]))
-                                cv2.line(processed_frame, pt1, pt2, color, 2)
-                            except (IndexError, ValueError):
-                                continue
+                    trail = tracker.trail(track_id)
+                    for (xa, ha), (xb, hb) in zip(trail, trail[1:]):
+                        cv2.line(processed_frame, (int(xa), int(ha)), (int(xb), int(hb)), color, 2)
 
                     # Draw person ID and status
-                    if track_id in tracker.track_history:
-                        x = int(list(tracker.track_history[track_id])[-1])
-                        y = (
-                            int(list(tracker.height_history[track_id])[-1])
-                            if track_id in tracker.height_history
-                            else 30
-                        )
+                    if trail:
+                        x, y = map(int, trail[-1])
                         label = f"ID: {track_id} ({status})"
                         cv2.putText(
                             processed_frame,
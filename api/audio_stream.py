@@ -0,0 +1,254 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel
+
+from audio.tts_cache import CACHE_DIR, cache_from_env
+from dispatch.logger import logger
+
+CHUNK_SIZE = 64 * 1024
+POLL_INTERVAL = 0.05
+# A partial file untouched this long was left by a worker that died mid-synthesis
+STALE_PARTIAL_SECONDS = 120
+
+MEDIA_TYPES = {
+    ".mp3": "audio/mpeg",
+    ".wav": "audio/wav",
+    ".webm": "audio/webm",
+}
+
+API_DIR = Path(__file__).resolve().parent
+# Synthesized audio, also written by audio/text_to_audio.py; a TTSCache owns
+# this directory, including its eviction
+GENERATED_AUDIO_DIR = Path(CACHE_DIR)
+# Served as they are and never deleted: checked-in samples
+AUDIO_DIRS = [API_DIR / "static_files" / "audio"]
+
+router = APIRouter(prefix="/audio")
+
+
+class SynthesisRequest(BaseModel):
+    text: str
+    lang: str = "en"
+    voice: str | None = None
+
+
+class AudioStore:
+    """Audio files on disk plus the ones still being written by synthesis jobs.
+
+    New audio goes through a TTSCache in output_dir, so identical text maps
+    to one file and the cache alone decides what to evict. Synthesis runs
+    on a small thread pool and writes a hidden partial file first, which
+    any worker process can stream while it grows.
+    """
+
+    def __init__(self, output_dir=GENERATED_AUDIO_DIR, directories=AUDIO_DIRS, max_workers=None):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.directories = [self.output_dir, *(Path(d) for d in directories)]
+        self._lock = threading.Lock()
+        self._cache = None
+        max_workers = max_workers or int(os.getenv("AUDIO_SYNTH_WORKERS", "4"))
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tts")
+
+    def cache(self):
+        if self._cache is None:
+            self._cache = cache_from_env(str(self.output_dir))
+        return self._cache
+
+    def find(self, name):
+        # Names come straight from the URL, so never let them leave the audio directories
+        if Path(name).name != name:
+            return None
+        for directory in self.directories:
+            path = directory / name
+            if path.is_file():
+                return path
+        return None
+
+    def partial_path(self, name):
+        # Hidden, so the cache never mistakes a partial file for a finished clip
+        return self.output_dir / f".{name}.part"
+
+    def is_writing(self, name):
+        return Path(name).name == name and self.partial_path(name).exists()
+
+    def synthesize(self, text, lang="en", voice=None):
+        """Return the file name for text right away, starting synthesis if it is not cached"""
+        cache = self.cache()
+        key = cache.key(text, lang, voice)
+        name = os.path.basename(cache.path(key))
+        with self._lock:
+            if cache.lookup(key) is not None or not self._claim(name):
+                return name
+        self._executor.submit(self._run, cache, key, name, text, lang, voice)
+        return name
+
+    def _claim(self, name):
+        """Create the partial file, unless this or another worker is already writing it"""
+        partial = self.partial_path(name)
+        for _ in range(2):
+            try:
+                # Readers can attach from now on, before the first byte is written
+                os.close(os.open(partial, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return True
+            except FileExistsError:
+                try:
+                    if time.time() - partial.stat().st_mtime < STALE_PARTIAL_SECONDS:
+                        return False
+                except FileNotFoundError:
+                    return False  # Finished just now
+                partial.unlink(missing_ok=True)
+        return False
+
+    def _run(self, cache, key, name, text, lang, voice):
+        partial = self.partial_path(name)
+        try:
+            with open(partial, "wb") as f:
+                cache.write(text, f, lang, voice)
+            cache.add_file(key, partial)
+        except Exception as e:
+            logger.error("Audio synthesis failed for %s: %s", name, e)
+            partial.unlink(missing_ok=True)
+
+    async def follow(self, name):
+        """Yield the bytes of a file being synthesized by any worker until it is complete"""
+        partial = self.partial_path(name)
+        try:
+            f = await asyncio.to_thread(open, partial, "rb")
+        except FileNotFoundError:
+            # Finished between the check and the open
+            path = await asyncio.to_thread(self.find, name)
+            if path is None:
+                return
+            f = await asyncio.to_thread(open, path, "rb")
+        with f:
+            while True:
+                # The rename into the cache keeps the file, so this handle reads every byte
+                writing = await asyncio.to_thread(partial.exists)
+                while chunk := await asyncio.to_thread(f.read, CHUNK_SIZE):
+                    yield chunk
+                if not writing:
+                    return
+                await asyncio.sleep(POLL_INTERVAL)
+
+    def prune(self, max_age_seconds, max_files=None):
+        """Expire generated audio through its cache; the other directories are never touched"""
+        return self.cache().prune(max_age_seconds, max_files)
+
+
+store = AudioStore()
+
+
+def etag_for(stat):
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def parse_range(header, size):
+    """Return (start, end) inclusive for a single byte range, or None to send the whole file"""
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start_s, _, end_s = header[len("bytes="):].strip().partition("-")
+    try:
+        if start_s == "":
+            length = int(end_s)
+            if length <= 0:
+                raise ValueError
+            start, end = max(0, size - length), size - 1
+        else:
+            start = int(start_s)
+            end = int(end_s) if end_s else size - 1
+    except ValueError:
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    return start, min(end, size - 1)
+
+
+def not_modified(request, etag, mtime):
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag in [t.strip() for t in if_none_match.split(",")] or if_none_match.strip() == "*"
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def iter_file(path, start, length):
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+@router.post("/synthesize")
+async def synthesize_audio(req: SynthesisRequest):
+    name = store.synthesize(req.text, req.lang, req.voice)
+    return {"id": name, "url": f"/audio/{name}"}
+
+
+@router.get("/{name}")
+async def get_audio(name: str, request: Request):
+    media_type = MEDIA_TYPES.get(Path(name).suffix, "application/octet-stream")
+
+    if store.is_writing(name):
+        # Still being synthesized, maybe by another worker: stream bytes as they are written
+        return StreamingResponse(store.follow(name), media_type=media_type)
+
+    path = store.find(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Audio not found")
+
+    stat = path.stat()
+    etag = etag_for(stat)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        "Cache-Control": "public, max-age=3600",
+    }
+    if not_modified(request, etag, stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    if if_range is None or if_range == etag:
+        byte_range = parse_range(request.headers.get("range"), stat.st_size)
+
+    if byte_range is None:
+        headers["Content-Length"] = str(stat.st_size)
+        return StreamingResponse(iter_file(path, 0, stat.st_size), media_type=media_type, headers=headers)
+
+    start, end = byte_range
+    length = end - start + 1
+    headers["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+    headers["Content-Length"] = str(length)
+    return StreamingResponse(
+        iter_file(path, start, length), status_code=206, media_type=media_type, headers=headers
+    )
+
+
+async def retention_loop(max_age_seconds, max_files, interval_seconds):
+    while True:
+        try:
+            removed = await asyncio.to_thread(store.prune, max_age_seconds, max_files)
+            if removed:
+                logger.info("Pruned %d old audio files", removed)
+        except Exception as e:
+            logger.error("Audio retention failed: %s", e)
+        await asyncio.sleep(interval_seconds)
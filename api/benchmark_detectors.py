@@ -0,0 +1,88 @@
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from detectors import BACKENDS, make_detector
+from trackers import iou_matrix
+
+
+def read_frames(source, count):
+    cap = cv2.VideoCapture(int(source) if source.isdigit() else source)
+    frames = []
+    while len(frames) < count:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frames.append(frame)
+    cap.release()
+    if not frames:
+        raise SystemExit(f"Could not read any frames from {source}")
+    return frames
+
+
+def agreement(ref, other, iou_threshold=0.5):
+    """Greedily match same-class boxes; return (matched fraction, mean IoU of matches)"""
+    if len(ref) == 0 and len(other) == 0:
+        return 1.0, 1.0
+    if len(ref) == 0 or len(other) == 0:
+        return 0.0, 0.0
+    ious = iou_matrix(ref.xyxy, other.xyxy)
+    ious[ref.cls[:, None] != other.cls[None, :]] = 0
+    matched = []
+    while True:
+        i, j = np.unravel_index(ious.argmax(), ious.shape)
+        if ious[i, j] < iou_threshold:
+            break
+        matched.append(ious[i, j])
+        ious[i, :] = 0
+        ious[:, j] = 0
+    return len(matched) / max(len(ref), len(other)), float(np.mean(matched)) if matched else 0.0
+
+
+def run(detector, frames, imgsz):
+    detector(frames[0], imgsz)  # warm up
+    latencies, outputs = [], []
+    start = time.perf_counter()
+    for frame in frames:
+        t = time.perf_counter()
+        outputs.append(detector(frame, imgsz))
+        latencies.append(time.perf_counter() - t)
+    return outputs, np.array(latencies), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare detector backends on the same frames")
+    parser.add_argument("--source", default="0", help="Video file or camera index")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--model", default="yolov8n.pt")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--backends", nargs="+", default=sorted(BACKENDS), choices=sorted(BACKENDS))
+    args = parser.parse_args()
+
+    frames = read_frames(args.source, args.frames)
+    print(f"{len(frames)} frames from {args.source}, model {args.model}, imgsz {args.imgsz}\n")
+
+    results = {}
+    for name in args.backends:
+        load_start = time.perf_counter()
+        detector = make_detector(args.model, name, imgsz=args.imgsz)
+        load_time = time.perf_counter() - load_start
+        outputs, latencies, total = run(detector, frames, args.imgsz)
+        results[name] = outputs
+        print(
+            f"{name:>6}: load {load_time:.2f}s, p50 {np.percentile(latencies, 50) * 1000:.1f}ms, "
+            f"p95 {np.percentile(latencies, 95) * 1000:.1f}ms, {len(frames) / total:.1f} FPS"
+        )
+
+    reference = args.backends[0]
+    for name in args.backends[1:]:
+        pairs = [agreement(a, b) for a, b in zip(results[reference], results[name])]
+        matched = np.mean([p[0] for p in pairs])
+        mean_iou = np.mean([p[1] for p in pairs])
+        print(f"\n{name} vs {reference}: {matched:.1%} of boxes matched (IoU>=0.5), mean IoU {mean_iou:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+import numpy as np
+
+from dispatch.logger import logger
+from kinematics import TrackKinematics
+
+CHECKPOINT_VERSION = 2
+
+# Track IDs restart at 1 in a new tracker, so restored tracks get a prefix
+# that can never collide with them
+RESTORED_PREFIX = "r"
+
+
+def capture(tracker, source=None):
+    """Counts, door calibration and live tracks of a tracker, as arrays for np.savez.
+
+    `source` is the camera the doors were calibrated on. Cheap enough to
+    call from the frame loop; writing happens separately.
+    """
+    doors = tracker.doors
+    live = [
+        tid for tid in tracker.last_seen_frame
+        if tid in tracker.kinematics and len(tracker.door_status.get(tid, ())) == len(doors)
+    ]
+    # Every track in one tracker shares a capacity; drop any left over from different settings
+    capacity = tracker.kinematics[live[0]].capacity if live else 0
+    live = [tid for tid in live if tracker.kinematics[tid].capacity == capacity]
+
+    counts, buffers = [], []
+    for tid in live:
+        count, rings = tracker.kinematics[tid].state()
+        counts.append(count)
+        buffers.append(rings)
+
+    meta = {
+        "version": CHECKPOINT_VERSION,
+        "saved": time.time(),
+        "frame_count": tracker.frame_count,
+        "frame_size": tracker.frame_size,
+        "source": source,
+        "entered": tracker.entered_count,
+        "exited": tracker.exited_count,
+        "runner_count": tracker.runner_count,
+        "runner_frames": list(tracker.runner_frames),
+        "crowd_entered": tracker.crowd_entered,
+        "crowd_exited": tracker.crowd_exited,
+        "tracks": live,
+        "last_seen": [tracker.last_seen_frame[tid] for tid in live],
+        "runners": [tid in tracker.counted_runners for tid in live],
+    }
+    return {
+        "meta": np.frombuffer(json.dumps(meta).encode(), np.uint8),
+        # Per door: box, big zone and small zone rects, then entered and exited counts
+        "doors": np.array(
+            [[*d.box, *d.big_rect, *d.small_rect, d.entered_count, d.exited_count] for d in doors],
+            np.int64,
+        ).reshape(-1, 14),
+        "kinematics_count": np.array(counts, np.int64),
+        "kinematics": np.array(buffers, np.float64).reshape(len(live), 5, capacity),
+    }
+
+
+def write(arrays, path):
+    """Write a checkpoint atomically: readers see the old file or the new one, never half"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "wb") as f:
+        np.savez(f, **arrays)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def save_checkpoint(tracker, path, source=None):
+    write(capture(tracker, source), path)
+
+
+def load_checkpoint(tracker, path):
+    """Reset the tracker to the state saved at path; returns its metadata, or False if none.
+
+    Live tracks come back for their trails and runner state only. The new
+    tracker never matches them again, so they are restored as resolved, with
+    no zone status: when they age out they cannot be counted as an entry
+    of a person who is still being tracked under a new ID.
+    """
+    from DetectingExitsAndEntrance import OUTSIDE, Door
+
+    path = Path(path)
+    if not path.is_file():
+        return False
+    with np.load(path, allow_pickle=False) as data:
+        arrays = {name: data[name] for name in data.files}
+    meta = json.loads(arrays["meta"].tobytes())
+    if meta.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(f"Unsupported checkpoint version {meta.get('version')} in {path}")
+
+    tracker.reset()
+    tracker.frame_count = meta["frame_count"]
+    tracker.entered_count = meta["entered"]
+    tracker.exited_count = meta["exited"]
+    tracker.runner_count = meta["runner_count"]
+    tracker.runner_frames = deque(meta["runner_frames"])
+    tracker.crowd_entered = meta["crowd_entered"]
+    tracker.crowd_exited = meta["crowd_exited"]
+
+    doors = []
+    for row in arrays["doors"].tolist():
+        door = Door(tuple(row[0:4]), tuple(row[4:8]), tuple(row[8:12]))
+        door.entered_count, door.exited_count = row[12], row[13]
+        doors.append(door)
+    if doors and meta["frame_size"]:
+        tracker.use_doors(doors, *meta["frame_size"])
+
+    for i, tid in enumerate(meta["tracks"]):
+        new_tid = RESTORED_PREFIX + tid
+        tracker.kinematics[new_tid] = TrackKinematics.from_state(
+            tracker.MIN_FRAMES_FOR_RUN, arrays["kinematics_count"][i], arrays["kinematics"][i]
+        )
+        tracker.door_status[new_tid] = np.full(len(tracker.doors), OUTSIDE, np.int8)
+        tracker.id_status[new_tid] = "outside"
+        tracker.last_seen_frame[new_tid] = meta["last_seen"][i]
+        tracker.id_active.add(new_tid)
+        if meta["runners"][i]:
+            tracker.counted_runners.add(new_tid)
+    return meta
+
+
+class Checkpointer:
+    """Saves a tracker every `interval` seconds on a background thread.
+
+    `maybe_save()` is called from the frame loop: it captures the state
+    there, so it is consistent with the frame just counted, and leaves the
+    file write and fsync to a thread. A save still running when the next
+    one is due is not doubled up; the next call tries again.
+    """
+
+    def __init__(self, path, interval=5.0):
+        self.path = Path(path)
+        self.interval = interval
+        self._last = time.monotonic()
+        self._writer = None
+
+    def maybe_save(self, tracker, source=None):
+        if time.monotonic() - self._last < self.interval:
+            return
+        if self._writer is not None and self._writer.is_alive():
+            return
+        self._last = time.monotonic()
+        self._writer = threading.Thread(
+            target=self._write, args=(capture(tracker, source),), name="checkpoint", daemon=True
+        )
+        self._writer.start()
+
+    def _write(self, arrays):
+        try:
+            write(arrays, self.path)
+        except Exception:
+            logger.exception("Failed to write tracker checkpoint %s", self.path)
+
+    def save(self, tracker, source=None):
+        """Save now and wait for it, e.g. when the stream stops"""
+        if self._writer is not None:
+            self._writer.join()
+        self._last = time.monotonic()
+        write(capture(tracker, source), self.path)
+
+    def restore(self, tracker):
+        """Load the checkpoint into the tracker if there is one; returns its metadata or None"""
+        start = time.perf_counter()
+        try:
+            meta = load_checkpoint(tracker, self.path)
+        except Exception:
+            logger.exception("Ignoring unreadable tracker checkpoint %s", self.path)
+            tracker.reset()
+            return None
+        if not meta:
+            return None
+        logger.info(
+            "Restored tracker checkpoint from %s in %.1fms: entered %d, exited %d, %d doors, %d tracks",
+            time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(meta["saved"])),
+            (time.perf_counter() - start) * 1000,
+            meta["entered"],
+            meta["exited"],
+            len(tracker.doors),
+            len(meta["tracks"]),
+        )
+        return meta
+
+    def clear(self):
+        if self._writer is not None:
+            self._writer.join()
+        self.path.unlink(missing_ok=True)
@@ -0,0 +1,169 @@
+import json
+import os
+import queue
+import re
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from dispatch.logger import logger
+
+CLIP_DIR = Path(os.getenv("CLIP_DIR", "runs/clips"))
+
+_EVENT_ID = re.compile(r"^[0-9a-f]{1,32}$")
+
+
+class ClipRecorder:
+    """Saves a short video around each counting event from frames already encoded.
+
+    The frame loop hands every published JPEG to `add()`, which only appends
+    to an in-memory ring. `trigger()` marks an event; once the ring holds
+    `after_seconds` past it, the frames from `before_seconds` before to
+    `after_seconds` after are queued for a writer thread, which writes
+    `<event id>.avi` and a `<event id>.json` sidecar. If the writer falls
+    behind, clips are dropped rather than blocking the frame loop.
+    """
+
+    def __init__(
+        self,
+        directory=CLIP_DIR,
+        before_seconds=3.0,
+        after_seconds=3.0,
+        max_fps=30,
+        max_clips=500,
+        queue_size=8,
+    ):
+        self.directory = Path(directory)
+        self.before_seconds = before_seconds
+        self.after_seconds = after_seconds
+        self.max_clips = max_clips
+        self.ring = deque(maxlen=int(max_fps * (before_seconds + after_seconds + 1)))
+        self.pending = []
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.saved = 0
+        self.dropped = 0
+        self._writer = None
+
+    def add(self, jpeg, timestamp=None):
+        """Keep one encoded frame, and queue any clips whose window is now complete"""
+        timestamp = time.time() if timestamp is None else timestamp
+        self.ring.append((timestamp, jpeg))
+        # Frames older than any pending clip could need are dead weight
+        horizon = timestamp - self.before_seconds - self.after_seconds - 1
+        while self.ring and self.ring[0][0] < horizon:
+            self.ring.popleft()
+        if self.pending:
+            due = [e for e in self.pending if e["time"] + self.after_seconds <= timestamp]
+            for event in due:
+                self.pending.remove(event)
+                self._queue_clip(event)
+
+    def trigger(self, event):
+        """Save a clip around a tracker event (a dict with at least "id" and "time")"""
+        self.pending.append(event)
+
+    def flush(self):
+        """Queue every pending clip with the frames there are, e.g. when the stream stops"""
+        for event in self.pending:
+            self._queue_clip(event)
+        self.pending = []
+
+    def _queue_clip(self, event):
+        start, end = event["time"] - self.before_seconds, event["time"] + self.after_seconds
+        frames = [(t, jpeg) for t, jpeg in self.ring if start <= t <= end]
+        if not frames:
+            return
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, name="clips", daemon=True)
+            self._writer.start()
+        try:
+            self.queue.put_nowait((event, frames))
+        except queue.Full:
+            self.dropped += 1
+            logger.warning("Clip writer is behind, dropped the clip for event %s", event["id"])
+
+    def _write_loop(self):
+        while True:
+            event, frames = self.queue.get()
+            try:
+                self._write_clip(event, frames)
+                self.saved += 1
+                self._prune()
+            except Exception:
+                logger.exception("Failed to write the clip for event %s", event["id"])
+
+    def _write_clip(self, event, frames):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        span = frames[-1][0] - frames[0][0]
+        fps = min(max((len(frames) - 1) / span, 1.0), 60.0) if span > 0 else 1.0
+        first = cv2.imdecode(np.frombuffer(frames[0][1], np.uint8), cv2.IMREAD_COLOR)
+        height, width = first.shape[:2]
+
+        # Write under a temporary name so readers never see a half-written clip
+        path = self.directory / f"{event['id']}.avi"
+        tmp = path.with_name(f".{path.name}.tmp.avi")
+        writer = cv2.VideoWriter(str(tmp), cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+        try:
+            for _, jpeg in frames:
+                image = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+                if image.shape[:2] != (height, width):
+                    image = cv2.resize(image, (width, height))
+                writer.write(image)
+        finally:
+            writer.release()
+        os.replace(tmp, path)
+
+        meta = {
+            **event,
+            "clip": path.name,
+            "start": frames[0][0],
+            "end": frames[-1][0],
+            "frames": len(frames),
+            "fps": round(fps, 2),
+        }
+        meta_path = path.with_suffix(".json")
+        tmp = meta_path.with_name(f".{meta_path.name}.tmp")
+        tmp.write_text(json.dumps(meta))
+        os.replace(tmp, meta_path)
+
+    def _prune(self):
+        sidecars = sorted(self.directory.glob("*.json"), key=lambda p: p.stat().st_mtime)
+        for old in sidecars[: max(len(sidecars) - self.max_clips, 0)]:
+            old.with_suffix(".avi").unlink(missing_ok=True)
+            old.unlink(missing_ok=True)
+
+    def stats(self):
+        return {
+            "buffered_frames": len(self.ring),
+            "pending": len(self.pending),
+            "queued": self.queue.qsize(),
+            "saved": self.saved,
+            "dropped": self.dropped,
+        }
+
+
+def list_clips(directory=CLIP_DIR, limit=100):
+    """Metadata of the newest saved clips, newest first"""
+    directory = Path(directory)
+    if not directory.is_dir():
+        return []
+    sidecars = sorted(directory.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
+    clips = []
+    for path in sidecars[:limit]:
+        try:
+            clips.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue  # Pruned or replaced while listing
+    return clips
+
+
+def clip_path(event_id, directory=CLIP_DIR):
+    """Path of the clip saved for an event, or None"""
+    if not _EVENT_ID.match(event_id):
+        return None
+    path = Path(directory) / f"{event_id}.avi"
+    return path if path.is_file() else None
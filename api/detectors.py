@@ -0,0 +1,189 @@
+import hashlib
+import os
+import shutil
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+DEFAULT_IMGSZ = 640
+# ultralytics predict() defaults, so both backends filter boxes the same way
+CONF_THRESHOLD = 0.25
+IOU_THRESHOLD = 0.7
+
+ONNX_CACHE_DIR = Path(os.getenv("ONNX_CACHE_DIR", "runs/onnx_cache"))
+
+
+@dataclass
+class Detections:
+    xyxy: np.ndarray  # (N, 4) float32 pixel corners in the original frame
+    conf: np.ndarray  # (N,) float32
+    cls: np.ndarray  # (N,) int
+
+    def __len__(self):
+        return len(self.conf)
+
+    @classmethod
+    def empty(cls):
+        return cls(np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, int))
+
+
+class TorchBackend:
+    """ultralytics YOLO running PyTorch"""
+
+    name = "torch"
+
+    def __init__(self, model_path, imgsz=DEFAULT_IMGSZ):
+        from ultralytics import YOLO
+
+        self.model = YOLO(model_path)
+        self.imgsz = imgsz
+
+    def __call__(self, frame, imgsz=None):
+        results = self.model(frame, imgsz=imgsz or self.imgsz, verbose=False)
+        if not results:
+            return Detections.empty()
+        boxes = results[0].boxes
+        return Detections(
+            boxes.xyxy.cpu().numpy().astype(np.float32),
+            boxes.conf.cpu().numpy().astype(np.float32),
+            boxes.cls.cpu().numpy().astype(int),
+        )
+
+
+def resolve_weights(model_path):
+    """Local path of the weights, downloading official ones like yolov8n.pt the way YOLO() does"""
+    if Path(model_path).is_file():
+        return Path(model_path)
+    from ultralytics.utils.downloads import attempt_download_asset
+
+    return Path(attempt_download_asset(str(model_path)))
+
+
+def exported_onnx_path(model_path):
+    """Exported models are cached by the hash of the weights they came from"""
+    digest = hashlib.sha256(Path(model_path).read_bytes()).hexdigest()[:12]
+    return ONNX_CACHE_DIR / f"{Path(model_path).stem}-{digest}.onnx"
+
+
+def export_onnx(model_path):
+    model_path = resolve_weights(model_path)
+    target = exported_onnx_path(model_path)
+    if target.exists():
+        return target
+    from ultralytics import YOLO
+
+    # dynamic axes let the input size change per call
+    exported = YOLO(model_path).export(format="onnx", dynamic=True, simplify=True)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_suffix(".onnx.part")
+    shutil.copyfile(exported, tmp)
+    os.replace(tmp, target)
+    return target
+
+
+def letterbox(frame, imgsz):
+    """Resize keeping aspect ratio and pad to imgsz x imgsz like ultralytics does"""
+    h, w = frame.shape[:2]
+    ratio = min(imgsz / h, imgsz / w)
+    new_w, new_h = int(round(w * ratio)), int(round(h * ratio))
+    pad_x, pad_y = (imgsz - new_w) / 2, (imgsz - new_h) / 2
+    if (new_w, new_h) != (w, h):
+        frame = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    top, left = int(round(pad_y - 0.1)), int(round(pad_x - 0.1))
+    bottom, right = imgsz - new_h - top, imgsz - new_w - left
+    frame = cv2.copyMakeBorder(
+        frame, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114)
+    )
+    return frame, ratio, (left, top)
+
+
+class OnnxBackend:
+    """YOLOv8 exported to ONNX and run with ONNX Runtime on the CPU"""
+
+    name = "onnx"
+
+    def __init__(self, model_path, imgsz=DEFAULT_IMGSZ, threads=None):
+        import onnxruntime as ort
+
+        onnx_path = model_path if str(model_path).endswith(".onnx") else export_onnx(model_path)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        threads = threads or int(os.getenv("ONNX_THREADS", "0"))
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            str(onnx_path), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_name = self.session.get_inputs()[0].name
+        self.imgsz = imgsz
+
+    def __call__(self, frame, imgsz=None):
+        imgsz = imgsz or self.imgsz
+        image, ratio, (pad_x, pad_y) = letterbox(frame, imgsz)
+        blob = cv2.dnn.blobFromImage(image, 1 / 255.0, swapRB=True)
+        # (1, 4 + classes, anchors) -> (anchors, 4 + classes)
+        output = self.session.run(None, {self.input_name: blob})[0][0].T
+
+        scores = output[:, 4:]
+        cls = scores.argmax(axis=1)
+        conf = scores[np.arange(len(cls)), cls]
+        keep = conf > CONF_THRESHOLD
+        if not keep.any():
+            return Detections.empty()
+        boxes, conf, cls = output[keep, :4], conf[keep], cls[keep]
+
+        xyxy = np.empty_like(boxes)
+        xyxy[:, 0] = (boxes[:, 0] - boxes[:, 2] / 2 - pad_x) / ratio
+        xyxy[:, 1] = (boxes[:, 1] - boxes[:, 3] / 2 - pad_y) / ratio
+        xyxy[:, 2] = (boxes[:, 0] + boxes[:, 2] / 2 - pad_x) / ratio
+        xyxy[:, 3] = (boxes[:, 1] + boxes[:, 3] / 2 - pad_y) / ratio
+        h, w = frame.shape[:2]
+        xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, w)
+        xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, h)
+
+        # Class-aware NMS: offset boxes per class so classes never suppress each other
+        offset = cls[:, None].astype(np.float32) * (max(w, h) + 1)
+        shifted = xyxy + offset
+        rects = np.column_stack([shifted[:, :2], shifted[:, 2:] - shifted[:, :2]])
+        kept = cv2.dnn.NMSBoxes(rects.tolist(), conf.tolist(), CONF_THRESHOLD, IOU_THRESHOLD)
+        kept = np.array(kept, dtype=int).reshape(-1)
+        order = kept[np.argsort(-conf[kept])]
+        return Detections(xyxy[order].astype(np.float32), conf[order].astype(np.float32), cls[order])
+
+
+BACKENDS = {
+    "torch": TorchBackend,
+    "onnx": OnnxBackend,
+}
+
+
+def make_detector(model_path, backend=None, **kwargs):
+    """Build a detector; backend defaults to the DETECTOR_BACKEND env var, then torch"""
+    backend = backend or os.getenv("DETECTOR_BACKEND", "torch")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown detector backend {backend!r}, expected one of {sorted(BACKENDS)}")
+    return BACKENDS[backend](model_path, **kwargs)
+
+
+class SharedDetector:
+    """One loaded detector used by several trackers, e.g. one per camera.
+
+    Calls take turns, since an ultralytics model is not safe to call from
+    several threads at once; each tracker keeps its own tracking state.
+    """
+
+    def __init__(self, detector):
+        self.detector = detector
+        self.name = detector.name
+        self._lock = threading.Lock()
+
+    def __call__(self, frame, imgsz=None):
+        with self._lock:
+            return self.detector(frame, imgsz)
+
+
+def make_shared_detector(model_path, backend=None, **kwargs):
+    return SharedDetector(make_detector(model_path, backend, **kwargs))
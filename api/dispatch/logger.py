@@ -1,12 +1,96 @@
+import atexit
+import datetime
+import json
 import logging
+import os
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[
-        logging.FileHandler("debug.log"),
-        logging.StreamHandler(),
-    ],
-)
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FILE = os.getenv("LOG_FILE", "debug.log")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", 5))
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+class Lazy:
+    """Defers an expensive call until the record passes the level and sampling filters.
+
+    logger.info("report: %s", Lazy(report.model_dump_json))
+    """
+
+    __slots__ = ("fn", "args")
+
+    def __init__(self, fn, *args):
+        self.fn = fn
+        self.args = args
+
+    def __str__(self):
+        return str(self.fn(*self.args))
+
+
+class SamplingFilter(logging.Filter):
+    """Pass roughly `rate` of records below WARNING; warnings and errors always pass"""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or random.random() < self.rate
+
+
+_listener = None
+
+
+def configure_logging():
+    """Send the root logger's records to debug.log and the console; called by entry points.
+
+    Records are formatted to JSON on the calling thread, so mutable
+    arguments are rendered as they were when logged; only the disk and
+    console writes happen on the listener's background thread.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    log_queue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.setFormatter(JSONFormatter())
+    file_handler = RotatingFileHandler(LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT)
+    _listener = QueueListener(log_queue, file_handler, logging.StreamHandler(), respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    logging.basicConfig(level=LOG_LEVEL, handlers=[queue_handler])
+
+
+def get_logger(name, sample_rate=None):
+    """Return a logger that writes through the background queue.
+
+    sample_rate keeps only that fraction of its DEBUG/INFO records, for
+    high-rate per-frame events.
+    """
+    log = logging.getLogger(name)
+    if sample_rate is not None and sample_rate < 1.0:
+        if not any(isinstance(f, SamplingFilter) for f in log.filters):
+            log.addFilter(SamplingFilter(sample_rate))
+    return log
+
+
+logger = get_logger(__name__)
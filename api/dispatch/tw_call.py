@@ -1,13 +1,26 @@
 # Download the helper library from https://www.twilio.com/docs/python/install
 import os
 
-from twilio.rest import Client
+_client = None
 
-# Find your Account SID and Auth Token at twilio.com/console
-# and set the environment variables. See http://twil.io/secure
-account_sid = os.environ["TWILIO_ACCOUNT_SID"]
-auth_token = os.environ["TWILIO_AUTH_TOKEN"]
-client = Client(account_sid, auth_token)
+
+def get_client():
+    # Find your Account SID and Auth Token at twilio.com/console
+    # and set the environment variables. See http://twil.io/secure
+    # The client is created on first use so importing this module never
+    # fails or pays for the twilio import when credentials are missing.
+    global _client
+    if _client is None:
+        from twilio.rest import Client
+
+        account_sid = os.environ.get("TWILIO_ACCOUNT_SID")
+        auth_token = os.environ.get("TWILIO_AUTH_TOKEN")
+        if not account_sid or not auth_token:
+            raise RuntimeError(
+                "TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN environment variables not set"
+            )
+        _client = Client(account_sid, auth_token)
+    return _client
 
 
 def call(text: str, caller: str, reciever: str):
@@ -17,7 +30,7 @@ def call(text: str, caller: str, reciever: str):
     </Response>
     """
 
-    call = client.calls.create(
+    call = get_client().calls.create(
         twiml=twiml_str,
         from_=caller,
         to=reciever,
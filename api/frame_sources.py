@@ -0,0 +1,335 @@
+import argparse
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+class PacedSource:
+    """Frame pacing, jitter and dropped frames shared by the virtual cameras.
+
+    Subclasses implement `_next_frame()`. Reads block until the next frame
+    is due, as a real camera does; a dropped frame is generated (so the
+    scene keeps moving) but never returned. The read interface matches
+    cv2.VideoCapture so the stream code can use either.
+    """
+
+    def __init__(self, fps=30, jitter_ms=0.0, drop_rate=0.0, realtime=True, seed=0):
+        self.fps = fps
+        self.jitter_ms = jitter_ms
+        self.drop_rate = drop_rate
+        self.realtime = realtime
+        self.rng = np.random.default_rng(seed)
+        self.frames_generated = 0
+        self.frames_dropped = 0
+        self._next_due = None
+        self._open = True
+
+    def isOpened(self):
+        return self._open
+
+    def release(self):
+        self._open = False
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_FPS and value:
+            self.fps = value
+            return True
+        return False
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return float(self.fps)
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.height)
+        return 0.0
+
+    def _wait(self):
+        if not self.realtime:
+            return
+        now = time.perf_counter()
+        if self._next_due is None:
+            self._next_due = now
+        delay = self._next_due - now
+        if self.jitter_ms:
+            delay += abs(self.rng.normal(0, self.jitter_ms)) / 1000
+        if delay > 0:
+            time.sleep(delay)
+        # Schedule from the ideal time, not the actual one, so jitter does not accumulate
+        self._next_due = max(self._next_due + 1 / self.fps, time.perf_counter() - 1 / self.fps)
+
+    def read(self):
+        if not self._open:
+            return False, None
+        while True:
+            self._wait()
+            frame = self._next_frame()
+            if frame is None:
+                return False, None
+            self.frames_generated += 1
+            if self.drop_rate and self.rng.random() < self.drop_rate:
+                self.frames_dropped += 1
+                continue
+            return True, frame
+
+    def ground_truth(self):
+        return {"entered": None, "exited": None}
+
+    def stats(self):
+        return {
+            "frames": self.frames_generated,
+            "dropped": self.frames_dropped,
+            **self.ground_truth(),
+        }
+
+
+class SyntheticCamera(PacedSource):
+    """A doorway with boxes walking in and out of it, and exact counts of both.
+
+    People entering start near the camera and shrink as they walk up into
+    the door; people exiting come out of the door and grow as they walk
+    towards the camera. Each finished walk is added to the ground truth.
+    """
+
+    def __init__(self, width=1280, height=720, people_per_minute=20, **kwargs):
+        super().__init__(**kwargs)
+        self.width = width
+        self.height = height
+        self.people_per_minute = people_per_minute
+        self.door = (int(width * 0.42), int(height * 0.15), int(width * 0.58), int(height * 0.6))
+        self.background = np.full((height, width, 3), 90, np.uint8)
+        x1, y1, x2, y2 = self.door
+        cv2.rectangle(self.background, (x1, y1), (x2, y2), (40, 60, 90), -1)
+        cv2.rectangle(self.background, (x1, y1), (x2, y2), (20, 20, 20), 4)
+        self.people = []
+        self.entered = 0
+        self.exited = 0
+
+    def _spawn(self):
+        x1, y1, x2, y2 = self.door
+        door_x = (x1 + x2) / 2
+        near = (self.rng.uniform(self.width * 0.2, self.width * 0.8), self.height * 0.95)
+        far = (door_x + self.rng.uniform(-0.2, 0.2) * (x2 - x1), y2)
+        entering = self.rng.random() < 0.5
+        start, end = (near, far) if entering else (far, near)
+        self.people.append({
+            "entering": entering,
+            "start": start,
+            "end": end,
+            "step": 0,
+            "steps": int(self.fps * self.rng.uniform(2.0, 4.0)),
+            "color": tuple(int(c) for c in self.rng.integers(60, 255, 3)),
+        })
+
+    def _next_frame(self):
+        if self.rng.random() < self.people_per_minute / 60 / self.fps:
+            self._spawn()
+
+        frame = self.background.copy()
+        door_h = self.door[3] - self.door[1]
+        still_walking = []
+        for person in self.people:
+            person["step"] += 1
+            p = person["step"] / person["steps"]
+            if p >= 1:
+                if person["entering"]:
+                    self.entered += 1
+                else:
+                    self.exited += 1
+                continue
+            still_walking.append(person)
+            (sx, sy), (ex, ey) = person["start"], person["end"]
+            feet_x, feet_y = sx + (ex - sx) * p, sy + (ey - sy) * p
+            # Near the camera a person is ~1.6 door heights tall, at the door ~0.9
+            depth = (feet_y - self.door[3]) / max(self.height - self.door[3], 1)
+            h = door_h * (0.9 + 0.7 * depth)
+            w = h * 0.4
+            cv2.rectangle(
+                frame,
+                (int(feet_x - w / 2), int(feet_y - h)),
+                (int(feet_x + w / 2), int(feet_y)),
+                person["color"],
+                -1,
+            )
+        self.people = still_walking
+        return frame
+
+    def ground_truth(self):
+        return {"entered": self.entered, "exited": self.exited}
+
+
+class LoopingVideo(PacedSource):
+    """Replays a video file forever at a fixed FPS and resolution.
+
+    If the clip's true entries and exits are known they are added to the
+    ground truth once per complete pass.
+    """
+
+    def __init__(self, path, width=None, height=None, entered_per_loop=None, exited_per_loop=None, **kwargs):
+        self.path = str(path)
+        self.cap = cv2.VideoCapture(self.path)
+        if "fps" not in kwargs:
+            kwargs["fps"] = self.cap.get(cv2.CAP_PROP_FPS) or 30
+        super().__init__(**kwargs)
+        self.width = width or int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = height or int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.entered_per_loop = entered_per_loop
+        self.exited_per_loop = exited_per_loop
+        self.loops = 0
+
+    def isOpened(self):
+        return self._open and self.cap.isOpened()
+
+    def release(self):
+        super().release()
+        self.cap.release()
+
+    def _next_frame(self):
+        ok, frame = self.cap.read()
+        if not ok:
+            self.loops += 1
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self.cap.read()
+            if not ok:
+                return None
+        if frame.shape[1] != self.width or frame.shape[0] != self.height:
+            frame = cv2.resize(frame, (self.width, self.height))
+        return frame
+
+    def ground_truth(self):
+        return {
+            "entered": None if self.entered_per_loop is None else self.entered_per_loop * self.loops,
+            "exited": None if self.exited_per_loop is None else self.exited_per_loop * self.loops,
+        }
+
+
+def open_source(source=None, **kwargs):
+    """Open a camera index, a video file to loop, or "synthetic".
+
+    source defaults to the CAMERA_SOURCE env var, then camera 0. Extra
+    keyword arguments (fps, width, height, jitter_ms, drop_rate, seed) go to
+    the virtual cameras and are ignored for real ones.
+    """
+    source = str(source or os.getenv("CAMERA_SOURCE", "0"))
+    if source.isdigit():
+        return cv2.VideoCapture(int(source))
+    if source == "synthetic":
+        return SyntheticCamera(**kwargs)
+    if not os.path.exists(source):
+        raise ValueError(f"Camera source {source!r} is not a camera index, a file or 'synthetic'")
+    return LoopingVideo(source, **kwargs)
+
+
+def named_sources():
+    """Sources clients may ask for by name, from CAMERA_SOURCES (name=source,...)"""
+    named = {}
+    for item in os.getenv("CAMERA_SOURCES", "").split(","):
+        name, sep, value = item.partition("=")
+        if sep and name.strip() and value.strip():
+            named[name.strip()] = value.strip()
+    return named
+
+
+def resolve_source(source):
+    """Map a client-supplied source to one the server may open; None means the default.
+
+    Clients may pick a camera index, "synthetic" or a name from
+    CAMERA_SOURCES, never an arbitrary path on the server.
+    """
+    if source is None or source == "":
+        return None
+    source = str(source)
+    if source.isdigit() or source == "synthetic":
+        return source
+    named = named_sources()
+    if source in named:
+        return named[source]
+    raise ValueError(
+        f"Unknown camera source {source!r}; use a camera index, 'synthetic' or one of {sorted(named)}"
+    )
+
+
+def run_camera(index, source, args, results, detectors=None):
+    """Feed one virtual camera through its own tracker until the deadline"""
+    from DetectingExitsAndEntrance import DoorPersonTracker
+
+    camera = open_source(
+        source,
+        fps=args.fps,
+        width=args.width,
+        height=args.height,
+        jitter_ms=args.jitter_ms,
+        drop_rate=args.drop_rate,
+        seed=index,
+    )
+    tracker = DoorPersonTracker(fps=args.fps, detectors=detectors)
+    latencies = []
+    deadline = time.perf_counter() + args.seconds
+    while time.perf_counter() < deadline:
+        ok, frame = camera.read()
+        if not ok:
+            break
+        start = time.perf_counter()
+        tracker.process_frame(frame)
+        latencies.append(time.perf_counter() - start)
+    camera.release()
+    results[index] = {
+        "camera": camera.stats(),
+        "counted": {"entered": tracker.entered_count, "exited": tracker.exited_count},
+        "latencies": np.array(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run N virtual cameras through the counting pipeline")
+    parser.add_argument("--cameras", type=int, default=1)
+    parser.add_argument("--source", default="synthetic", help="'synthetic' or a video file to loop")
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    from DetectingExitsAndEntrance import DOOR_MODEL_PATH, PERSON_MODEL_PATH
+    from detectors import make_shared_detector
+
+    # Load each model once; every camera only adds its own tracking and counting state
+    detectors = (make_shared_detector(PERSON_MODEL_PATH), make_shared_detector(DOOR_MODEL_PATH))
+    results = {}
+    threads = [
+        threading.Thread(target=run_camera, args=(i, args.source, args, results, detectors), daemon=True)
+        for i in range(args.cameras)
+    ]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    total_frames = 0
+    for i in sorted(results):
+        r = results[i]
+        lat = r["latencies"]
+        total_frames += len(lat)
+        truth, counted = r["camera"], r["counted"]
+        if len(lat):
+            timing = f"p50 {np.percentile(lat, 50) * 1000:.1f}ms, p95 {np.percentile(lat, 95) * 1000:.1f}ms"
+        else:
+            timing = "no frames read"
+        print(
+            f"camera {i:>2}: {len(lat) / elapsed:5.1f} FPS ({timing}), "
+            f"{truth['dropped']} dropped, entered {counted['entered']}/{truth['entered']}, "
+            f"exited {counted['exited']}/{truth['exited']} (counted/true)"
+        )
+    print(f"\n{args.cameras} cameras, {total_frames / elapsed:.1f} frames/s processed in total")
+
+
+if __name__ == "__main__":
+    main()
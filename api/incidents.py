@@ -0,0 +1,380 @@
+import datetime
+import itertools
+import json
+import math
+import threading
+from dataclasses import dataclass, field
+
+EARTH_RADIUS_M = 6371000.0
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def grid_cell(cell_deg, lat, lon):
+    # Longitude degrees shrink towards the poles; widen the cell to match
+    lon_deg = cell_deg / max(math.cos(math.radians(lat)), 0.01)
+    return int(math.floor(lat / cell_deg)), int(math.floor(lon / lon_deg))
+
+
+def report_time(report):
+    """The report's timestamp as naive UTC"""
+    now = report.timestamp
+    if now.tzinfo is not None:
+        now = now.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return now
+
+
+@dataclass
+class Incident:
+    id: int
+    school: str
+    building: str
+    first_seen: datetime.datetime
+    last_seen: datetime.datetime
+    report_count: int = 0
+    latitude: float | None = None
+    longitude: float | None = None
+    located_reports: int = 0
+    called: bool = False
+    messages: list[str] = field(default_factory=list)
+
+    def summary(self):
+        centroid = None
+        if self.located_reports:
+            centroid = {"latitude": self.latitude, "longitude": self.longitude}
+        return {
+            "id": self.id,
+            "school": self.school,
+            "building": self.building,
+            "report_count": self.report_count,
+            "centroid": centroid,
+            "first_seen": self.first_seen.isoformat(),
+            "last_seen": self.last_seen.isoformat(),
+            "messages": list(self.messages),
+        }
+
+    def join(self, report, now, max_messages):
+        """Count one more report in this incident"""
+        self.report_count += 1
+        self.last_seen = max(self.last_seen, now)
+        self.messages = (self.messages + [report.message])[-max_messages:]
+        location = report.location
+        if location is not None:
+            # Running mean keeps the centroid update O(1)
+            n = self.located_reports + 1
+            if self.located_reports == 0:
+                self.latitude, self.longitude = location.latitude, location.longitude
+            else:
+                self.latitude += (location.latitude - self.latitude) / n
+                self.longitude += (location.longitude - self.longitude) / n
+            self.located_reports = n
+
+
+class IncidentIndex:
+    """Groups emergency reports close in space and time into incidents.
+
+    Located reports are bucketed into a lat/lon grid whose cells are one
+    radius wide, so a lookup only inspects the 3x3 block of cells around the
+    report. Reports without a location fall back to matching on school and
+    building. An incident stays open until no report has joined it for
+    `window` seconds.
+    """
+
+    MAX_MESSAGES = 5
+
+    def __init__(self, radius_m=150.0, window=datetime.timedelta(minutes=10)):
+        self.radius_m = radius_m
+        self.window = window
+        self.cell_deg = radius_m / 111320.0
+        self.incidents: dict[int, Incident] = {}
+        self._cells: dict[tuple[int, int], set[int]] = {}
+        self._cell_of: dict[int, tuple[int, int]] = {}
+        self._by_place: dict[tuple[str, str], int] = {}
+        self._ids = itertools.count(1)
+        self._since_expire = 0
+        self._lock = threading.Lock()
+
+    def _cell(self, lat, lon):
+        return grid_cell(self.cell_deg, lat, lon)
+
+    def _active(self, incident, now):
+        return now - incident.last_seen <= self.window
+
+    def _nearest(self, lat, lon, now):
+        row, col = self._cell(lat, lon)
+        best, best_dist = None, self.radius_m
+        for dr in (-1, 0, 1):
+            for dc in (-1, 0, 1):
+                for incident_id in self._cells.get((row + dr, col + dc), ()):
+                    incident = self.incidents[incident_id]
+                    if not self._active(incident, now):
+                        continue
+                    dist = haversine_m(lat, lon, incident.latitude, incident.longitude)
+                    if dist <= best_dist:
+                        best, best_dist = incident, dist
+        return best
+
+    def _move(self, incident):
+        cell = self._cell(incident.latitude, incident.longitude)
+        old = self._cell_of.get(incident.id)
+        if old == cell:
+            return
+        if old is not None:
+            self._cells[old].discard(incident.id)
+            if not self._cells[old]:
+                del self._cells[old]
+        self._cells.setdefault(cell, set()).add(incident.id)
+        self._cell_of[incident.id] = cell
+
+    def assign(self, report):
+        """Attach a report to a nearby open incident or open a new one.
+
+        Returns (incident, is_new).
+        """
+        now = report_time(report)
+        place = (report.school, report.building)
+        location = report.location
+
+        with self._lock:
+            incident = None
+            if location is not None:
+                incident = self._nearest(location.latitude, location.longitude, now)
+            if incident is None:
+                incident_id = self._by_place.get(place)
+                candidate = self.incidents.get(incident_id)
+                if candidate is not None and self._active(candidate, now):
+                    incident = candidate
+
+            is_new = incident is None
+            if is_new:
+                incident = Incident(
+                    id=next(self._ids),
+                    school=report.school,
+                    building=report.building,
+                    first_seen=now,
+                    last_seen=now,
+                )
+                self.incidents[incident.id] = incident
+
+            incident.join(report, now, self.MAX_MESSAGES)
+            if location is not None:
+                self._move(incident)
+            self._by_place[place] = incident.id
+
+            self._since_expire += 1
+            if self._since_expire >= 256:
+                self._since_expire = 0
+                self._expire(now)
+            return incident, is_new
+
+    def claim_call(self, incident_id):
+        """True for exactly one caller per incident, which should then call it in"""
+        with self._lock:
+            incident = self.incidents.get(incident_id)
+            if incident is None or incident.called:
+                return False
+            incident.called = True
+            return True
+
+    def release_call(self, incident_id):
+        """Give up a claim whose call failed, so the next report tries again"""
+        with self._lock:
+            incident = self.incidents.get(incident_id)
+            if incident is not None:
+                incident.called = False
+
+    def _expire(self, now):
+        stale = [i for i, inc in self.incidents.items() if not self._active(inc, now)]
+        for incident_id in stale:
+            incident = self.incidents.pop(incident_id)
+            cell = self._cell_of.pop(incident_id, None)
+            if cell is not None:
+                self._cells[cell].discard(incident_id)
+                if not self._cells[cell]:
+                    del self._cells[cell]
+            place = (incident.school, incident.building)
+            if self._by_place.get(place) == incident_id:
+                del self._by_place[place]
+
+    def summaries(self, active_only=True, now=None):
+        now = now or datetime.datetime.utcnow()
+        with self._lock:
+            return [
+                inc.summary()
+                for inc in sorted(self.incidents.values(), key=lambda i: i.last_seen, reverse=True)
+                if not active_only or self._active(inc, now)
+            ]
+
+    def get(self, incident_id):
+        with self._lock:
+            incident = self.incidents.get(incident_id)
+            return incident.summary() if incident else None
+
+
+def _epoch(moment):
+    return (moment - EPOCH).total_seconds()
+
+
+_COLUMNS = (
+    "id, school, building, first_seen, last_seen, report_count, "
+    "latitude, longitude, located_reports, called, messages"
+)
+
+
+def _from_row(row):
+    return Incident(
+        id=row[0],
+        school=row[1],
+        building=row[2],
+        first_seen=EPOCH + datetime.timedelta(seconds=row[3]),
+        last_seen=EPOCH + datetime.timedelta(seconds=row[4]),
+        report_count=row[5],
+        latitude=row[6],
+        longitude=row[7],
+        located_reports=row[8],
+        called=bool(row[9]),
+        messages=json.loads(row[10]),
+    )
+
+
+class SharedIncidentIndex:
+    """IncidentIndex kept in a SqliteState, so every worker process groups reports together.
+
+    Each report is assigned in one write transaction on the state file.
+    Grid cells are indexed columns, so a lookup still only reads the 3x3
+    block of cells around the report.
+    """
+
+    MAX_MESSAGES = IncidentIndex.MAX_MESSAGES
+
+    def __init__(self, state, radius_m=150.0, window=datetime.timedelta(minutes=10)):
+        self.state = state
+        self.radius_m = radius_m
+        self.window = window
+        self.cell_deg = radius_m / 111320.0
+        self._since_expire = 0
+
+    def _nearest(self, conn, lat, lon, cutoff):
+        row, col = grid_cell(self.cell_deg, lat, lon)
+        rows = conn.execute(
+            f"SELECT {_COLUMNS} FROM incidents "
+            "WHERE cell_row BETWEEN ? AND ? AND cell_col BETWEEN ? AND ? AND last_seen >= ?",
+            (row - 1, row + 1, col - 1, col + 1, cutoff),
+        ).fetchall()
+        best, best_dist = None, self.radius_m
+        for candidate in rows:
+            dist = haversine_m(lat, lon, candidate[6], candidate[7])
+            if dist <= best_dist:
+                best, best_dist = candidate, dist
+        return None if best is None else _from_row(best)
+
+    def assign(self, report):
+        """Attach a report to a nearby open incident or open a new one.
+
+        Returns (incident, is_new).
+        """
+        now = report_time(report)
+        cutoff = _epoch(now - self.window)
+        location = report.location
+
+        with self.state.transaction() as conn:
+            incident = None
+            if location is not None:
+                incident = self._nearest(conn, location.latitude, location.longitude, cutoff)
+            if incident is None:
+                row = conn.execute(
+                    f"SELECT {_COLUMNS} FROM incidents WHERE last_seen >= ? AND id = "
+                    "(SELECT incident_id FROM incident_places WHERE school = ? AND building = ?)",
+                    (cutoff, report.school, report.building),
+                ).fetchone()
+                incident = None if row is None else _from_row(row)
+
+            is_new = incident is None
+            if is_new:
+                incident = Incident(
+                    id=None,
+                    school=report.school,
+                    building=report.building,
+                    first_seen=now,
+                    last_seen=now,
+                )
+            incident.join(report, now, self.MAX_MESSAGES)
+            cell = (None, None)
+            if incident.located_reports:
+                cell = grid_cell(self.cell_deg, incident.latitude, incident.longitude)
+            values = (
+                _epoch(incident.last_seen),
+                incident.report_count,
+                incident.latitude,
+                incident.longitude,
+                incident.located_reports,
+                *cell,
+                json.dumps(incident.messages),
+            )
+            if is_new:
+                incident.id = conn.execute(
+                    "INSERT INTO incidents (school, building, first_seen, last_seen, report_count, "
+                    "latitude, longitude, located_reports, cell_row, cell_col, messages) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (incident.school, incident.building, _epoch(now), *values),
+                ).lastrowid
+            else:
+                conn.execute(
+                    "UPDATE incidents SET last_seen = ?, report_count = ?, latitude = ?, longitude = ?, "
+                    "located_reports = ?, cell_row = ?, cell_col = ?, messages = ? WHERE id = ?",
+                    (*values, incident.id),
+                )
+            conn.execute(
+                "INSERT INTO incident_places (school, building, incident_id) VALUES (?, ?, ?) "
+                "ON CONFLICT (school, building) DO UPDATE SET incident_id = excluded.incident_id",
+                (report.school, report.building, incident.id),
+            )
+
+            self._since_expire += 1
+            if self._since_expire >= 256:
+                self._since_expire = 0
+                conn.execute("DELETE FROM incidents WHERE last_seen < ?", (cutoff,))
+                conn.execute(
+                    "DELETE FROM incident_places WHERE incident_id NOT IN (SELECT id FROM incidents)"
+                )
+            return incident, is_new
+
+    def claim_call(self, incident_id):
+        """True for exactly one caller per incident, in any process"""
+        with self.state.transaction() as conn:
+            return conn.execute(
+                "UPDATE incidents SET called = 1 WHERE id = ? AND called = 0", (incident_id,)
+            ).rowcount == 1
+
+    def release_call(self, incident_id):
+        with self.state.transaction() as conn:
+            conn.execute("UPDATE incidents SET called = 0 WHERE id = ?", (incident_id,))
+
+    def summaries(self, active_only=True, now=None):
+        now = now or datetime.datetime.utcnow()
+        cutoff = _epoch(now - self.window) if active_only else float("-inf")
+        rows = self.state.query(
+            f"SELECT {_COLUMNS} FROM incidents WHERE last_seen >= ? ORDER BY last_seen DESC",
+            (cutoff,),
+        )
+        return [_from_row(row).summary() for row in rows]
+
+    def get(self, incident_id):
+        rows = self.state.query(f"SELECT {_COLUMNS} FROM incidents WHERE id = ?", (incident_id,))
+        return _from_row(rows[0]).summary() if rows else None
+
+
+def make_incident_index(state):
+    """Incidents live next to the rest of the shared state when it is shared between processes"""
+    from shared_state import SqliteState
+
+    if isinstance(state, SqliteState):
+        return SharedIncidentIndex(state)
+    return IncidentIndex()
@@ -0,0 +1,338 @@
+import argparse
+import os
+import threading
+import time
+import uuid
+
+import cv2
+import numpy as np
+
+from checkpoint import Checkpointer
+from clips import ClipRecorder
+from dispatch.logger import configure_logging, logger
+from frame_sources import open_source, resolve_source
+from shared_state import make_state
+
+
+def annotate(processed_frame, tracker, stream):
+    """Draw doors, tracks, counts and the stream's location and message"""
+    # Draw door zones for every detected door
+    for door in tracker.doors:
+        # Draw big zone (blue)
+        cv2.polylines(
+            processed_frame,
+            [np.array(door.big_zone, np.int32)],
+            True,
+            (255, 0, 0),
+            2,
+        )
+        # Draw small zone (green)
+        cv2.polylines(
+            processed_frame,
+            [np.array(door.small_zone, np.int32)],
+            True,
+            (0, 255, 0),
+            2,
+        )
+        # Draw door box (red)
+        x1, y1, x2, y2 = door.box
+        cv2.rectangle(processed_frame, (x1, y1), (x2, y2), (0, 0, 255), 2)
+
+    # Draw person tracking boxes and IDs
+    for track_id in tracker.id_active:
+        if (
+            track_id in tracker.last_seen_frame
+            and tracker.frame_count - tracker.last_seen_frame[track_id]
+            <= tracker.MAX_MISSING_FRAMES
+        ):
+
+            # Get status color
+            status = tracker.id_status.get(track_id, "outside")
+            if status == "entered":
+                color = (0, 255, 0)  # Green for entered
+            elif status == "exited":
+                color = (0, 0, 255)  # Red for exited
+            else:
+                color = (255, 255, 0)  # Yellow for tracking
+
+            # Draw tracking history if available
+            trail = tracker.trail(track_id)
+            for (xa, ha), (xb, hb) in zip(trail, trail[1:]):
+                cv2.line(processed_frame, (int(xa), int(ha)), (int(xb), int(hb)), color, 2)
+
+            # Draw person ID and status
+            if trail:
+                x, y = map(int, trail[-1])
+                label = f"ID: {track_id} ({status})"
+                cv2.putText(
+                    processed_frame,
+                    label,
+                    (x, y - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX,
+                    0.5,
+                    color,
+                    2,
+                )
+
+    # Add counting information
+    total_count = max(0, tracker.entered_count - tracker.exited_count)
+    cv2.putText(
+        processed_frame,
+        f"Total Count: {total_count}",
+        (10, 30),
+        cv2.FONT_HERSHEY_SIMPLEX,
+        1,
+        (0, 255, 0),
+        2,
+    )
+    cv2.putText(
+        processed_frame,
+        f"Entered: {tracker.entered_count}",
+        (10, 70),
+        cv2.FONT_HERSHEY_SIMPLEX,
+        1,
+        (0, 255, 0),
+        2,
+    )
+    cv2.putText(
+        processed_frame,
+        f"Exited: {tracker.exited_count}",
+        (10, 110),
+        cv2.FONT_HERSHEY_SIMPLEX,
+        1,
+        (0, 0, 255),
+        2,
+    )
+
+    # Add location information
+    cv2.putText(
+        processed_frame,
+        f"{stream.get('university', '')} - {stream.get('building', '')}",
+        (10, 150),
+        cv2.FONT_HERSHEY_SIMPLEX,
+        1,
+        (255, 255, 255),
+        2,
+    )
+
+    # Add emergency message if present
+    if stream.get("message"):
+        cv2.putText(
+            processed_frame,
+            f"Message: {stream['message']}",
+            (10, 190),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            1,
+            (0, 0, 255),
+            2,
+        )
+
+    return processed_frame
+
+
+def tracker_stats(tracker):
+    """Everything the HTTP workers serve about the tracker, as plain JSON"""
+    return {
+        "entered": tracker.entered_count,
+        "exited": tracker.exited_count,
+        "count": max(0, tracker.entered_count - tracker.exited_count),
+        "doors": tracker.door_summaries(),
+        "runners": tracker.runner_stats(),
+        "detector": {
+            **tracker.resolution.stats(),
+            **tracker.crowd_stats(),
+            "motion_gate": tracker.gate_stats(),
+        },
+        "updated": time.time(),
+    }
+
+
+def new_generation():
+    """Token that tells the inference loop a stream was (re)started"""
+    return uuid.uuid4().hex
+
+
+class InferenceLoop:
+    """Reads the camera, runs the tracker and publishes the results to shared state.
+
+    HTTP workers only write the desired stream settings (key "stream") and
+    read what this loop publishes: the tracker's counts (key "tracker"),
+    its own status (key "stream_status") and the latest annotated JPEG.
+    Each published JPEG also goes to a ClipRecorder, which saves a clip
+    around every counting event unless CLIP_CAPTURE=0.
+
+    The tracker is checkpointed to TRACKER_CHECKPOINT every
+    CHECKPOINT_SECONDS and when the stream stops, and restored when the
+    loop starts, so a restart or reconnect keeps the building's counts.
+    Only a stream started with counts="reset" clears them. It runs on a
+    thread inside a single-worker server, or as its own process next to
+    several stateless workers.
+    """
+
+    def __init__(
+        self, state, tracker, poll_seconds=0.2, jpeg_quality=80, clips=None, checkpoint=None
+    ):
+        self.state = state
+        self.tracker = tracker
+        if clips is None and os.getenv("CLIP_CAPTURE", "1") == "1":
+            clips = ClipRecorder(
+                before_seconds=float(os.getenv("CLIP_SECONDS_BEFORE", "3")),
+                after_seconds=float(os.getenv("CLIP_SECONDS_AFTER", "3")),
+            )
+        self.clips = clips
+        if checkpoint is None:
+            path = os.getenv("TRACKER_CHECKPOINT", "runs/tracker_checkpoint.npz")
+            if path:
+                checkpoint = Checkpointer(path, float(os.getenv("CHECKPOINT_SECONDS", "5")))
+        self.checkpoint = checkpoint
+        self.poll_seconds = poll_seconds
+        self.jpeg_quality = jpeg_quality
+        self.capture = None
+        self.generation = None
+        # Camera the tracker's doors were calibrated on
+        self.source = None
+        # Held while the tracker changes, so uploads (process_upload) and the
+        # camera frames never run through it at the same time
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _status(self, status, error=None):
+        self.state.set(
+            "stream_status", {"status": status, "generation": self.generation, "error": error}
+        )
+
+    def _close(self, reset=False):
+        """Release the camera; keep the counts (checkpointed) unless reset is asked for"""
+        if self.capture is not None:
+            self.capture.release()
+            self.capture = None
+        if self.clips is not None:
+            self.clips.flush()
+        with self.lock:
+            if reset:
+                self.tracker.reset()
+                if self.checkpoint is not None:
+                    self.checkpoint.clear()
+            elif self.checkpoint is not None:
+                self.checkpoint.save(self.tracker, self.source)
+            stats = tracker_stats(self.tracker)
+        self.state.set("tracker", stats)
+
+    def _open(self, stream):
+        self._close(reset=stream.get("counts") == "reset")
+        self.generation = stream.get("generation")
+        source = str(stream.get("source") or os.getenv("CAMERA_SOURCE", "0"))
+        if source != self.source:
+            # Resumed counts carry over, but another camera's doors would not fit
+            with self.lock:
+                if self.tracker.door_found:
+                    logger.info("Camera changed from %s to %s; detecting doors again", self.source, source)
+                    self.tracker.forget_doors()
+            self.source = source
+        try:
+            self.capture = open_source(resolve_source(stream.get("source")))
+        except ValueError as e:
+            self._status("error", str(e))
+            return
+        if not self.capture.isOpened():
+            self.capture = None
+            self._status("error", "Could not open video capture")
+            return
+        # Keep the camera's buffer short and flush any stale frames
+        self.capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self.capture.set(cv2.CAP_PROP_FPS, 30)
+        for _ in range(5):
+            self.capture.read()
+        self._status("running")
+        logger.info("Inference loop opened %s", stream.get("source") or "the default camera")
+
+    def step(self):
+        """Handle one frame, or one poll of the settings while idle"""
+        stream = self.state.get("stream") or {}
+        if not stream.get("active"):
+            if self.capture is not None or self.generation is not None:
+                self._close()
+                self.generation = None
+                self._status("idle")
+            time.sleep(self.poll_seconds)
+            return
+        if stream.get("generation") != self.generation:
+            self._open(stream)
+        if self.capture is None:
+            time.sleep(self.poll_seconds)
+            return
+
+        ok, frame = self.capture.read()
+        if not ok:
+            time.sleep(0.1)
+            return
+        with self.lock:
+            self.tracker.process_frame(frame)
+            annotate(frame, self.tracker, stream)
+            events = self.tracker.events
+            stats = tracker_stats(self.tracker)
+            if self.checkpoint is not None:
+                self.checkpoint.maybe_save(self.tracker, self.source)
+        ok, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if ok:
+            jpeg = jpeg.tobytes()
+            self.state.publish_frame(jpeg)
+            if self.clips is not None:
+                self.clips.add(jpeg)
+                for event in events:
+                    self.clips.trigger(event)
+        self.state.set("tracker", stats)
+
+    def process_upload(self, frame):
+        """Count an uploaded frame on this loop's tracker, between camera frames"""
+        with self.lock:
+            self.tracker.process_frame(frame)
+            stats = tracker_stats(self.tracker)
+        self.state.set("tracker", stats)
+        return stats
+
+    def run(self):
+        with self.lock:
+            meta = self.checkpoint.restore(self.tracker) if self.checkpoint is not None else None
+            self.source = meta.get("source") if meta else None
+            stats = tracker_stats(self.tracker)
+        self.state.set("tracker", stats)
+        self._status("idle")
+        while not self._stop.is_set():
+            try:
+                self.step()
+            except Exception:
+                logger.exception("Inference loop step failed")
+                time.sleep(1)
+        self._close()
+
+    def start(self):
+        thread = threading.Thread(target=self.run, name="inference", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stop.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Dedicated inference process publishing counts for multi-worker servers"
+    )
+    parser.add_argument("--state-db", default=None, help="Defaults to STATE_DB, then state.db")
+    args = parser.parse_args()
+    configure_logging()
+
+    # The HTTP workers can only see this process's results through a shared backend
+    backend = os.getenv("STATE_BACKEND", "sqlite")
+    if backend == "memory":
+        parser.error("STATE_BACKEND=memory cannot be shared with the HTTP workers; use sqlite")
+
+    from DetectingExitsAndEntrance import DoorPersonTracker
+
+    state = make_state(backend, args.state_db)
+    InferenceLoop(state, DoorPersonTracker()).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import math
+
+
+class TrackKinematics:
+    """Centre position and box height of one track over a fixed window of frames.
+
+    Samples are written into preallocated ring buffers. Velocity is the
+    least-squares slope of the centre over the last `velocity_window`
+    samples; the sums that slope needs are updated as each sample enters
+    and the oldest one leaves, so updates and queries are O(1) and allocate
+    nothing.
+    """
+
+    __slots__ = (
+        "capacity", "velocity_window", "count",
+        "xs", "ys", "hs", "vxs", "vys",
+        "sum_x", "sum_y", "sum_tx", "sum_ty",
+    )
+
+    def __init__(self, capacity, velocity_window):
+        self.capacity = max(capacity, velocity_window, 2)
+        self.velocity_window = max(velocity_window, 2)
+        self.count = 0
+        self.xs = [0.0] * self.capacity
+        self.ys = [0.0] * self.capacity
+        self.hs = [0.0] * self.capacity
+        # Velocity after each sample, for acceleration
+        self.vxs = [0.0] * self.capacity
+        self.vys = [0.0] * self.capacity
+        # Running sums over the velocity window; t is the sample number
+        self.sum_x = self.sum_y = self.sum_tx = self.sum_ty = 0.0
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def update(self, x, y, height):
+        t = self.count
+        w = self.velocity_window
+        if t >= w:
+            # Drop the sample leaving the window before the ring slot is reused
+            old_t = t - w
+            j = old_t % self.capacity
+            self.sum_x -= self.xs[j]
+            self.sum_y -= self.ys[j]
+            self.sum_tx -= old_t * self.xs[j]
+            self.sum_ty -= old_t * self.ys[j]
+
+        i = t % self.capacity
+        self.xs[i] = x
+        self.ys[i] = y
+        self.hs[i] = height
+        self.sum_x += x
+        self.sum_y += y
+        self.sum_tx += t * x
+        self.sum_ty += t * y
+        self.count = t + 1
+        self.vxs[i], self.vys[i] = self.velocity()
+
+    def _back(self, values, k):
+        """The value k samples before the latest one"""
+        return values[(self.count - 1 - k) % self.capacity]
+
+    def height_change(self, frames):
+        """Latest height minus the height `frames` samples back, counting both ends"""
+        if frames < 1 or self.count < frames or frames > self.capacity:
+            return None
+        return self.hs[(self.count - 1) % self.capacity] - self._back(self.hs, frames - 1)
+
+    def velocity(self):
+        """Least-squares (vx, vy) in pixels per frame over the velocity window"""
+        n = min(self.count, self.velocity_window)
+        if n < 2:
+            return 0.0, 0.0
+        mean_t = self.count - (n + 1) / 2
+        spread = n * (n * n - 1) / 12
+        return (
+            (self.sum_tx - mean_t * self.sum_x) / spread,
+            (self.sum_ty - mean_t * self.sum_y) / spread,
+        )
+
+    def speed(self):
+        vx, vy = self.velocity()
+        return math.hypot(vx, vy)
+
+    def acceleration(self):
+        """Change in velocity per frame across the velocity window"""
+        w = self.velocity_window
+        if self.count <= w:
+            return 0.0
+        i = (self.count - 1) % self.capacity
+        dvx = self.vxs[i] - self._back(self.vxs, w)
+        dvy = self.vys[i] - self._back(self.vys, w)
+        return math.hypot(dvx, dvy) / w
+
+    def full(self):
+        """True once a whole velocity window has been seen"""
+        return self.count >= self.velocity_window
+
+    def last(self):
+        i = (self.count - 1) % self.capacity
+        return self.xs[i], self.ys[i], self.hs[i]
+
+    def history(self, limit=None):
+        """Oldest-first (x, height) pairs, for drawing trails"""
+        n = len(self) if limit is None else min(len(self), limit)
+        return [(self._back(self.xs, k), self._back(self.hs, k)) for k in range(n - 1, -1, -1)]
+
+    def state(self):
+        """Sample count and copies of the five ring buffers (x, y, height, vx, vy), for checkpoints.
+
+        Each buffer is a list of `capacity` floats; checkpoint.py stacks them
+        into a (5, capacity) array.
+        """
+        return self.count, [list(b) for b in (self.xs, self.ys, self.hs, self.vxs, self.vys)]
+
+    @classmethod
+    def from_state(cls, velocity_window, count, buffers):
+        """Rebuild from `state()`; the running sums are recomputed from the window"""
+        buffers = [list(map(float, b)) for b in buffers]
+        kinematics = cls(len(buffers[0]), velocity_window)
+        if kinematics.capacity != len(buffers[0]):
+            raise ValueError("velocity window is longer than the saved history")
+        kinematics.xs, kinematics.ys, kinematics.hs, kinematics.vxs, kinematics.vys = buffers
+        kinematics.count = int(count)
+        for t in range(max(0, kinematics.count - kinematics.velocity_window), kinematics.count):
+            i = t % kinematics.capacity
+            kinematics.sum_x += kinematics.xs[i]
+            kinematics.sum_y += kinematics.ys[i]
+            kinematics.sum_tx += t * kinematics.xs[i]
+            kinematics.sum_ty += t * kinematics.ys[i]
+        return kinematics
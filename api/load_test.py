@@ -0,0 +1,214 @@
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+RESULTS_DIR = Path(os.getenv("LOAD_TEST_DIR", "runs/load_test"))
+
+BUILDINGS = ["B240", "B250", "LIB", "GYM"]
+ROOMS = ["hall", "101", "102", "201"]
+
+
+def enter_request(rng):
+    building, room = rng.choice(BUILDINGS), rng.choice(ROOMS)
+    return "enter", "GET", f"/{building}/enter/{room}/{rng.randint(1, 3)}", None
+
+
+def exit_request(rng):
+    building, room = rng.choice(BUILDINGS), rng.choice(ROOMS)
+    return "exit", "GET", f"/{building}/exit/{room}/{rng.randint(1, 3)}", None
+
+
+def count_request(rng):
+    return "current-count", "GET", "/current-count", None
+
+
+def emergency_request(rng):
+    # A handful of sites, so some reports start incidents and most join them
+    lat, lon = rng.choice([(40.4237, -86.9212), (40.4274, -86.9169), (40.4310, -86.9150)])
+    body = {
+        "school": "Purdue",
+        "building": rng.choice(BUILDINGS),
+        "message": "Smoke on the second floor",
+        "location": {"latitude": lat + rng.uniform(-3e-4, 3e-4), "longitude": lon + rng.uniform(-3e-4, 3e-4)},
+    }
+    return "submit-emergency", "POST", "/submit-emergency", body
+
+
+# Traffic mixes: request builders and their relative weights
+MIXES = {
+    "edge-burst": [(enter_request, 1), (exit_request, 1)],
+    "dashboard-poll": [(count_request, 1)],
+    "emergency-spike": [(emergency_request, 4), (count_request, 1)],
+    "mixed": [(enter_request, 3), (exit_request, 3), (count_request, 10), (emergency_request, 1)],
+}
+
+
+def serve(port):
+    """Run the app with Twilio and the camera stubbed out"""
+    os.environ.setdefault("REPORTS_DB", str(Path(tempfile.mkdtemp()) / "reports.db"))
+    os.environ.setdefault("LOG_FILE", os.devnull)
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("CAMERA_SOURCE", "synthetic")
+    os.environ.setdefault("GENERATED_AUDIO_DIR", tempfile.mkdtemp())
+
+    import uvicorn
+
+    import main
+    from DetectingExitsAndEntrance import DoorPersonTracker
+    from inference import tracker_stats
+
+    def load_tracker():
+        # Counting state without the detectors, so reads see a real tracker
+        main.tracker = DoorPersonTracker(models=False, motion_gate=False)
+        main.state.set("tracker", tracker_stats(main.tracker))
+
+    main.twilio_call = lambda txt: None
+    main.subsystems.register("tracker", load_tracker)
+    main.subsystems.register("twilio", lambda: None)
+    uvicorn.run(main.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+async def wait_ready(client, timeout=60):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if (await client.get("/readyz")).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise SystemExit("Server did not become ready")
+
+
+async def worker(client, mix, deadline, samples, rng):
+    builders = [b for b, _ in mix]
+    weights = [w for _, w in mix]
+    while time.perf_counter() < deadline:
+        name, method, path, body = rng.choices(builders, weights)[0](rng)
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, path, json=body)
+            ok = response.status_code < 400
+        except Exception:
+            ok = False
+        samples.append((name, time.perf_counter() - start, ok))
+
+
+async def run_mix(url, mix_name, concurrency, seconds, seed):
+    import httpx
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        await wait_ready(client)
+        # Edge counters register their rooms before sending counts
+        for building in BUILDINGS:
+            for room in ROOMS:
+                await client.get(f"/{building}/add/{room}/")
+        samples = []
+        deadline = time.perf_counter() + seconds
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            worker(client, MIXES[mix_name], deadline, samples, random.Random(seed + i))
+            for i in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - start
+    return summarize(samples, elapsed)
+
+
+def summarize(samples, elapsed):
+    endpoints = {}
+    for name in sorted({s[0] for s in samples}):
+        latencies = np.array([s[1] for s in samples if s[0] == name]) * 1000
+        errors = sum(1 for s in samples if s[0] == name and not s[2])
+        endpoints[name] = {
+            "requests": len(latencies),
+            "errors": errors,
+            "rps": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+            "p99_ms": round(float(np.percentile(latencies, 99)), 2),
+        }
+    return {
+        "seconds": round(elapsed, 2),
+        "requests": len(samples),
+        "rps": round(len(samples) / elapsed, 1),
+        "endpoints": endpoints,
+    }
+
+
+def print_report(result, previous=None):
+    print(f"{result['mix']}: {result['requests']} requests in {result['seconds']}s, "
+          f"{result['rps']} req/s at concurrency {result['concurrency']}")
+    before = (previous or {}).get("endpoints", {})
+    for name, stats in result["endpoints"].items():
+        line = (
+            f"  {name:>17}: {stats['rps']:>8} req/s  p50 {stats['p50_ms']:>7}ms  "
+            f"p95 {stats['p95_ms']:>7}ms  p99 {stats['p99_ms']:>7}ms  {stats['errors']} errors"
+        )
+        if name in before:
+            line += f"  (p95 was {before[name]['p95_ms']}ms, {before[name]['rps']} req/s)"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the API with realistic traffic mixes")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    srv = sub.add_parser("serve", help="Run the app with Twilio and the camera stubbed out")
+    srv.add_argument("--port", type=int, default=8765)
+
+    run = sub.add_parser("run", help="Send a traffic mix and report latency per endpoint")
+    run.add_argument("--mix", nargs="+", default=["mixed"], choices=sorted(MIXES))
+    run.add_argument("--concurrency", type=int, default=32)
+    run.add_argument("--seconds", type=float, default=20)
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--url", default=None, help="Test a running server instead of starting a stubbed one")
+    run.add_argument("--port", type=int, default=8765)
+    run.add_argument("--compare", default=None, help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.port)
+        return
+
+    server = None
+    url = args.url
+    if url is None:
+        url = f"http://127.0.0.1:{args.port}"
+        server = subprocess.Popen([sys.executable, __file__, "serve", "--port", str(args.port)])
+
+    previous = {}
+    if args.compare:
+        previous = {r["mix"]: r for r in json.loads(Path(args.compare).read_text())["results"]}
+
+    results = []
+    try:
+        for mix in args.mix:
+            result = asyncio.run(run_mix(url, mix, args.concurrency, args.seconds, args.seed))
+            result.update({"mix": mix, "concurrency": args.concurrency})
+            results.append(result)
+            print_report(result, previous.get(mix))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    out = RESULTS_DIR / f"{stamp}.json"
+    out.write_text(json.dumps({"created": stamp, "url": url, "stubbed": server is not None, "results": results}, indent=2))
+    print(f"\nResults written to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,23 +2,23 @@ import asyncio
 import datetime
 import os
 import sys
+import time
 from pathlib import Path
-from typing import Optional
+from typing import Literal, Optional
 from urllib.request import urlopen
 
+# Taken before the third-party imports, so the "imports" phase includes them
+IMPORT_STARTED = time.perf_counter()
+
 import cv2
 import numpy as np
 from cv2.typing import MatLike
 from dotenv import load_dotenv
-from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi import FastAPI, File, HTTPException, Query, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, StreamingResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel, Field
 
-from DetectingExitsAndEntrance import DoorPersonTracker
-from dispatch.tw_call import call as twilio_call_
-
 # Load environment variables
 load_dotenv()
 
@@ -26,9 +26,25 @@ load_dotenv()
 # This is to ensure that 'dispatch' can be found
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from dispatch.logger import logger
+from dispatch.logger import Lazy, configure_logging, logger
+from audio_stream import retention_loop
+from audio_stream import router as audio_router
+from clips import clip_path, list_clips
+from frame_sources import resolve_source
+from incidents import make_incident_index
+from inference import InferenceLoop, new_generation
+from report_store import ReportStore
+from shared_state import make_state
+from snapshots import SnapshotCache, snap_width
+from startup import Subsystems
+from static_assets import CachedPage, PrecompressedStaticFiles
+
+configure_logging()
+subsystems = Subsystems(started=IMPORT_STARTED)
+subsystems.mark("imports")
 
 app = FastAPI()
+app.include_router(audio_router)
 
 # CORS Configuration
 app.add_middleware(
@@ -44,7 +60,24 @@ app.add_middleware(
 )
 
 
+@app.on_event("startup")
+async def start_audio_retention():
+    # Keep generated audio from growing without limit
+    max_age = float(os.getenv("AUDIO_RETENTION_HOURS", "24")) * 3600
+    max_files = int(os.getenv("AUDIO_MAX_FILES", "500"))
+    asyncio.create_task(retention_loop(max_age, max_files, interval_seconds=600))
+
+
+@app.on_event("startup")
+async def start_subsystems():
+    # The server is already accepting requests; models and clients load behind it
+    subsystems.mark("app_setup")
+    subsystems.start()
+
+
 def twilio_call(txt: str):
+    from dispatch.tw_call import call as twilio_call_
+
     twilio_call_(
         txt,
         Path("dispatch/caller.txt").read_text(),
@@ -52,19 +85,88 @@ def twilio_call(txt: str):
     )
 
 
-# Global variables for stream management
-stream_active = False
-current_message = ""
-current_university = ""
-current_building = ""
-video_capture = None
-tracker = DoorPersonTracker()
+# Buildings, stream settings and the tracker's published counts live here so
+# every worker sees the same values; use STATE_BACKEND=sqlite with several workers
+state = make_state()
+subsystems.mark("state_backend")
+# INFERENCE_PROCESS=1 means a separate `python inference.py` owns the camera and tracker
+EXTERNAL_INFERENCE = os.getenv("INFERENCE_PROCESS", "0") == "1"
+STREAM_START_TIMEOUT = float(os.getenv("STREAM_START_TIMEOUT", "10"))
+snapshots = SnapshotCache(state)
+
+# This process's own tracker, which stays None with an external inference process
+tracker = None
+inference_loop = None
+
+
+def load_tracker():
+    global tracker, inference_loop
+    from DetectingExitsAndEntrance import DoorPersonTracker
+
+    tracker = DoorPersonTracker()
+    inference_loop = InferenceLoop(state, tracker)
+    inference_loop.start()
+
+
+def load_twilio():
+    from dispatch.tw_call import get_client
+
+    get_client()
+
+
+if not EXTERNAL_INFERENCE:
+    subsystems.register("tracker", load_tracker)
+# Calls fail without credentials, but the camera and counts still work
+subsystems.register("twilio", load_twilio, required=False)
+
+
+def require_tracker():
+    """This process's tracker, for work that needs the model itself"""
+    if tracker is None:
+        if EXTERNAL_INFERENCE:
+            raise HTTPException(status_code=503, detail="The tracker runs in the inference process")
+        raise HTTPException(status_code=503, detail="Tracker is still loading")
+    return tracker
+
+
+def published_tracker():
+    """The tracker's latest counts as published by the inference loop"""
+    stats = state.get("tracker")
+    if stats is None:
+        raise HTTPException(status_code=503, detail="Tracker is still loading")
+    return stats
+
+
+def tracker_occupancy():
+    stats = state.get("tracker")
+    return stats["count"] if stats else 0
+
+
+def stream_settings():
+    return state.get("stream") or {}
 
-# Buildings data structure
-buildings = {}
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving requests"""
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: every required subsystem has finished loading"""
+    status = subsystems.status()
+    if not status["ready"]:
+        return JSONResponse(status_code=503, content=status)
+    return status
 
 # Emergency reports storage
-emergency_reports = []
+report_store = ReportStore(os.getenv("REPORTS_DB", "reports.db"))
+subsystems.mark("reports_db")
+
+# Reports close in space and time are grouped so an incident is called in once;
+# with STATE_BACKEND=sqlite every worker groups into the same incidents
+incident_index = make_incident_index(state)
 
 
 class LocationData(BaseModel):
@@ -84,15 +186,17 @@ class StreamSettings(BaseModel):
     university: str
     building: str
     message: Optional[str] = None
+    # Camera index, "synthetic" or a name from CAMERA_SOURCES; defaults to CAMERA_SOURCE
+    source: Optional[str] = None
+    # "resume" keeps counting from the last checkpoint; "reset" starts from zero
+    counts: Literal["resume", "reset"] = "resume"
 
 
 class MessageUpdate(BaseModel):
     message: str
 
 
-@app.get("/{building}/feed", response_class=HTMLResponse)
-async def feed(building):
-    return """<!DOCTYPE html>
+FEED_HTML = """<!DOCTYPE html>
 <html>
 <head>
 <title>Building Monitor</title>
@@ -116,24 +220,28 @@ async def feed(building):
 </body>
 </html>
 """
+feed_page = CachedPage(FEED_HTML)
+
+
+@app.get("/{building}/feed", response_class=HTMLResponse)
+async def feed(building, request: Request):
+    # The page fetches counts relative to its own URL, so every building shares it
+    return feed_page.response(request)
 
 
 @app.get("/{building}/count")
 async def show(building):
-    if not building in buildings:
-        # Return empty object if building not found
-        return {}
-
-    return buildings[building]
+    # Empty object if the building is not found
+    return state.building(building) or {}
 
 
 @app.get("/{building}/stats")
 async def building_stats(building):
     """Return aggregated statistics for a building"""
-    if not building in buildings:
+    rooms = state.building(building)
+    if rooms is None:
         return {"entered": 0, "exited": 0}
 
-    rooms = buildings[building]
     total_people = sum(rooms.values())
 
     # For now, we're estimating exited count
@@ -143,10 +251,7 @@ async def building_stats(building):
 
 @app.get("/{building}/add/{room}/")
 async def add_room(building, room):
-    if not building in buildings:
-        buildings[building] = {}
-    if not room in buildings[building]:
-        buildings[building][room] = 0
+    state.add_room(building, room)
 
 
 @app.get("/{building}/enter/{room_enter}/{person_count}")
@@ -160,33 +265,40 @@ async def update_full_exit(building, room_exit, person_count):
 
 
 def update_req(building, room_leave, room_enter, person_count):
-    if not building in buildings:
-        buildings[building] = {}
     pcount = int(person_count)
+    # Each change is one atomic update, so concurrent workers never lose counts
     if room_enter != "":
-        if room_enter in buildings[building]:
-            buildings[building][room_enter] = buildings[building][room_enter] + pcount
-        else:
-            buildings[building][room_enter] = 0 + pcount
+        state.change_room(building, room_enter, pcount)
     if room_leave != "":
-        buildings[building][room_leave] = max(
-            buildings[building][room_leave] - pcount, 0
-        )
-    print(buildings)
+        state.change_room(building, room_leave, -pcount)
+    logger.debug("Building %s: %s", building, Lazy(lambda: state.building(building)))
     return {}
 
 
 @app.post("/submit-emergency")
 async def submit_emergency(report: EmergencyReport):
-    logger.info(f"Received emergency report: {report.model_dump_json()}")
+    logger.info("Received emergency report: %s", Lazy(report.model_dump_json))
+
+    incident, _ = incident_index.assign(report)
+    if not incident_index.claim_call(incident.id):
+        # Another report, maybe on another worker, called this incident in; just record this one
+        report_store.add(report)
+        logger.info(
+            "Report added to incident %d (%d reports)",
+            incident.id,
+            incident.report_count,
+        )
+        return {
+            "status": "Emergency report added to an existing incident",
+            "incident_id": incident.id,
+            "report_count": incident.report_count,
+        }
 
     # Get the current count of people in the building if available
-    building_count = 0
-    if report.building in buildings:
-        building_count = sum(buildings[report.building].values())
+    building_count = sum((state.building(report.building) or {}).values())
 
     # Get the count from the tracker as well
-    tracker_count = max(0, tracker.entered_count - tracker.exited_count)
+    tracker_count = tracker_occupancy()
 
     # Use the larger of the two counts
     total_count = max(building_count, tracker_count)
@@ -198,291 +310,164 @@ async def submit_emergency(report: EmergencyReport):
 
     try:
         logger.info(
-            f"Number of people using the main door: {tracker.entered_count - tracker.exited_count}"
+            "Number of people using the main door: %d",
+            tracker_occupancy(),
         )
         # Call the Twilio function
         twilio_call(full_message)
         logger.info("Twilio call initiated successfully.")
 
         # Store the emergency report
-        emergency_reports.append(report)
+        report_store.add(report)
 
         return {
             "status": "Emergency report submitted and call initiated",
             "building_count": total_count,
+            "incident_id": incident.id,
         }
     except Exception as e:
-        logger.error(f"Error initiating Twilio call: {e}")
+        logger.error("Error initiating Twilio call: %s", e)
+        incident_index.release_call(incident.id)
         raise HTTPException(
             status_code=500, detail=f"Failed to initiate call: {str(e)}"
         )
 
 
 @app.get("/emergency-reports")
-async def get_emergency_reports():
-    """Get all emergency reports (admin only endpoint)"""
-    return emergency_reports
-
-
-def get_frame():
-    global video_capture, tracker
-    if video_capture is None or not video_capture.isOpened():
-        return None
-
-    success, frame = video_capture.read()
-    if not success:
-        return None
-
-    # Process frame with tracker
-    processed_frame = tracker.process_frame(frame)
-
-    # Draw door zones if detected
-    if tracker.door_found:
-        # Draw big zone (blue)
-        cv2.polylines(
-            processed_frame,
-            [np.array(tracker.BIG_ZONE, np.int32)],
-            True,
-            (255, 0, 0),
-            2,
+async def get_emergency_reports(
+    school: Optional[str] = None,
+    building: Optional[str] = None,
+    since: Optional[datetime.datetime] = None,
+    until: Optional[datetime.datetime] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+):
+    """Get emergency reports (admin only endpoint)
+
+    Without cursor or limit this is the plain list of every matching report,
+    oldest first, as before pagination. With either, the response is one page
+    newest first, {"reports": [...], "next_cursor": ...}: pass next_cursor to
+    get the next page. format=ndjson streams every matching report instead.
+    """
+    if format == "ndjson":
+        return StreamingResponse(
+            report_store.iter_ndjson(school, building, since, until),
+            media_type="application/x-ndjson",
         )
-        # Draw small zone (green)
-        cv2.polylines(
-            processed_frame,
-            [np.array(tracker.SMALL_ZONE, np.int32)],
-            True,
-            (0, 255, 0),
-            2,
-        )
-        # Draw door box (red)
-        if tracker.fixed_door_box:
-            x1, y1, x2, y2 = tracker.fixed_door_box
-            cv2.rectangle(processed_frame, (x1, y1), (x2, y2), (0, 0, 255), 2)
-
-    # Draw person tracking boxes and IDs
-    for track_id in tracker.id_active:
-        if (
-            track_id in tracker.last_seen_frame
-            and tracker.frame_count - tracker.last_seen_frame[track_id]
-            <= tracker.MAX_MISSING_FRAMES
-        ):
-
-            # Get status color
-            status = tracker.id_status.get(track_id, "outside")
-            if status == "entered":
-                color = (0, 255, 0)  # Green for entered
-            elif status == "exited":
-                color = (0, 0, 255)  # Red for exited
-            else:
-                color = (255, 255, 0)  # Yellow for tracking
-
-            # Draw tracking history if available
-            if track_id in tracker.track_history and track_id in tracker.height_history:
-                history = list(tracker.track_history[track_id])
-                heights = list(tracker.height_history[track_id])
-
-                # Only draw if we have both position and height data
-                min_len = min(len(history), len(heights))
-                for i in range(1, min_len):
-                    try:
-                        pt1 = (int(history[i - 1]), int(heights[i - 1]))
-                        pt2 = (int(history[i]), int(heights[i]))
-                        cv2.line(processed_frame, pt1, pt2, color, 2)
-                    except (IndexError, ValueError):
-                        continue
-
-            # Draw person ID and status
-            if track_id in tracker.track_history:
-                x = int(list(tracker.track_history[track_id])[-1])
-                y = (
-                    int(list(tracker.height_history[track_id])[-1])
-                    if track_id in tracker.height_history
-                    else 30
-                )
-                label = f"ID: {track_id} ({status})"
-                cv2.putText(
-                    processed_frame,
-                    label,
-                    (x, y - 10),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.5,
-                    color,
-                    2,
-                )
-
-    # Add counting information
-    total_count = max(0, tracker.entered_count - tracker.exited_count)
-    cv2.putText(
-        processed_frame,
-        f"Total Count: {total_count}",
-        (10, 30),
-        cv2.FONT_HERSHEY_SIMPLEX,
-        1,
-        (0, 255, 0),
-        2,
-    )
-    cv2.putText(
-        processed_frame,
-        f"Entered: {tracker.entered_count}",
-        (10, 70),
-        cv2.FONT_HERSHEY_SIMPLEX,
-        1,
-        (0, 255, 0),
-        2,
-    )
-    cv2.putText(
-        processed_frame,
-        f"Exited: {tracker.exited_count}",
-        (10, 110),
-        cv2.FONT_HERSHEY_SIMPLEX,
-        1,
-        (0, 0, 255),
-        2,
-    )
 
-    # Add location information
-    cv2.putText(
-        processed_frame,
-        f"{current_university} - {current_building}",
-        (10, 150),
-        cv2.FONT_HERSHEY_SIMPLEX,
-        1,
-        (255, 255, 255),
-        2,
-    )
+    if cursor is None and limit is None:
+        return report_store.list_all(school, building, since, until)
 
-    # Add emergency message if present
-    if current_message:
-        cv2.putText(
-            processed_frame,
-            f"Message: {current_message}",
-            (10, 190),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            1,
-            (0, 0, 255),
-            2,
+    try:
+        reports, next_cursor = report_store.page(
+            school, building, since, until, cursor, limit or 100
         )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"reports": reports, "next_cursor": next_cursor}
 
-    return processed_frame
 
+@app.get("/incidents")
+async def get_incidents(include_closed: bool = False):
+    """Summaries of incidents with their report counts and centroids"""
+    return incident_index.summaries(active_only=not include_closed)
 
-async def generate_frames():
-    while stream_active:
-        if video_capture is None or not video_capture.isOpened():
-            await asyncio.sleep(0.1)
-            continue
 
-        frame = get_frame()
-        if frame is None:
-            await asyncio.sleep(0.1)
-            continue
+@app.get("/incidents/{incident_id}")
+async def get_incident(incident_id: int):
+    summary = incident_index.get(incident_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Incident not found")
+    return summary
 
-        # Encode frame as JPEG
-        _, buffer = cv2.imencode(".jpg", frame)
-        frame_bytes = buffer.tobytes()
+
+async def generate_frames():
+    # Frames come from the inference loop, whichever process it runs in
+    last_seq = 0
+    while stream_settings().get("active"):
+        seq, jpeg = state.latest_frame()
+        if jpeg is None or seq == last_seq:
+            await asyncio.sleep(0.01)
+            continue
+        last_seq = seq
 
         # Yield frame in MJPEG format
-        yield (
-            b"--frame\r\n" b"Content-Type: image/jpeg\r\n\r\n" + frame_bytes + b"\r\n"
-        )
+        yield b"--frame\r\n" b"Content-Type: image/jpeg\r\n\r\n" + jpeg + b"\r\n"
 
         await asyncio.sleep(0.033)  # ~30 FPS
 
 
-def cleanup_stream():
-    global stream_active, video_capture, current_message, current_university, current_building
-    stream_active = False
-    if video_capture is not None:
-        video_capture.release()
-        video_capture = None
-    current_message = ""
-    current_university = ""
-    current_building = ""
-
-
 @app.post("/start_stream")
 async def start_stream(settings: StreamSettings):
-    global stream_active, current_message, current_university, current_building, video_capture, tracker
-
-    # First ensure any existing stream is fully cleaned up
-    await stop_stream()
-
+    if not EXTERNAL_INFERENCE:
+        require_tracker()
     try:
-        # Reset tracker state
-        tracker.reset()
-
-        # Initialize video capture
-        video_capture = cv2.VideoCapture(0)
-        if not video_capture.isOpened():
-            raise HTTPException(status_code=500, detail="Could not open video capture")
-
-        # Set video capture properties to ensure fresh start
-        video_capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-        video_capture.set(cv2.CAP_PROP_FPS, 30)
-
-        # Clear a few frames to flush any old data
-        for _ in range(5):
-            video_capture.read()
+        resolve_source(settings.source)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # A new generation makes the inference loop reopen the camera, and reset the
+    # tracker if asked to
+    generation = new_generation()
+    state.set(
+        "stream",
+        {
+            "active": True,
+            "university": settings.university,
+            "building": settings.building,
+            "message": settings.message or "",
+            "source": settings.source,
+            "counts": settings.counts,
+            "generation": generation,
+        },
+    )
 
-        stream_active = True
-        current_university = settings.university
-        current_building = settings.building
-        if settings.message:
-            current_message = settings.message
+    # Wait to hear whether the camera opened
+    deadline = time.perf_counter() + STREAM_START_TIMEOUT
+    while time.perf_counter() < deadline:
+        status = state.get("stream_status") or {}
+        if status.get("generation") == generation:
+            if status["status"] == "running":
+                return {"status": "Stream started"}
+            if status["status"] == "error":
+                state.merge("stream", {"active": False})
+                raise HTTPException(status_code=500, detail=status["error"])
+        await asyncio.sleep(0.05)
 
-        return {"status": "Stream started"}
-    except Exception as e:
-        if video_capture:
-            video_capture.release()
-        stream_active = False
-        current_message = ""
-        current_university = ""
-        current_building = ""
-        raise HTTPException(status_code=500, detail=str(e))
+    state.merge("stream", {"active": False})
+    raise HTTPException(status_code=500, detail="Timed out waiting for the camera to open")
 
 
 @app.post("/stop_stream")
 async def stop_stream():
-    global stream_active, video_capture, tracker, current_message, current_university, current_building
-
-    try:
-        # Reset tracker state
-        tracker.reset()
+    # The inference loop releases the camera and checkpoints the tracker; counts survive
+    state.merge("stream", {"active": False, "message": "", "university": "", "building": ""})
 
-        # Release and cleanup video capture
-        if video_capture:
-            video_capture.release()
-        video_capture = None
+    # Wait until the loop has actually let go of the camera
+    deadline = time.perf_counter() + STREAM_START_TIMEOUT
+    while (state.get("stream_status") or {}).get("status") == "running":
+        if time.perf_counter() > deadline:
+            raise HTTPException(status_code=500, detail="Timed out waiting for the camera to close")
+        await asyncio.sleep(0.05)
 
-        # Reset all stream-related variables
-        stream_active = False
-        current_message = ""
-        current_university = ""
-        current_building = ""
-
-        # Small delay to ensure cleanup is complete
-        await asyncio.sleep(0.1)
-
-        return {"status": "Stream stopped"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return {"status": "Stream stopped"}
 
 
 @app.post("/update_message")
 async def update_message(message_update: MessageUpdate):
-    global current_message
-    current_message = message_update.message
+    stream = state.merge("stream", {"message": message_update.message})
 
     # If there's an active count, include it in the Twilio message
-    if tracker is not None:
-        total_count = max(0, tracker.entered_count - tracker.exited_count)
-        full_message = f"Emergency at {current_university}, {current_building}. {message_update.message}. Current occupancy: {total_count} people."
+    if state.get("tracker") is not None:
+        total_count = tracker_occupancy()
+        full_message = f"Emergency at {stream.get('university', '')}, {stream.get('building', '')}. {message_update.message}. Current occupancy: {total_count} people."
 
         try:
             twilio_call(full_message)
             logger.info("Twilio call initiated with updated message and count")
         except Exception as e:
-            logger.error(f"Error initiating Twilio call: {e}")
+            logger.error("Error initiating Twilio call: %s", e)
             raise HTTPException(
                 status_code=500, detail=f"Failed to initiate call: {str(e)}"
             )
@@ -492,7 +477,7 @@ async def update_message(message_update: MessageUpdate):
 
 @app.get("/video_feed")
 async def video_feed():
-    if not stream_active:
+    if not stream_settings().get("active"):
         raise HTTPException(status_code=400, detail="Stream not active")
 
     return StreamingResponse(
@@ -500,6 +485,54 @@ async def video_feed():
     )
 
 
+@app.get("/snapshot")
+async def snapshot(
+    request: Request,
+    width: Optional[int] = Query(None, ge=32, le=3840),
+    wait: float = Query(0, ge=0, le=30),
+):
+    """Latest annotated frame as a JPEG, optionally scaled down to about width.
+
+    The width is rounded up to one of snapshots.THUMBNAIL_WIDTHS. The ETag
+    is the frame sequence number. A matching If-None-Match gets a 304, or
+    with wait=N the request is held up to N seconds for the next frame.
+    """
+    if width is not None:
+        width = snap_width(width)
+    seq, jpeg = await snapshots.latest(width)
+    if jpeg is None:
+        raise HTTPException(status_code=503, detail="No frame yet")
+
+    def tag(seq):
+        return f'"{seq}-{width}"' if width else f'"{seq}"'
+
+    if_none_match = request.headers.get("if-none-match", "")
+    if tag(seq) in [t.strip() for t in if_none_match.split(",")]:
+        if not wait or not await snapshots.wait_for_newer(seq, wait):
+            return Response(status_code=304, headers={"ETag": tag(seq)})
+        seq, jpeg = await snapshots.latest(width)
+
+    return Response(
+        jpeg,
+        media_type="image/jpeg",
+        headers={"ETag": tag(seq), "Cache-Control": "no-cache"},
+    )
+
+
+@app.get("/clips")
+async def clips(limit: int = Query(100, ge=1, le=1000)):
+    """Saved clips around entry and exit events, newest first"""
+    return {"clips": list_clips(limit=limit)}
+
+
+@app.get("/clips/{event_id}")
+async def get_clip(event_id: str):
+    path = clip_path(event_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Clip not found")
+    return FileResponse(path, media_type="video/x-msvideo", filename=path.name)
+
+
 @app.post("/process-image/")
 async def process_image(file: UploadFile = File(...)):
     contents = await file.read()  # read bytes
@@ -507,13 +540,14 @@ async def process_image(file: UploadFile = File(...)):
     nparr = np.frombuffer(contents, np.uint8)
     img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
 
-    # Process the frame
-    tracker.process_frame(img)
+    if img is None:
+        raise HTTPException(status_code=400, detail="Could not decode the image")
 
-    if tracker.entered_count - tracker.exited_count < 0:
-        final = 0
-    else:
-        final = tracker.entered_count - tracker.exited_count
+    # Process the frame on the inference loop's tracker, off the event loop and
+    # never at the same time as a camera frame
+    require_tracker()
+    stats = await asyncio.to_thread(inference_loop.process_upload, img)
+    final = stats["count"]
 
     # You can return info, e.g., counts, or send back an image as bytes
     # Here just return counts for example:
@@ -523,21 +557,32 @@ async def process_image(file: UploadFile = File(...)):
 @app.get("/current-count")
 async def get_current_count():
     """Get the current count of people from the tracker"""
-    if tracker is not None:
-        current_count = max(0, tracker.entered_count - tracker.exited_count)
-    else:
-        current_count = 0
+    return {"count": tracker_occupancy()}
+
+
+@app.get("/door-counts")
+async def door_counts():
+    """Entered/exited counts for each door the camera sees"""
+    return {"doors": published_tracker()["doors"]}
+
 
-    return {"count": current_count}
+@app.get("/runners")
+async def runners():
+    """People moving faster than SPEED_THRESHOLD, and whether enough of them to flag panic"""
+    return published_tracker()["runners"]
+
+
+@app.get("/detector-stats")
+async def detector_stats():
+    """Person model input size, smoothed inference latency, counting mode and motion gate"""
+    return published_tracker()["detector"]
 
 
 @app.get("/get-talking-points")
 async def get_talking_points():
     """Get talking points and current building information"""
     # Get current count from tracker
-    current_count = (
-        max(0, tracker.entered_count - tracker.exited_count) if tracker else 0
-    )
+    current_count = tracker_occupancy()
 
     # For demo purposes, using hardcoded location
     # In a real app, this would come from a geocoding service
@@ -561,9 +606,23 @@ async def get_talking_points():
     }
 
 
+# Read and compressed on a background thread at startup, like the static mounts
+connect_page = None
+
+
+def load_connect_page():
+    global connect_page
+    connect_page = CachedPage.from_file("../frontend/public/connect.html")
+
+
+subsystems.register("connect_page", load_connect_page, required=False)
+
+
 @app.get("/connect", response_class=HTMLResponse)
-async def connect_serve():
-    return Path("../frontend/public/connect.html").read_text()
+async def connect_serve(request: Request):
+    if connect_page is None:
+        raise HTTPException(status_code=503, detail="Connect page is not loaded")
+    return connect_page.response(request)
 
 
 class DataURLResponse(BaseModel):
@@ -599,10 +658,25 @@ async def connect_recv(dataurl: DataURLResponse):
 
 
 # Mount the static files directory for serving the React frontend
-app.mount("/static", StaticFiles(directory="../frontend/public"), name="static")
+# frontend/public stays the root of /static; only paths missing from it fall
+# through to the build's hashed bundles, which are part of the public build anyway
+static_files = PrecompressedStaticFiles(
+    directory="../frontend/public", fallback_directories=["../frontend/build/static"]
+)
+app.mount("/static", static_files, name="static")
 
 # Mount the frontend build directory as the root
-app.mount("/", StaticFiles(directory="../frontend/build", html=True), name="frontend")
+frontend_files = PrecompressedStaticFiles(directory="../frontend/build", html=True)
+app.mount("/", frontend_files, name="frontend")
+
+
+def load_static_assets():
+    static_files.precompress()
+    frontend_files.precompress()
+
+
+# Assets are served uncompressed-on-demand until this finishes
+subsystems.register("static_assets", load_static_assets, required=False)
 
 if __name__ == "__main__":
     import uvicorn
@@ -616,4 +690,17 @@ if __name__ == "__main__":
             "WARNING: TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN environment variables not set"
         )
 
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    workers = int(os.getenv("API_WORKERS", "1"))
+    if workers == 1:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
+    else:
+        # Stateless HTTP workers share state through SQLite; one process does inference
+        import subprocess
+
+        os.environ.setdefault("STATE_BACKEND", "sqlite")
+        os.environ["INFERENCE_PROCESS"] = "1"
+        inference = subprocess.Popen([sys.executable, "inference.py"])
+        try:
+            uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=workers)
+        finally:
+            inference.terminate()
@@ -0,0 +1,279 @@
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+RECORDING_VERSION = 2
+
+# Fixed-width records appended to flat binary files and read back with np.memmap.
+# Crowd-mode frames have no tracks; they keep the counts optical flow added instead.
+FRAME_DTYPE = np.dtype(
+    [
+        ("person_start", "<i8"),
+        ("person_count", "<i4"),
+        ("track_start", "<i8"),
+        ("track_count", "<i4"),
+        ("crowd", "?"),
+        ("crowd_entered", "<i4"),
+        ("crowd_exited", "<i4"),
+    ]
+)
+PERSON_DTYPE = np.dtype([("ltrb", "<f4", 4), ("conf", "<f4")])
+TRACK_DTYPE = np.dtype([("track_id", "<i8"), ("ltrb", "<f4", 4), ("confirmed", "?")])
+
+
+class DetectionRecorder:
+    """Appends each frame's person boxes, door boxes and tracker output to disk.
+
+    Attach to a tracker with `tracker.recorder = DetectionRecorder(path, ...)`;
+    only fixed-size records are written per frame, so it adds no per-frame
+    allocations beyond the bytes themselves.
+    """
+
+    def __init__(self, path, width, height, fps, imgsz=None):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.meta = {
+            "version": RECORDING_VERSION,
+            "width": width,
+            "height": height,
+            "fps": fps,
+            # Detector input size at the start; the sweep prices detector runs with it
+            "imgsz": imgsz,
+            "doors": [],
+            "door_frame": None,
+        }
+        self._frames = open(self.path / "frames.bin", "wb")
+        self._persons = open(self.path / "persons.bin", "wb")
+        self._tracks = open(self.path / "tracks.bin", "wb")
+        self._person_total = 0
+        self._track_total = 0
+        self.frame_count = 0
+
+    def record_doors(self, frame_number, boxes):
+        self.meta["doors"] = [list(map(int, b)) for b in boxes]
+        self.meta["door_frame"] = frame_number
+
+    def record_frame(self, person_boxes, person_conf, tracks):
+        persons = np.zeros(len(person_conf), PERSON_DTYPE)
+        if len(persons):
+            persons["ltrb"] = person_boxes
+            persons["conf"] = person_conf
+
+        records = np.zeros(len(tracks), TRACK_DTYPE)
+        for i, track in enumerate(tracks):
+            records[i] = (int(track.track_id), track.to_ltrb(), track.is_confirmed())
+
+        frame = np.array(
+            [(self._person_total, len(persons), self._track_total, len(records), False, 0, 0)],
+            FRAME_DTYPE,
+        )
+        self._frames.write(frame.tobytes())
+        self._persons.write(persons.tobytes())
+        self._tracks.write(records.tobytes())
+        self._person_total += len(persons)
+        self._track_total += len(records)
+        self.frame_count += 1
+
+    def record_crowd_frame(self, entered, exited):
+        """A frame counted by optical flow, so replays keep the same frame numbers"""
+        frame = np.array(
+            [(self._person_total, 0, self._track_total, 0, True, entered, exited)], FRAME_DTYPE
+        )
+        self._frames.write(frame.tobytes())
+        self.frame_count += 1
+
+    def close(self, expected_entered=None, expected_exited=None):
+        for f in (self._frames, self._persons, self._tracks):
+            f.close()
+        self.meta["frames"] = self.frame_count
+        if expected_entered is not None:
+            self.meta["expected_entered"] = expected_entered
+        if expected_exited is not None:
+            self.meta["expected_exited"] = expected_exited
+        (self.path / "meta.json").write_text(json.dumps(self.meta, indent=2))
+
+
+def _memmap(path, dtype):
+    # np.memmap refuses empty files
+    if path.stat().st_size == 0:
+        return np.zeros(0, dtype)
+    return np.memmap(path, dtype=dtype, mode="r")
+
+
+class Recording:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.meta = json.loads((self.path / "meta.json").read_text())
+        if self.meta.get("version", 1) != RECORDING_VERSION:
+            raise ValueError(
+                f"{self.path} is recording version {self.meta.get('version', 1)}, "
+                f"expected {RECORDING_VERSION}; record it again"
+            )
+        self.frames = _memmap(self.path / "frames.bin", FRAME_DTYPE)
+        self.persons = _memmap(self.path / "persons.bin", PERSON_DTYPE)
+        self.tracks = _memmap(self.path / "tracks.bin", TRACK_DTYPE)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def frame_tracks(self, index):
+        frame = self.frames[index]
+        start = frame["track_start"]
+        return self.tracks[start : start + frame["track_count"]]
+
+    def frame_persons(self, index):
+        frame = self.frames[index]
+        start = frame["person_start"]
+        return self.persons[start : start + frame["person_count"]]
+
+
+class ReplayTrack:
+    """Stands in for a tracker track using recorded values"""
+
+    __slots__ = ("track_id", "_ltrb", "_confirmed")
+
+    def __init__(self, record):
+        self.track_id = int(record["track_id"])
+        self._ltrb = record["ltrb"]
+        self._confirmed = bool(record["confirmed"])
+
+    def is_confirmed(self):
+        return self._confirmed
+
+    def to_ltrb(self):
+        return self._ltrb
+
+
+def _detections(persons):
+    return [
+        ([float(l), float(t), float(r - l), float(b - t)], float(conf), "person")
+        for (l, t, r, b), conf in zip(persons["ltrb"], persons["conf"])
+    ]
+
+
+def replay(recording, params=None, tracker=None, retrack=False):
+    """Run the counting logic over a recording; returns (tracker, frames per second).
+
+    With retrack, the recorded person boxes go through a fresh IoU tracker
+    instead of using the recorded tracks, so parameters that change which
+    frames are detected, like DETECT_INTERVAL, take effect.
+    """
+    from DetectingExitsAndEntrance import DoorPersonTracker
+    from trackers import IoUTracker
+
+    if not isinstance(recording, Recording):
+        recording = Recording(recording)
+    meta = recording.meta
+    if tracker is None:
+        tracker = DoorPersonTracker(fps=meta["fps"], models=False)
+    tracker.reset()
+    for name, value in (params or {}).items():
+        setattr(tracker, name, value)
+
+    person_tracker = IoUTracker(max_age=30) if retrack else None
+    door_frame = meta.get("door_frame")
+    start = time.perf_counter()
+    for i in range(len(recording)):
+        tracker.frame_count += 1
+        if tracker.frame_count == door_frame:
+            tracker.set_doors(meta["doors"], meta["width"], meta["height"])
+        frame = recording.frames[i]
+        if frame["crowd"]:
+            # Flow needs the pixels, so crowd frames replay the counts they recorded
+            if not tracker.crowd_mode:
+                tracker.crowd_mode = True
+                tracker.crowd_frames = 0
+                tracker.drop_tracks()
+            else:
+                tracker.crowd_frames += 1
+            tracker.entered_count += int(frame["crowd_entered"])
+            tracker.exited_count += int(frame["crowd_exited"])
+            tracker.crowd_entered += int(frame["crowd_entered"])
+            tracker.crowd_exited += int(frame["crowd_exited"])
+            continue
+        if tracker.crowd_mode:
+            tracker.leave_crowd_mode()
+            if retrack:
+                person_tracker = IoUTracker(max_age=30)
+        if tracker.frame_count % tracker.DETECT_INTERVAL:
+            # Skipped by the live pipeline too, like a motion-gated frame
+            tracker.count_tracks([])
+        elif retrack:
+            tracker.count_tracks(person_tracker.update_tracks(_detections(recording.frame_persons(i))))
+        else:
+            tracker.count_tracks([ReplayTrack(r) for r in recording.frame_tracks(i)])
+    elapsed = time.perf_counter() - start
+    return tracker, len(recording) / elapsed if elapsed else float("inf")
+
+
+def record(source, out, frames=None, expected_entered=None, expected_exited=None, **tracker_kwargs):
+    """Run the full detector pipeline over a video and record what it saw"""
+    import cv2
+
+    from DetectingExitsAndEntrance import DoorPersonTracker
+
+    cap = cv2.VideoCapture(int(source) if str(source).isdigit() else str(source))
+    fps = int(cap.get(cv2.CAP_PROP_FPS) or 30)
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    tracker = DoorPersonTracker(fps=fps, **tracker_kwargs)
+    tracker.recorder = DetectionRecorder(out, width, height, fps, tracker.resolution.size)
+    try:
+        while frames is None or tracker.frame_count < frames:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            tracker.process_frame(frame)
+    finally:
+        cap.release()
+        tracker.recorder.close(expected_entered, expected_exited)
+    return tracker
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record detections from a video or replay them through the counting logic")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rec = sub.add_parser("record", help="Run the detectors on a video and save their output")
+    rec.add_argument("source", help="Video file or camera index")
+    rec.add_argument("out", help="Directory to write the recording to")
+    rec.add_argument("--frames", type=int, default=None)
+    rec.add_argument("--expect-entered", type=int, default=None, help="Ground-truth entries to store with the recording")
+    rec.add_argument("--expect-exited", type=int, default=None, help="Ground-truth exits to store with the recording")
+
+    run = sub.add_parser("run", help="Replay recordings and check counts against their expected values")
+    run.add_argument("recordings", nargs="+")
+    run.add_argument("--expect-entered", type=int, default=None, help="Override the recording's expected entries")
+    run.add_argument("--expect-exited", type=int, default=None, help="Override the recording's expected exits")
+
+    args = parser.parse_args()
+
+    if args.command == "record":
+        tracker = record(args.source, args.out, args.frames, args.expect_entered, args.expect_exited)
+        print(f"Recorded {tracker.frame_count} frames to {args.out}: "
+              f"entered {tracker.entered_count}, exited {tracker.exited_count}")
+        return
+
+    failed = False
+    for path in args.recordings:
+        recording = Recording(path)
+        tracker, fps = replay(recording)
+        expected = (
+            args.expect_entered if args.expect_entered is not None else recording.meta.get("expected_entered"),
+            args.expect_exited if args.expect_exited is not None else recording.meta.get("expected_exited"),
+        )
+        actual = (tracker.entered_count, tracker.exited_count)
+        ok = all(e is None or e == a for e, a in zip(expected, actual))
+        failed |= not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {path}: entered {actual[0]} (expected {expected[0]}), "
+              f"exited {actual[1]} (expected {expected[1]}), {len(recording)} frames at {fps:.0f} FPS")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
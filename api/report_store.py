@@ -0,0 +1,157 @@
+import base64
+import datetime
+import json
+import sqlite3
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    school TEXT NOT NULL,
+    building TEXT NOT NULL,
+    message TEXT NOT NULL,
+    latitude REAL,
+    longitude REAL,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reports_by_time ON reports (timestamp, id);
+CREATE INDEX IF NOT EXISTS reports_by_building ON reports (building, timestamp, id);
+CREATE INDEX IF NOT EXISTS reports_by_school ON reports (school, building, timestamp, id);
+"""
+
+COLUMNS = "id, school, building, message, latitude, longitude, timestamp"
+
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH = 500
+
+
+def encode_cursor(timestamp, report_id):
+    return base64.urlsafe_b64encode(f"{timestamp}|{report_id}".encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        timestamp, report_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return timestamp, int(report_id)
+    except ValueError as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def _iso(value):
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return value.isoformat()
+    return value
+
+
+def row_to_dict(row):
+    report = {
+        "id": row[0],
+        "school": row[1],
+        "building": row[2],
+        "message": row[3],
+        "location": None,
+        "timestamp": row[6],
+    }
+    if row[4] is not None and row[5] is not None:
+        report["location"] = {"latitude": row[4], "longitude": row[5]}
+    return report
+
+
+class ReportStore:
+    """Emergency reports persisted in SQLite, queried newest first with keyset pagination"""
+
+    def __init__(self, path="reports.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+        with self._lock:
+            self._conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def add(self, report):
+        """Store an EmergencyReport and return its id"""
+        location = report.location
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "INSERT INTO reports (school, building, message, latitude, longitude, timestamp) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    report.school,
+                    report.building,
+                    report.message,
+                    location.latitude if location else None,
+                    location.longitude if location else None,
+                    _iso(report.timestamp),
+                ),
+            )
+        return cur.lastrowid
+
+    def _where(self, school, building, since, until, cursor):
+        clauses, params = [], []
+        if school is not None:
+            clauses.append("school = ?")
+            params.append(school)
+        if building is not None:
+            clauses.append("building = ?")
+            params.append(building)
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(_iso(since))
+        if until is not None:
+            clauses.append("timestamp < ?")
+            params.append(_iso(until))
+        if cursor is not None:
+            timestamp, report_id = decode_cursor(cursor)
+            clauses.append("(timestamp, id) < (?, ?)")
+            params.extend([timestamp, report_id])
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, params
+
+    def page(self, school=None, building=None, since=None, until=None, cursor=None, limit=100):
+        """Return (reports, next_cursor); next_cursor is None on the last page"""
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        where, params = self._where(school, building, since, until, cursor)
+        sql = f"SELECT {COLUMNS} FROM reports {where} ORDER BY timestamp DESC, id DESC LIMIT ?"
+        with self._lock:
+            rows = self._conn.execute(sql, params + [limit + 1]).fetchall()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][6], rows[-1][0])
+        return [row_to_dict(r) for r in rows], next_cursor
+
+    def list_all(self, school=None, building=None, since=None, until=None):
+        """Every matching report oldest first, like the list GET /emergency-reports used to return"""
+        where, params = self._where(school, building, since, until, None)
+        sql = f"SELECT {COLUMNS} FROM reports {where} ORDER BY timestamp, id"
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [row_to_dict(r) for r in rows]
+
+    def iter_ndjson(self, school=None, building=None, since=None, until=None):
+        """Yield every matching report as a JSON line, reading STREAM_BATCH rows at a time"""
+        where, params = self._where(school, building, since, until, None)
+        sql = f"SELECT {COLUMNS} FROM reports {where} ORDER BY timestamp DESC, id DESC"
+        # A private connection keeps a long stream from holding the shared lock
+        conn = self._connect()
+        try:
+            cur = conn.execute(sql, params)
+            while rows := cur.fetchmany(STREAM_BATCH):
+                yield "".join(json.dumps(row_to_dict(r)) + "\n" for r in rows)
+        finally:
+            conn.close()
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM reports").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
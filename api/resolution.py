@@ -0,0 +1,101 @@
+from collections import deque
+
+import numpy as np
+
+# Input sizes the person model can run at; YOLO needs multiples of 32
+SIZES = (256, 320, 416, 512, 640)
+
+
+class ResolutionController:
+    """Picks the person model's input size from a per-frame latency budget.
+
+    Latency is smoothed with an exponential moving average. When it goes over
+    budget the size steps down, but never below the size at which the small
+    people near the door (the `percentile` of their heights) would drop under
+    min_person_px; when the next size up is predicted to fit (latency grows
+    roughly with pixel count) it steps back up.
+    """
+
+    def __init__(
+        self,
+        budget_ms,
+        sizes=SIZES,
+        start_size=640,
+        min_person_px=48,
+        percentile=10,
+        smoothing=0.2,
+        cooldown_frames=15,
+        headroom=0.85,
+    ):
+        self.budget_ms = budget_ms
+        self.sizes = sorted(sizes)
+        self.index = self.sizes.index(start_size) if start_size in self.sizes else len(self.sizes) - 1
+        self.min_person_px = min_person_px
+        self.percentile = percentile
+        self.smoothing = smoothing
+        self.cooldown_frames = cooldown_frames
+        self.headroom = headroom
+        self.latency_ms = None
+        self.person_heights = deque(maxlen=90)
+        self._frames_since_change = 0
+
+    @property
+    def size(self):
+        return self.sizes[self.index]
+
+    def reset(self):
+        self.person_heights.clear()
+
+    def small_person_height(self):
+        if not self.person_heights:
+            return None
+        return float(np.percentile(self.person_heights, self.percentile))
+
+    def _needed_index(self, frame_dim):
+        """Smallest size at which small people near the door are still min_person_px tall"""
+        height = self.small_person_height()
+        if height is None:
+            return 0
+        if height <= 0:
+            return len(self.sizes) - 1
+        for i, size in enumerate(self.sizes):
+            if height * size / frame_dim >= self.min_person_px:
+                return i
+        return len(self.sizes) - 1
+
+    def observe(self, latency_ms, person_heights, frame_dim):
+        """Record one inference and choose the size for the next frame"""
+        self.person_heights.extend(person_heights)
+        if self.latency_ms is None:
+            self.latency_ms = latency_ms
+        else:
+            self.latency_ms += self.smoothing * (latency_ms - self.latency_ms)
+        self._frames_since_change += 1
+
+        if not self.budget_ms or self._frames_since_change < self.cooldown_frames:
+            return self.size
+
+        index = self.index
+        if self.latency_ms > self.budget_ms:
+            # Only latency makes the size shrink, and only as far as small people allow
+            index = max(index - 1, min(self._needed_index(frame_dim), index))
+        elif index + 1 < len(self.sizes):
+            growth = (self.sizes[index + 1] / self.sizes[index]) ** 2
+            if self.latency_ms * growth < self.budget_ms * self.headroom:
+                index += 1
+
+        if index != self.index:
+            # Latency at the new size is unknown; estimate it from pixel count
+            scale = (self.sizes[index] / self.sizes[self.index]) ** 2
+            self.latency_ms *= scale
+            self.index = index
+            self._frames_since_change = 0
+        return self.size
+
+    def stats(self):
+        return {
+            "imgsz": self.size,
+            "latency_ms": None if self.latency_ms is None else round(self.latency_ms, 2),
+            "budget_ms": self.budget_ms,
+            "small_person_height": self.small_person_height(),
+        }
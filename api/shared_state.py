@@ -0,0 +1,205 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rooms (
+    building TEXT NOT NULL,
+    room TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (building, room)
+);
+CREATE TABLE IF NOT EXISTS kv (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS frame (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    seq INTEGER NOT NULL,
+    jpeg BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS incidents (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    school TEXT NOT NULL,
+    building TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    report_count INTEGER NOT NULL DEFAULT 0,
+    latitude REAL,
+    longitude REAL,
+    located_reports INTEGER NOT NULL DEFAULT 0,
+    cell_row INTEGER,
+    cell_col INTEGER,
+    called INTEGER NOT NULL DEFAULT 0,
+    messages TEXT NOT NULL DEFAULT '[]'
+);
+CREATE INDEX IF NOT EXISTS incidents_cell ON incidents (cell_row, cell_col);
+CREATE TABLE IF NOT EXISTS incident_places (
+    school TEXT NOT NULL,
+    building TEXT NOT NULL,
+    incident_id INTEGER NOT NULL,
+    PRIMARY KEY (school, building)
+);
+"""
+
+
+class MemoryState:
+    """Shared state for a single process: one worker, or tests.
+
+    Holds building room counts, small JSON values (stream settings, the
+    tracker's published counts) and the latest encoded video frame.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rooms = {}
+        self._values = {}
+        # Sequence numbers start at the current time in ms, so they keep rising
+        # across restarts and a client's old ETag never matches a new frame
+        self._frame = (int(time.time() * 1000), None)
+
+    def add_room(self, building, room):
+        with self._lock:
+            self._rooms.setdefault(building, {}).setdefault(room, 0)
+
+    def change_room(self, building, room, delta):
+        """Add delta people to a room, never going below zero"""
+        with self._lock:
+            rooms = self._rooms.setdefault(building, {})
+            rooms[room] = max(rooms.get(room, 0) + delta, 0)
+
+    def building(self, building):
+        """Room counts of a building, or None if it has never been seen"""
+        with self._lock:
+            rooms = self._rooms.get(building)
+            return None if rooms is None else dict(rooms)
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self._values.get(key, default)
+
+    def set(self, key, value):
+        with self._lock:
+            self._values[key] = value
+
+    def merge(self, key, fields):
+        """Update some fields of a dict value in one step; returns the new value"""
+        with self._lock:
+            value = {**self._values.get(key, {}), **fields}
+            self._values[key] = value
+            return value
+
+    def publish_frame(self, jpeg):
+        with self._lock:
+            seq = self._frame[0] + 1
+            self._frame = (seq, bytes(jpeg))
+            return seq
+
+    def latest_frame(self):
+        """(sequence number, JPEG bytes); the bytes are None before the first frame"""
+        with self._lock:
+            return self._frame
+
+    def latest_seq(self):
+        with self._lock:
+            return self._frame[0]
+
+
+class SqliteState:
+    """The same state in a SQLite file, shared by every worker process on the host"""
+
+    def __init__(self, path="state.db"):
+        self.path = path
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        # One connection per thread; WAL lets readers run alongside the writer
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def add_room(self, building, room):
+        self._conn().execute(
+            "INSERT OR IGNORE INTO rooms (building, room, count) VALUES (?, ?, 0)",
+            (building, room),
+        )
+
+    def change_room(self, building, room, delta):
+        self._conn().execute(
+            "INSERT INTO rooms (building, room, count) VALUES (:building, :room, MAX(:delta, 0)) "
+            "ON CONFLICT (building, room) DO UPDATE SET count = MAX(count + :delta, 0)",
+            {"building": building, "room": room, "delta": delta},
+        )
+
+    def building(self, building):
+        rows = self._conn().execute(
+            "SELECT room, count FROM rooms WHERE building = ?", (building,)
+        ).fetchall()
+        return dict(rows) if rows else None
+
+    def get(self, key, default=None):
+        row = self._conn().execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+        return default if row is None else json.loads(row[0])
+
+    def set(self, key, value):
+        self._conn().execute(
+            "INSERT INTO kv (key, value) VALUES (?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+            (key, json.dumps(value)),
+        )
+
+    @contextmanager
+    def transaction(self):
+        """This thread's connection inside a write transaction, for read-modify-write steps"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def query(self, sql, params=()):
+        return self._conn().execute(sql, params).fetchall()
+
+    def merge(self, key, fields):
+        with self.transaction() as conn:
+            row = conn.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+            value = {**(json.loads(row[0]) if row else {}), **fields}
+            self.set(key, value)
+        return value
+
+    def publish_frame(self, jpeg):
+        # The first sequence number is the time in ms, as in MemoryState
+        return self._conn().execute(
+            "INSERT INTO frame (id, seq, jpeg) VALUES (0, ?, ?) "
+            "ON CONFLICT (id) DO UPDATE SET seq = seq + 1, jpeg = excluded.jpeg RETURNING seq",
+            (int(time.time() * 1000), bytes(jpeg)),
+        ).fetchall()[0][0]  # fetchall steps the statement to completion, ending the write
+
+    def latest_frame(self):
+        row = self._conn().execute("SELECT seq, jpeg FROM frame WHERE id = 0").fetchone()
+        return (0, None) if row is None else (row[0], row[1])
+
+    def latest_seq(self):
+        row = self._conn().execute("SELECT seq FROM frame WHERE id = 0").fetchone()
+        return 0 if row is None else row[0]
+
+
+def make_state(backend=None, path=None):
+    """Pick the state backend from STATE_BACKEND (memory or sqlite) and STATE_DB"""
+    backend = backend or os.getenv("STATE_BACKEND", "memory")
+    if backend == "memory":
+        return MemoryState()
+    if backend == "sqlite":
+        return SqliteState(path or os.getenv("STATE_DB", "state.db"))
+    raise ValueError(f"Unknown state backend {backend!r}, expected memory or sqlite")
@@ -0,0 +1,106 @@
+import asyncio
+
+import cv2
+import numpy as np
+
+THUMBNAIL_QUALITY = 70
+# Requested widths are rounded up to one of these, so a client cannot make
+# the server resize and cache the frame at every possible width
+THUMBNAIL_WIDTHS = (160, 320, 640, 1280)
+
+
+def snap_width(width):
+    """The thumbnail width served for a requested width"""
+    for size in THUMBNAIL_WIDTHS:
+        if width <= size:
+            return size
+    return THUMBNAIL_WIDTHS[-1]
+
+
+def resize_jpeg(jpeg, width):
+    image = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+    h, w = image.shape[:2]
+    if width < w:
+        image = cv2.resize(image, (width, max(1, round(h * width / w))), interpolation=cv2.INTER_AREA)
+    _, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, THUMBNAIL_QUALITY])
+    return encoded.tobytes()
+
+
+class SnapshotCache:
+    """Serves the inference loop's latest JPEG, and thumbnails of it, to many clients.
+
+    The full-size frame is already encoded by the inference loop. Each
+    thumbnail width is resized and encoded once per frame on a worker
+    thread, however many clients ask for it, and only the current frame's
+    thumbnails are kept. Long-poll waiters share one watcher task that
+    checks the frame sequence number and wakes them all when it changes; it
+    stops when the last waiter leaves.
+    """
+
+    def __init__(self, state, poll_seconds=0.02):
+        self.state = state
+        self.poll_seconds = poll_seconds
+        self.thumbnails = {}  # width -> future of the jpeg, for frame thumbnail_seq only
+        self.thumbnail_seq = None
+        self._seq = None
+        self._waiters = 0
+        self._changed = None
+        self._watcher = None
+
+    async def latest(self, width=None):
+        """(seq, jpeg) of the newest frame, resized to a snapped width if given; (seq, None) before any"""
+        seq, jpeg = self.state.latest_frame()
+        if jpeg is None or width is None:
+            return seq, jpeg
+        width = snap_width(width)
+        if seq != self.thumbnail_seq:
+            self.thumbnails = {}
+            self.thumbnail_seq = seq
+        thumbnail = self.thumbnails.get(width)
+        if thumbnail is None:
+            # Later requests for this width and frame wait on the same resize
+            thumbnail = asyncio.ensure_future(asyncio.to_thread(resize_jpeg, jpeg, width))
+            self.thumbnails[width] = thumbnail
+        try:
+            return seq, await asyncio.shield(thumbnail)
+        except Exception:
+            if self.thumbnails.get(width) is thumbnail:
+                del self.thumbnails[width]
+            raise
+
+    async def _watch(self):
+        while True:
+            seq = self.state.latest_seq()
+            if seq != self._seq:
+                self._seq = seq
+                self._changed.set()
+                self._changed = asyncio.Event()
+            await asyncio.sleep(self.poll_seconds)
+
+    async def wait_for_newer(self, seq, timeout):
+        """Wait until the frame sequence moves past seq; returns False on timeout"""
+        if self._watcher is None:
+            self._changed = asyncio.Event()
+            self._watcher = asyncio.create_task(self._watch())
+        self._waiters += 1
+        try:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + timeout
+            if self.state.latest_seq() != seq:
+                return True
+            # After the first check only the watcher reads the state
+            while self._seq is None or self._seq <= seq:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return False
+                try:
+                    await asyncio.wait_for(self._changed.wait(), remaining)
+                except asyncio.TimeoutError:
+                    return False
+            return True
+        finally:
+            self._waiters -= 1
+            if not self._waiters and self._watcher is not None:
+                self._watcher.cancel()
+                self._watcher = None
+                self._seq = None
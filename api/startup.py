@@ -0,0 +1,83 @@
+import threading
+import time
+
+from dispatch.logger import logger
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class Subsystem:
+    def __init__(self, name, loader, required=True):
+        self.name = name
+        self.loader = loader
+        self.required = required
+        self.state = PENDING
+        self.error = None
+        self.duration = None
+
+    def load(self):
+        self.state = LOADING
+        start = time.perf_counter()
+        try:
+            self.loader()
+            self.state = READY
+        except Exception as e:
+            self.state = FAILED
+            self.error = str(e)
+            logger.error("Subsystem %s failed to start: %s", self.name, e)
+        self.duration = time.perf_counter() - start
+        logger.info("Subsystem %s %s in %.2fs", self.name, self.state, self.duration)
+
+    def status(self):
+        return {
+            "state": self.state,
+            "required": self.required,
+            "error": self.error,
+            "load_seconds": None if self.duration is None else round(self.duration, 3),
+        }
+
+
+class Subsystems:
+    """Heavy dependencies loaded on background threads once the server is listening"""
+
+    def __init__(self, started=None):
+        self.subsystems: dict[str, Subsystem] = {}
+        self.phases: dict[str, float] = {}
+        # Pass a perf_counter() taken before the heavy imports to include them
+        self._started = time.perf_counter() if started is None else started
+        self._last_mark = self._started
+
+    def mark(self, phase):
+        """Record how long the startup phase ending now took"""
+        now = time.perf_counter()
+        self.phases[phase] = round(now - self._last_mark, 3)
+        self._last_mark = now
+
+    def register(self, name, loader, required=True):
+        self.subsystems[name] = Subsystem(name, loader, required)
+
+    def start(self):
+        for subsystem in self.subsystems.values():
+            if subsystem.state == PENDING:
+                threading.Thread(
+                    target=subsystem.load, name=f"load-{subsystem.name}", daemon=True
+                ).start()
+
+    def is_ready(self, name):
+        subsystem = self.subsystems.get(name)
+        return subsystem is not None and subsystem.state == READY
+
+    @property
+    def ready(self):
+        return all(s.state == READY for s in self.subsystems.values() if s.required)
+
+    def status(self):
+        return {
+            "ready": self.ready,
+            "subsystems": {name: s.status() for name, s in self.subsystems.items()},
+            "startup_phases": dict(self.phases),
+            "uptime_seconds": round(time.perf_counter() - self._started, 3),
+        }
@@ -0,0 +1,194 @@
+import argparse
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from pathlib import Path
+
+from fastapi.responses import Response
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+
+from dispatch.logger import logger
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# Text assets worth compressing; source maps are only fetched by devtools
+COMPRESSIBLE = {".html", ".js", ".css", ".json", ".svg", ".txt", ".ico", ".webmanifest"}
+MIN_SIZE = 512
+
+# Bundles with a content hash in the name, e.g. main.54135c92.js, never change
+HASHED = re.compile(r"\.[0-9a-f]{8,}\.")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+
+def compress(data, best=False):
+    """gzip (and brotli, if installed) versions of data that are actually smaller"""
+    variants = {"gzip": gzip.compress(data, 9, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(data, quality=11 if best else 5)
+    return {enc: body for enc, body in variants.items() if len(body) < len(data) * 0.9}
+
+
+def pick_encoding(variants, accept_encoding):
+    """Best variant the client accepts, or None for the plain file"""
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip())
+    for enc in ("br", "gzip"):
+        if enc in variants and (enc in accepted or "*" in accepted):
+            return enc
+    return None
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return etag in tags or "*" in tags
+
+
+def encoded_response(body, enc, etag, media_type, cache_control, request_headers):
+    """200 with the chosen encoding, or 304 if the client already has this ETag"""
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if etag_matches(request_headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if enc is not None:
+        headers["Content-Encoding"] = enc
+    return Response(body, media_type=media_type, headers=headers)
+
+
+class CachedPage:
+    """A small HTML page held in memory, compressed once, served with an ETag"""
+
+    def __init__(self, html, cache_control=REVALIDATE):
+        self.body = html.encode()
+        self.digest = hashlib.sha1(self.body).hexdigest()[:16]
+        self.variants = compress(self.body)
+        self.cache_control = cache_control
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        return cls(Path(path).read_text(), **kwargs)
+
+    def response(self, request):
+        enc = pick_encoding(self.variants, request.headers.get("accept-encoding", ""))
+        etag = f'"{self.digest}"' if enc is None else f'"{self.digest}-{enc}"'
+        body = self.body if enc is None else self.variants[enc]
+        return encoded_response(
+            body, enc, etag, "text/html; charset=utf-8", self.cache_control, request.headers
+        )
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that serves gzip/brotli variants and long-lived cache headers.
+
+    Text assets are compressed into memory by `precompress()`, which the
+    app runs on a background thread at startup, unless `python
+    static_assets.py <dir>` already wrote .gz/.br files next to them at
+    build time, in which case those are read instead. Until then, and for a
+    file that changes on disk, compression happens on the next request. Hashed bundles are
+    cached as immutable; everything else must revalidate its ETag.
+    Paths missing from `directory` are looked up in `fallback_directories`.
+    """
+
+    # Shared by every mount, so overlapping directories are compressed once
+    variants = {}  # real path -> ((mtime_ns, size), {encoding: bytes})
+
+    def __init__(self, *, directory, html=False, fallback_directories=()):
+        # A missing directory fails precompress() and its requests, not the import
+        super().__init__(directory=directory, html=html, check_dir=False)
+        self.all_directories = [*self.all_directories, *fallback_directories]
+
+    def precompress(self):
+        original = compressed = 0
+        for directory in self.all_directories:
+            if not os.path.isdir(directory):
+                raise RuntimeError(f"Static directory '{directory}' does not exist")
+            for path in Path(directory).rglob("*"):
+                if path.suffix in COMPRESSIBLE and path.is_file():
+                    stat_result = path.stat()
+                    variants = self._variants(str(path), stat_result)
+                    original += stat_result.st_size
+                    compressed += min((len(v) for v in variants.values()), default=stat_result.st_size)
+        logger.info(
+            "Precompressed static assets in %s: %d kB -> %d kB",
+            ", ".join(map(str, self.all_directories)),
+            original // 1024,
+            compressed // 1024,
+        )
+
+    def _variants(self, full_path, stat_result):
+        if Path(full_path).suffix not in COMPRESSIBLE or stat_result.st_size < MIN_SIZE:
+            return {}
+        key = os.path.realpath(full_path)
+        version = (stat_result.st_mtime_ns, stat_result.st_size)
+        cached = self.variants.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        variants = {}
+        for enc, suffix in (("br", ".br"), ("gzip", ".gz")):
+            sibling = Path(key + suffix)
+            if sibling.is_file() and sibling.stat().st_mtime_ns >= stat_result.st_mtime_ns:
+                variants[enc] = sibling.read_bytes()
+        if not variants:
+            variants = compress(Path(key).read_bytes())
+        self.variants[key] = (version, variants)
+        return variants
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        cache_control = IMMUTABLE if HASHED.search(os.path.basename(full_path)) else REVALIDATE
+        request_headers = Headers(scope=scope)
+        variants = self._variants(full_path, stat_result) if status_code == 200 else {}
+        enc = pick_encoding(variants, request_headers.get("accept-encoding", ""))
+        if enc is None:
+            response = super().file_response(full_path, stat_result, scope, status_code)
+            response.headers["Cache-Control"] = cache_control
+            if variants:
+                response.headers["Vary"] = "Accept-Encoding"
+            return response
+
+        etag = f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}-{enc}"'
+        media_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+        return encoded_response(variants[enc], enc, etag, media_type, cache_control, request_headers)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Write .gz and .br files next to text assets, for PrecompressedStaticFiles"
+    )
+    parser.add_argument("directories", nargs="+", help="e.g. ../frontend/build")
+    args = parser.parse_args()
+
+    if brotli is None:
+        print("brotli is not installed; writing .gz files only")
+    for directory in args.directories:
+        for path in sorted(Path(directory).rglob("*")):
+            if path.suffix not in COMPRESSIBLE or not path.is_file():
+                continue
+            data = path.read_bytes()
+            if len(data) < MIN_SIZE:
+                continue
+            variants = compress(data, best=True)
+            for enc, body in variants.items():
+                Path(f"{path}{'.br' if enc == 'br' else '.gz'}").write_bytes(body)
+            sizes = ", ".join(f"{enc} {len(body)}" for enc, body in variants.items())
+            print(f"{path}: {len(data)} bytes -> {sizes or 'not compressible'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+import argparse
+import hashlib
+import itertools
+import json
+import logging
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from detectors import DEFAULT_IMGSZ
+from replay import Recording, record, replay
+
+SWEEP_CACHE_DIR = Path(os.getenv("SWEEP_CACHE_DIR", "runs/sweep_cache"))
+
+# Values tried for each counting parameter; the first of each is close to the default.
+# DETECT_INTERVAL is the one that changes how much detector work a frame costs.
+SPACE = {
+    "DETECT_INTERVAL": [1, 2, 3, 4],
+    "HEIGHT_HISTORY_LENGTH": [10, 5, 15, 20],
+    "MIN_HEIGHT_CHANGE": [5, 2, 8, 12],
+    "MIN_FRAMES_FOR_DIRECTION": [5, 3, 8],
+    "MAX_MISSING_FRAMES": [30, 10, 20, 45],
+    "BIG_ZONE_SCALE_X": [1.8, 1.4, 2.2],
+    "BIG_ZONE_SCALE_Y": [1.4, 1.2, 1.6],
+    "SMALL_ZONE_SCALE": [0.5, 0.3, 0.7],
+}
+
+
+def load_clips(paths):
+    """Expand recording directories and clip manifests into (name, source) pairs.
+
+    A manifest is a JSON list of {"video": path, "entered": n, "exited": n}.
+    Anything else is taken to be a recording made by replay.py.
+    """
+    clips = []
+    for path in map(Path, paths):
+        if path.suffix == ".json":
+            for clip in json.loads(path.read_text()):
+                video = (path.parent / clip["video"]).resolve()
+                clips.append((video.name, {**clip, "video": video}))
+        else:
+            clips.append((path.name, path))
+    return clips
+
+
+def cached_recording(clip):
+    """Run the detectors over a labeled clip once; later sweeps reuse the recording"""
+    if isinstance(clip, Path):
+        return Recording(clip)
+    video = clip["video"]
+    stat = video.stat()
+    key = hashlib.sha256(f"{video}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()[:12]
+    out = SWEEP_CACHE_DIR / f"{video.stem}-{key}"
+    if not (out / "meta.json").exists():
+        print(f"Recording detections for {video}")
+        record(video, out, expected_entered=clip.get("entered"), expected_exited=clip.get("exited"))
+    return Recording(out)
+
+
+def grid(space):
+    names = list(space)
+    for values in itertools.product(*(space[n] for n in names)):
+        yield dict(zip(names, values))
+
+
+def random_configs(space, count, seed=0, accept=lambda params: True):
+    """Up to `count` distinct random configurations that `accept` allows"""
+    rng = random.Random(seed)
+    seen = set()
+    total = 1
+    for values in space.values():
+        total *= len(values)
+    found = 0
+    # Rejected draws are redrawn, so count is only missed when the space runs out
+    while found < count and len(seen) < total:
+        params = {name: rng.choice(values) for name, values in space.items()}
+        key = tuple(params.values())
+        if key not in seen:
+            seen.add(key)
+            if accept(params):
+                found += 1
+                yield params
+
+
+def valid(params):
+    # A trend needs MIN_FRAMES_FOR_DIRECTION heights, so the history must hold that many
+    return params["MIN_FRAMES_FOR_DIRECTION"] <= params["HEIGHT_HISTORY_LENGTH"]
+
+
+_recordings = []
+_tracker = None
+
+
+def _init_worker(paths):
+    global _recordings
+    # Thousands of replays would otherwise log every counted crossing
+    logging.getLogger("tracker.events").setLevel(logging.WARNING)
+    _recordings = [Recording(p) for p in paths]
+
+
+def detector_calls(recording, tracker):
+    """Person-model runs the live pipeline would make over a recording with these settings.
+
+    Frames the motion gate skipped while recording are indistinguishable
+    from empty ones, so they count as runs; the estimate errs high.
+    """
+    calls, crowd_frames = 0, 0
+    for number, frame in enumerate(recording.frames, 1):
+        if frame["crowd"]:
+            crowd_frames += 1
+            calls += crowd_frames % tracker.CROWD_DETECT_INTERVAL == 0
+        else:
+            crowd_frames = 0
+            calls += number % tracker.DETECT_INTERVAL == 0
+    return calls
+
+
+def evaluate(params):
+    """Count error over every clip, and the detector work per frame.
+
+    Cost is person-model runs times input pixels (imgsz squared, in
+    megapixels), per frame. It is counted from the settings, not timed, so
+    it is the same on every run and every machine.
+    """
+    global _tracker
+    error, clips, megapixels, frames = 0, [], 0.0, 0
+    for recording in _recordings:
+        # Replaying detections through a tracker lets DETECT_INTERVAL change the tracks
+        _tracker, _ = replay(recording, params, _tracker, retrack=True)
+        imgsz = recording.meta.get("imgsz") or DEFAULT_IMGSZ
+        megapixels += detector_calls(recording, _tracker) * imgsz * imgsz / 1e6
+        frames += len(recording)
+        expected = (recording.meta.get("expected_entered"), recording.meta.get("expected_exited"))
+        actual = (_tracker.entered_count, _tracker.exited_count)
+        error += sum(abs(a - e) for a, e in zip(actual, expected) if e is not None)
+        clips.append({"clip": recording.path.name, "entered": actual[0], "exited": actual[1]})
+    return {
+        "params": params,
+        "error": error,
+        "cost": megapixels / max(frames, 1),
+        "clips": clips,
+    }
+
+
+def pareto_front(results):
+    """Results no other result beats on both count error and cost"""
+    front = []
+    for result in sorted(results, key=lambda r: (r["error"], r["cost"])):
+        if not front or result["cost"] < front[-1]["cost"]:
+            front.append(result)
+    return front
+
+
+def best(results, max_cost=None):
+    within = [r for r in results if max_cost is None or r["cost"] <= max_cost]
+    return min(within or results, key=lambda r: (r["error"], r["cost"]))
+
+
+def sweep(recordings, configs, workers=None):
+    paths = [str(r.path) for r in recordings]
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(paths,)) as pool:
+        futures = [pool.submit(evaluate, params) for params in configs]
+        results = []
+        for i, future in enumerate(futures, 1):
+            results.append(future.result())
+            if i % 100 == 0 or i == len(futures):
+                print(f"  {i}/{len(futures)} configurations")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search counting parameters against labeled clips")
+    parser.add_argument("clips", nargs="+", help="Recording directories or JSON clip manifests")
+    parser.add_argument("--random", type=int, default=None, help="Try this many random configurations instead of the full grid")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-cost", type=float, default=None,
+                        help="Only export configurations with at most this many detector megapixels per frame")
+    parser.add_argument("--results", default="runs/sweep/results.json")
+    parser.add_argument("--export", default=None, help="Write the best configuration here for COUNTING_CONFIG")
+    args = parser.parse_args()
+
+    recordings = [cached_recording(clip) for _, clip in load_clips(args.clips)]
+    unlabeled = [r.path.name for r in recordings if r.meta.get("expected_entered") is None]
+    if unlabeled:
+        print(f"Warning: no ground truth for {', '.join(unlabeled)}; they only add to the cost")
+
+    if args.random:
+        configs = list(random_configs(SPACE, args.random, args.seed, valid))
+    else:
+        configs = [c for c in grid(SPACE) if valid(c)]
+    frames = sum(len(r) for r in recordings)
+    print(f"Trying {len(configs)} configurations over {len(recordings)} clips ({frames} frames)")
+
+    start = time.perf_counter()
+    results = sweep(recordings, configs, args.workers)
+    print(f"Done in {time.perf_counter() - start:.1f}s\n")
+
+    front = pareto_front(results)
+    print("Pareto front (count error vs detector megapixels per frame):")
+    for result in front:
+        print(f"  error {result['error']:>3}  cost {result['cost']:.3f}  {result['params']}")
+
+    Path(args.results).parent.mkdir(parents=True, exist_ok=True)
+    Path(args.results).write_text(json.dumps({"results": results, "front": front}, indent=2))
+    print(f"\nAll results written to {args.results}")
+
+    if args.export:
+        chosen = best(results, args.max_cost)
+        Path(args.export).write_text(json.dumps(chosen, indent=2))
+        print(f"Best configuration (error {chosen['error']}, cost {chosen['cost']:.3f}) "
+              f"written to {args.export}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The api modules are flat scripts imported from the api directory; main.py
+# also puts the repository root on the path for the dispatch and audio packages
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, API_DIR)
+sys.path.append(os.path.dirname(API_DIR))
+os.environ.setdefault("LOG_FILE", os.devnull)
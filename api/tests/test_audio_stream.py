@@ -0,0 +1,71 @@
+import asyncio
+import threading
+
+from audio.tts_cache import LocalEngine, TTSCache
+from audio_stream import AudioStore
+
+
+class SlowEngine(LocalEngine):
+    """Writes in two halves and waits in between, until the test lets it finish"""
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def write(self, text, fp, lang="en", voice=None):
+        data = self.synthesize(text, lang, voice)
+        fp.write(data[: len(data) // 2])
+        fp.flush()
+        self.release.wait(5)
+        fp.write(data[len(data) // 2 :])
+
+
+def store(directory, engine, samples):
+    audio = AudioStore(directory, [samples], max_workers=1)
+    audio._cache = TTSCache(str(directory), engine)
+    return audio
+
+
+async def collect(chunks):
+    return b"".join([chunk async for chunk in chunks])
+
+
+def test_another_worker_streams_audio_while_it_is_synthesized(tmp_path):
+    engine = SlowEngine()
+    # Two worker processes sharing the generated-audio directory
+    first = store(tmp_path / "generated", engine, tmp_path / "samples")
+    second = store(tmp_path / "generated", LocalEngine(), tmp_path / "samples")
+
+    name = first.synthesize("hello")
+    assert second.synthesize("hello") == name  # Already being written; not started again
+    assert second.is_writing(name)
+
+    threading.Timer(0.2, engine.release.set).start()
+    streamed = asyncio.run(collect(second.follow(name)))
+
+    assert streamed == LocalEngine().synthesize("hello")
+    assert not second.is_writing(name)
+    assert second.find(name).read_bytes() == streamed
+
+
+class TextEngine(LocalEngine):
+    """Concatenable stand-in whose audio is just the text"""
+
+    extension = "mp3"
+    concatenates = True
+
+    def synthesize(self, text, lang="en", voice=None):
+        return text.encode()
+
+    def join(self, clips):
+        return b"".join(clips)
+
+
+def test_alerts_are_written_segment_by_segment_through_the_cache(tmp_path):
+    audio = store(tmp_path / "generated", TextEngine(), tmp_path / "samples")
+    name = audio.synthesize("Emergency at Lincoln High, building B with 12 people in it.")
+    streamed = asyncio.run(collect(audio.follow(name)))
+
+    assert streamed == b"Emergency at" + b"Lincoln High" + b"building" + b"B" + b"with" + b"12" + b"people in it."
+    # The fixed wording is cached on its own for the next alert
+    cache = audio.cache()
+    assert cache.lookup(cache.key("Emergency at")) is not None
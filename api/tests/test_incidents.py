@@ -0,0 +1,53 @@
+import datetime
+from types import SimpleNamespace
+
+from incidents import IncidentIndex, SharedIncidentIndex, make_incident_index
+from shared_state import SqliteState, make_state
+
+
+def report(message, lat=None, lon=None, minutes=0, school="North High", building="A"):
+    location = None if lat is None else SimpleNamespace(latitude=lat, longitude=lon)
+    timestamp = datetime.datetime(2026, 1, 1, 12, 0) + datetime.timedelta(minutes=minutes)
+    return SimpleNamespace(
+        school=school, building=building, message=message, location=location, timestamp=timestamp
+    )
+
+
+def test_workers_sharing_a_state_file_group_into_one_incident(tmp_path):
+    path = str(tmp_path / "state.db")
+    # Two workers: separate state clients and indexes on the same file
+    first = make_incident_index(SqliteState(path))
+    second = make_incident_index(SqliteState(path))
+    assert isinstance(first, SharedIncidentIndex)
+
+    incident, is_new = first.assign(report("fire", 40.0, -75.0))
+    joined, joined_new = second.assign(report("smoke", 40.0005, -75.0, minutes=1))
+
+    assert is_new and not joined_new
+    assert joined.id == incident.id
+    assert joined.report_count == 2
+    assert [s["id"] for s in first.summaries(now=joined.last_seen)] == [incident.id]
+    assert second.get(incident.id)["messages"] == ["fire", "smoke"]
+
+    # Only one worker places the call
+    assert first.claim_call(incident.id)
+    assert not second.claim_call(incident.id)
+
+
+def test_unlocated_reports_join_by_place_and_expire_with_the_window(tmp_path):
+    index = SharedIncidentIndex(SqliteState(str(tmp_path / "state.db")))
+    incident, _ = index.assign(report("help"))
+    same, is_new = index.assign(report("again", minutes=5))
+    assert same.id == incident.id and not is_new
+    later, is_new = index.assign(report("later", minutes=30))
+    assert is_new and later.id != incident.id
+
+
+def test_memory_state_keeps_the_in_process_index():
+    index = make_incident_index(make_state("memory"))
+    assert isinstance(index, IncidentIndex)
+    incident, _ = index.assign(report("fire", 40.0, -75.0))
+    assert index.claim_call(incident.id)
+    assert not index.claim_call(incident.id)
+    index.release_call(incident.id)
+    assert index.claim_call(incident.id)
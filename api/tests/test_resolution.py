@@ -0,0 +1,24 @@
+from resolution import ResolutionController
+
+
+def run(controller, latency_ms, heights, frames=40, frame_dim=640):
+    for _ in range(frames):
+        size = controller.observe(latency_ms, heights, frame_dim)
+    return size
+
+
+def test_keeps_full_size_within_budget_even_for_tall_people():
+    controller = ResolutionController(budget_ms=100, cooldown_frames=1)
+    assert run(controller, 20, [400, 400]) == 640
+
+
+def test_shrinks_over_budget():
+    controller = ResolutionController(budget_ms=10, cooldown_frames=1)
+    assert run(controller, 50, [400, 400]) == 256
+
+
+def test_small_people_stop_the_shrinking():
+    controller = ResolutionController(budget_ms=10, cooldown_frames=1)
+    # The 10th percentile is 60px at 640, so 512 is the smallest size keeping it at 48px
+    heights = [60] * 4 + [300] * 16
+    assert run(controller, 50, heights) == 512
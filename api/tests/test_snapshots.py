@@ -0,0 +1,52 @@
+import asyncio
+
+import cv2
+import numpy as np
+
+from shared_state import make_state
+from snapshots import SnapshotCache, snap_width
+
+
+def publish(state, width=1280, height=720):
+    _, jpeg = cv2.imencode(".jpg", np.zeros((height, width, 3), np.uint8))
+    state.publish_frame(jpeg.tobytes())
+
+
+def test_widths_are_snapped_to_a_few_sizes():
+    assert [snap_width(w) for w in (32, 160, 161, 500, 3840)] == [160, 160, 320, 640, 1280]
+
+
+def test_only_the_current_frames_thumbnails_are_kept():
+    async def run():
+        state = make_state("memory")
+        snapshots = SnapshotCache(state)
+        publish(state)
+        seq, jpeg = await snapshots.latest(300)
+        assert cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR).shape[1] == 320
+        await snapshots.latest(200)
+        assert sorted(snapshots.thumbnails) == [320]
+
+        publish(state)
+        new_seq, _ = await snapshots.latest(100)
+        assert new_seq != seq
+        assert sorted(snapshots.thumbnails) == [160]
+
+    asyncio.run(run())
+
+
+def test_watcher_stops_with_the_last_waiter():
+    async def run():
+        state = make_state("memory")
+        snapshots = SnapshotCache(state, poll_seconds=0.001)
+        publish(state)
+        seq = state.latest_seq()
+        assert not await snapshots.wait_for_newer(seq, 0.01)
+        assert snapshots._watcher is None
+
+        waiter = asyncio.create_task(snapshots.wait_for_newer(seq, 1))
+        await asyncio.sleep(0.01)
+        publish(state)
+        assert await waiter
+        assert snapshots._watcher is None
+
+    asyncio.run(run())
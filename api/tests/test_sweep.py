@@ -0,0 +1,20 @@
+from pathlib import Path
+
+import sweep
+from replay import Recording
+
+FIXTURE = Path(__file__).parent / "fixtures" / "replay_walkthrough"
+
+
+def test_detect_interval_trades_cost_deterministically():
+    sweep._recordings = [Recording(FIXTURE)]
+    every, sparse = sweep.evaluate({"DETECT_INTERVAL": 1}), sweep.evaluate({"DETECT_INTERVAL": 3})
+    assert sparse["cost"] < every["cost"]
+    assert sweep.evaluate({"DETECT_INTERVAL": 3})["cost"] == sparse["cost"]
+    assert sweep.pareto_front([every, sparse])[-1]["cost"] == sparse["cost"]
+
+
+def test_random_configs_redraw_rejected_ones():
+    configs = list(sweep.random_configs(sweep.SPACE, 25, accept=sweep.valid))
+    assert len(configs) == 25
+    assert all(sweep.valid(c) for c in configs)
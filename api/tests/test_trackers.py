@@ -0,0 +1,29 @@
+from trackers import IoUTracker
+
+
+def run(tracker, step, frames=30, size=100):
+    ids = set()
+    for i in range(frames):
+        x = 10 + i * step
+        tracks = tracker.update_tracks([((x, 200, size, 2 * size), 0.9, 0)])
+        ids.update(t.track_id for t in tracks if t.is_confirmed())
+    return ids
+
+
+def test_slow_box_keeps_one_id():
+    assert len(run(IoUTracker(), step=20)) == 1
+
+
+def test_fast_box_keeps_one_id():
+    # 55px/frame on a 100px box: the previous box barely overlaps the next one,
+    # so only the constant-velocity prediction keeps the track
+    assert len(run(IoUTracker(), step=55)) == 1
+
+
+def test_missed_frame_is_predicted_forward():
+    tracker = IoUTracker()
+    for i in range(5):
+        tracker.update_tracks([((10 + i * 55, 200, 100, 200), 0.9, 0)])
+    tracker.update_tracks([])
+    tracks = tracker.update_tracks([((10 + 6 * 55, 200, 100, 200), 0.9, 0)])
+    assert [t.track_id for t in tracks] == [1]
@@ -0,0 +1,265 @@
+import os
+
+import numpy as np
+
+# Detections scoring at least this are matched first and may start tracks;
+# weaker ones only extend existing tracks (ByteTrack's two-stage association)
+HIGH_CONFIDENCE = 0.5
+
+# A track seen only once may still be claimed by a box whose centre moved up
+# to this fraction of the track's height, and whose height changed by less
+# than MAX_SIZE_CHANGE
+MAX_FIRST_JUMP = 0.5
+MAX_SIZE_CHANGE = 0.3
+
+
+def iou_matrix(a, b):
+    """IoU between every box in a (N, 4) and b (M, 4), both ltrb"""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), np.float32)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def greedy_match(score, threshold):
+    """Pair rows with columns by descending score; returns (matches, unmatched rows, unmatched cols)"""
+    matches = []
+    if score.size:
+        rows, cols = np.nonzero(score >= threshold)
+        used_rows, used_cols = set(), set()
+        for k in np.argsort(-score[rows, cols], kind="stable"):
+            r, c = rows[k], cols[k]
+            if r in used_rows or c in used_cols:
+                continue
+            matches.append((r, c))
+            used_rows.add(r)
+            used_cols.add(c)
+    matched_rows = {r for r, _ in matches}
+    matched_cols = {c for _, c in matches}
+    return (
+        matches,
+        [r for r in range(score.shape[0]) if r not in matched_rows],
+        [c for c in range(score.shape[1]) if c not in matched_cols],
+    )
+
+
+class Track:
+    """Constant-velocity box track with the same interface DeepSort tracks expose"""
+
+    def __init__(self, track_id, ltrb, n_init):
+        self.track_id = track_id
+        self.last_ltrb = np.asarray(ltrb, np.float32)
+        self.velocity = np.zeros(4, np.float32)
+        self.hits = 1
+        self.time_since_update = 0
+        self.n_init = n_init
+        self.embedding = None
+
+    def is_confirmed(self):
+        return self.hits >= self.n_init
+
+    def to_ltrb(self):
+        return self.last_ltrb + self.velocity * self.time_since_update
+
+    def predict(self):
+        """Where the box should be on the coming frame, for association"""
+        return self.last_ltrb + self.velocity * (self.time_since_update + 1)
+
+    def mark_missed(self):
+        self.time_since_update += 1
+
+    def update(self, ltrb):
+        ltrb = np.asarray(ltrb, np.float32)
+        steps = max(self.time_since_update, 1)
+        motion = (ltrb - self.last_ltrb) / steps
+        # The first step has nothing to smooth against
+        self.velocity = motion if self.hits == 1 else 0.6 * self.velocity + 0.4 * motion
+        self.last_ltrb = ltrb
+        self.time_since_update = 0
+        self.hits += 1
+
+
+class IoUTracker:
+    """Motion-only tracker: IoU association against constant-velocity predictions.
+
+    Follows ByteTrack's two passes: confident detections claim tracks first,
+    then low-confidence detections may extend tracks that are still
+    unmatched. No appearance model runs, so cost grows only with the number
+    of boxes, which suits uncrowded doors.
+    """
+
+    def __init__(self, max_age=30, n_init=3, iou_threshold=0.3):
+        self.max_age = max_age
+        self.n_init = n_init
+        self.iou_threshold = iou_threshold
+        self.tracks: list[Track] = []
+        self._next_id = 1
+
+    def _boxes(self, detections):
+        if not detections:
+            return np.zeros((0, 4), np.float32), np.zeros(0, np.float32)
+        ltwh = np.array([d[0] for d in detections], np.float32).reshape(-1, 4)
+        conf = np.array([d[1] for d in detections], np.float32)
+        ltrb = ltwh.copy()
+        ltrb[:, 2:] += ltrb[:, :2]
+        return ltrb, conf
+
+    def _score(self, tracks, boxes, ious, det_index, frame):
+        """Association score between tracks and a subset of detections"""
+        return ious
+
+    def _after_match(self, matches, tracks, boxes, frame):
+        pass
+
+    def _associate(self, tracks, boxes, det_index, frame):
+        predicted = np.array([t.predict() for t in tracks], np.float32).reshape(-1, 4)
+        ious = iou_matrix(predicted, boxes[det_index])
+        score = self._score(tracks, boxes, ious, det_index, frame)
+        matches, free_tracks, free_dets = greedy_match(score, self.iou_threshold)
+        return (
+            [(tracks[r], det_index[c]) for r, c in matches],
+            [tracks[r] for r in free_tracks],
+            [det_index[c] for c in free_dets],
+        )
+
+    def _associate_new(self, tracks, boxes, det_index):
+        """Pair tracks seen once, which have no velocity to predict with, by centre distance"""
+        young = [t for t in tracks if t.hits == 1]
+        if not young or not len(det_index):
+            return [], tracks, det_index
+        last = np.array([t.last_ltrb for t in young], np.float32)
+        dets = boxes[det_index]
+        heights = np.maximum(last[:, 3] - last[:, 1], 1)
+        jump = np.linalg.norm(
+            ((last[:, None, :2] + last[:, None, 2:]) - (dets[None, :, :2] + dets[None, :, 2:])) / 2,
+            axis=2,
+        ) / heights[:, None]
+        size_change = np.abs((dets[None, :, 3] - dets[None, :, 1]) / heights[:, None] - 1)
+        score = np.where(size_change < MAX_SIZE_CHANGE, 1 - jump, -1)
+        matches, _, free_dets = greedy_match(score, 1 - MAX_FIRST_JUMP)
+        matched = {id(young[r]) for r, _ in matches}
+        return (
+            [(young[r], det_index[c]) for r, c in matches],
+            [t for t in tracks if id(t) not in matched],
+            [det_index[c] for c in free_dets],
+        )
+
+    def update_tracks(self, detections, frame=None):
+        boxes, conf = self._boxes(detections)
+        high = np.nonzero(conf >= HIGH_CONFIDENCE)[0]
+        low = np.nonzero(conf < HIGH_CONFIDENCE)[0]
+
+        first, free_tracks, free_high = self._associate(self.tracks, boxes, high, frame)
+        second, free_tracks, _ = self._associate(free_tracks, boxes, low, frame)
+        # A fast mover's second box may not overlap its first at all
+        third, free_tracks, free_high = self._associate_new(free_tracks, boxes, free_high)
+        matches = first + second + third
+
+        for track, d in matches:
+            track.update(boxes[d])
+        for track in free_tracks:
+            track.mark_missed()
+        for d in free_high:
+            self.tracks.append(Track(self._next_id, boxes[d], self.n_init))
+            self._next_id += 1
+        self._after_match(matches, self.tracks, boxes, frame)
+
+        # Tentative tracks that miss a frame are dropped straight away, as in DeepSort
+        self.tracks = [
+            t
+            for t in self.tracks
+            if t.time_since_update <= self.max_age
+            and (t.is_confirmed() or t.time_since_update == 0)
+        ]
+        return list(self.tracks)
+
+
+class HybridTracker(IoUTracker):
+    """IoU tracker that computes appearance embeddings only where motion is ambiguous.
+
+    A detection is ambiguous when two or more tracks overlap it with nearly
+    the same IoU. Only those detections, and tracks whose boxes overlap a
+    neighbour, get embedded, so the CNN runs in crowded moments rather than
+    on every person every frame.
+    """
+
+    def __init__(self, max_age=30, n_init=3, iou_threshold=0.3, tie_margin=0.15, appearance_weight=0.5):
+        super().__init__(max_age, n_init, iou_threshold)
+        self.tie_margin = tie_margin
+        self.appearance_weight = appearance_weight
+        self.embeddings_computed = 0
+        self._embedder = None
+
+    def _embed(self, frame, boxes):
+        if self._embedder is None:
+            from deep_sort_realtime.embedder.embedder_pytorch import MobileNetv2_Embedder
+
+            self._embedder = MobileNetv2_Embedder(half=False, bgr=True, gpu=False)
+        h, w = frame.shape[:2]
+        crops = []
+        for l, t, r, b in boxes.astype(int):
+            crop = frame[max(t, 0) : min(b, h), max(l, 0) : min(r, w)]
+            crops.append(crop if crop.size else np.zeros((8, 8, 3), np.uint8))
+        features = np.asarray(self._embedder.predict(crops), np.float32)
+        self.embeddings_computed += len(crops)
+        return features / np.maximum(np.linalg.norm(features, axis=1, keepdims=True), 1e-9)
+
+    def _score(self, tracks, boxes, ious, det_index, frame):
+        if frame is None or ious.shape[0] < 2:
+            return ious
+        ordered = np.sort(ious, axis=0)
+        ambiguous = np.nonzero(
+            (ordered[-2] >= self.iou_threshold) & (ordered[-1] - ordered[-2] < self.tie_margin)
+        )[0]
+        if len(ambiguous) == 0:
+            return ious
+
+        features = self._embed(frame, boxes[det_index[ambiguous]])
+        score = ious.copy()
+        w = self.appearance_weight
+        for k, c in enumerate(ambiguous):
+            for r, track in enumerate(tracks):
+                if track.embedding is not None and ious[r, c] >= self.iou_threshold:
+                    similarity = float(track.embedding @ features[k])
+                    score[r, c] = (1 - w) * ious[r, c] + w * max(similarity, 0.0)
+        return score
+
+    def _after_match(self, matches, tracks, boxes, frame):
+        if frame is None or not matches:
+            return
+        # Refresh the appearance of matched tracks that are crowding a neighbour,
+        # so a later ambiguous match has something to compare against
+        all_boxes = np.array([t.to_ltrb() for t in tracks], np.float32)
+        overlaps = iou_matrix(all_boxes, all_boxes)
+        np.fill_diagonal(overlaps, 0)
+        index = {id(t): i for i, t in enumerate(tracks)}
+        crowded = [(t, d) for t, d in matches if overlaps[index[id(t)]].max(initial=0) > 0.05]
+        if not crowded:
+            return
+        features = self._embed(frame, boxes[[d for _, d in crowded]])
+        for (track, _), feature in zip(crowded, features):
+            if track.embedding is None:
+                track.embedding = feature
+            else:
+                mixed = 0.7 * track.embedding + 0.3 * feature
+                track.embedding = mixed / max(np.linalg.norm(mixed), 1e-9)
+
+
+def make_tracker(kind=None, max_age=30):
+    """Build a tracker; kind defaults to the TRACKER_BACKEND env var, then deepsort"""
+    kind = kind or os.getenv("TRACKER_BACKEND", "deepsort")
+    if kind == "deepsort":
+        from deep_sort_realtime.deepsort_tracker import DeepSort
+
+        return DeepSort(max_age=max_age)
+    if kind == "iou":
+        return IoUTracker(max_age=max_age)
+    if kind == "hybrid":
+        return HybridTracker(max_age=max_age)
+    raise ValueError(f"Unknown tracker backend {kind!r}, expected deepsort, iou or hybrid")
@@ -2,23 +2,25 @@
 
 import sys
 import os
-from gtts import gTTS
-from datetime import datetime
 
-def text_to_speech(text):
+from tts_cache import CACHE_DIR, cache_from_env
+
+# Same directory and budget as the API's generated audio, which serves these files too
+OUTPUT_DIR = CACHE_DIR
+
+_cache = None
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = cache_from_env(OUTPUT_DIR)
+    return _cache
+
+def text_to_speech(text, lang='en', voice=None):
     try:
-        # Create output directory if it doesn't exist
-        output_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), '911_dashboard', 'data', 'audio')
-        os.makedirs(output_dir, exist_ok=True)
-        
-        # Generate timestamp for unique filename
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_file = os.path.join(output_dir, f'speech_{timestamp}.mp3')
-        
-        # Create gTTS object and save directly to output file
+        # Identical messages resolve to the same cached file instead of a new synthesis
         print(f"Converting text to speech: {text}")
-        tts = gTTS(text=text, lang='en', slow=False)
-        tts.save(output_file)
+        output_file = get_cache().synthesize(text, lang, voice)
         
         print(f"Audio saved to: {output_file}")
         return output_file
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+
+import hashlib
+import io
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+import wave
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+
+# The one cache directory for synthesized audio, shared by the API's /audio
+# endpoint and text_to_audio.py so a single size budget covers both
+CACHE_DIR = os.environ.get(
+    "GENERATED_AUDIO_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "api", "generated_audio"),
+)
+
+# Alerts built by the API follow this shape; the fixed wording between the
+# fields is synthesized once and reused across every alert.
+ALERT_PATTERN = re.compile(
+    r"^(Emergency at) (?P<school>.+?)(, building) (?P<building>.+?) "
+    r"(with) (?P<count>\d+) (people in it\.)(?P<rest>.*)$",
+    re.DOTALL,
+)
+
+
+def split_message(text):
+    """Split an alert into [(segment, is_template), ...] so static parts can be cached"""
+    match = ALERT_PATTERN.match(text)
+    if not match:
+        return [(text, False)]
+    parts = [
+        (match.group(1), True),
+        (match.group("school"), False),
+        (match.group(3), True),
+        (match.group("building"), False),
+        (match.group(5), True),
+        (match.group("count"), False),
+        (match.group(7), True),
+    ]
+    rest = match.group("rest").strip()
+    if rest:
+        parts.append((rest, False))
+    return [(segment.strip(" ,"), is_template) for segment, is_template in parts if segment.strip(" ,")]
+
+
+class GTTSEngine:
+    """Google Translate TTS; needs network access"""
+
+    name = "gtts"
+    extension = "mp3"
+    # MP3 frames are self-contained, so clips can be written one after another
+    concatenates = True
+
+    def synthesize(self, text, lang="en", voice=None):
+        from gtts import gTTS
+
+        buffer = io.BytesIO()
+        # gTTS picks the accent from the Google domain, so use that as the voice
+        tts = gTTS(text=text, lang=lang, tld=voice or "com", slow=False)
+        tts.write_to_fp(buffer)
+        return buffer.getvalue()
+
+    def write(self, text, fp, lang="en", voice=None):
+        # gTTS requests the text in short parts and writes each one as it arrives,
+        # so readers of fp can start playback before the whole message is done
+        from gtts import gTTS
+
+        gTTS(text=text, lang=lang, tld=voice or "com", slow=False).write_to_fp(fp)
+
+    def join(self, clips):
+        return b"".join(clips)
+
+
+class LocalEngine:
+    """Offline stand-in that renders each character as a short tone in a WAV file"""
+
+    name = "local"
+    extension = "wav"
+    # The WAV header holds the total length, so segments must be joined before writing
+    concatenates = False
+    sample_rate = 8000
+    char_seconds = 0.02
+
+    def synthesize(self, text, lang="en", voice=None):
+        n = int(self.sample_rate * self.char_seconds)
+        frames = bytearray()
+        for ch in text:
+            freq = 200 + (ord(ch) % 64) * 10
+            for i in range(n):
+                sample = int(8000 * math.sin(2 * math.pi * freq * i / self.sample_rate))
+                frames += sample.to_bytes(2, "little", signed=True)
+        return self._wav(bytes(frames))
+
+    def write(self, text, fp, lang="en", voice=None):
+        fp.write(self.synthesize(text, lang, voice))
+
+    def join(self, clips):
+        frames = b""
+        for clip in clips:
+            with wave.open(io.BytesIO(clip)) as w:
+                frames += w.readframes(w.getnframes())
+        return self._wav(frames)
+
+    def _wav(self, frames):
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(self.sample_rate)
+            w.writeframes(frames)
+        return buffer.getvalue()
+
+
+ENGINES = {
+    "gtts": GTTSEngine,
+    "local": LocalEngine,
+}
+
+
+def cache_from_env(directory=CACHE_DIR):
+    """TTSCache with the engine from TTS_ENGINE=gtts|local and the size limit from TTS_CACHE_MB"""
+    engine = ENGINES[os.environ.get("TTS_ENGINE", "gtts")]()
+    max_bytes = int(os.environ.get("TTS_CACHE_MB", "200")) * 1024 * 1024
+    return TTSCache(directory, engine, max_bytes)
+
+
+class TTSCache:
+    """Content-addressed audio cache with a least-recently-used size limit on disk"""
+
+    def __init__(self, directory, engine=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.engine = engine or GTTSEngine()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        # Rebuild the LRU order from modification times, oldest first
+        self._entries = OrderedDict()
+        files = []
+        for name in os.listdir(directory):
+            if name.startswith("tts_"):
+                path = os.path.join(directory, name)
+                stat = os.stat(path)
+                files.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+        self._total = sum(self._entries.values())
+
+    def key(self, text, lang="en", voice=None):
+        raw = "\x00".join([self.engine.name, lang, voice or "", text])
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, f"tts_{key}.{self.engine.extension}")
+
+    def lookup(self, key):
+        """Path of a cached clip, or None; counts as a use for the LRU order"""
+        path = self.path(key)
+        name = os.path.basename(path)
+        with self._lock:
+            if name not in self._entries:
+                # Another process sharing the directory may have written it
+                try:
+                    size = os.path.getsize(path)
+                except FileNotFoundError:
+                    return None
+                self._entries[name] = size
+                self._total += size
+            self._entries.move_to_end(name)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._total -= self._entries.pop(name, 0)
+            return None
+        return path
+
+    def _put(self, key, data):
+        # Write to a temp file and rename so concurrent readers never see a partial clip
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        return self.add_file(key, tmp)
+
+    def add_file(self, key, source):
+        """Move a finished clip written elsewhere (same filesystem) into the cache"""
+        path = self.path(key)
+        os.replace(source, path)
+        size = os.path.getsize(path)
+        name = os.path.basename(path)
+        with self._lock:
+            self._total += size - self._entries.pop(name, 0)
+            self._entries[name] = size
+            self._evict(keep=name)
+        return path
+
+    def _evict(self, keep):
+        while self._total > self.max_bytes and len(self._entries) > 1:
+            name, size = next(iter(self._entries.items()))
+            if name == keep:
+                break
+            del self._entries[name]
+            self._total -= size
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+    def prune(self, max_age_seconds, max_files=None):
+        """Drop clips unused for max_age_seconds, then the least recently used beyond max_files"""
+        removed = 0
+        now = time.time()
+        with self._lock:
+            for name in list(self._entries):
+                path = os.path.join(self.directory, name)
+                try:
+                    too_old = now - os.path.getmtime(path) > max_age_seconds
+                except FileNotFoundError:
+                    too_old = True
+                too_many = max_files is not None and len(self._entries) > max_files
+                if not (too_old or too_many):
+                    continue
+                self._total -= self._entries.pop(name)
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                removed += 1
+        return removed
+
+    def _read_or_synthesize(self, text, lang, voice):
+        key = self.key(text, lang, voice)
+        path = self.lookup(key)
+        if path is not None:
+            self.hits += 1
+            with open(path, "rb") as f:
+                return f.read()
+        self.misses += 1
+        data = self.engine.synthesize(text, lang, voice)
+        self._put(key, data)
+        return data
+
+    def synthesize(self, text, lang="en", voice=None):
+        """Return a path to audio for text, reusing cached clips and template segments"""
+        key = self.key(text, lang, voice)
+        path = self.lookup(key)
+        if path is not None:
+            self.hits += 1
+            return path
+
+        self.misses += 1
+        segments = split_message(text)
+        if len(segments) == 1:
+            data = self.engine.synthesize(text, lang, voice)
+        else:
+            data = self.engine.join(
+                [self._read_or_synthesize(segment, lang, voice) for segment, _ in segments]
+            )
+        return self._put(key, data)
+
+    def write(self, text, fp, lang="en", voice=None):
+        """Write audio for text to fp one segment at a time, as each is read or synthesized.
+
+        Cached template segments go out straight away, so a reader of fp can
+        start playback while the new parts are still being synthesized.
+        """
+        segments = split_message(text)
+        if len(segments) == 1:
+            self.engine.write(text, fp, lang, voice)
+            return
+        clips = []
+        for segment, _ in segments:
+            clip = self._read_or_synthesize(segment, lang, voice)
+            if self.engine.concatenates:
+                fp.write(clip)
+                fp.flush()
+            else:
+                clips.append(clip)
+        if clips:
+            fp.write(self.engine.join(clips))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "files": len(self._entries),
+                "bytes": self._total,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }